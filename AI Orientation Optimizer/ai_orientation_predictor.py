@@ -1,188 +1,154 @@
-import json
 import numpy as np
 import os
+import sys
+import time
+from datetime import datetime
 import joblib
 from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import mean_absolute_error, r2_score
 from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import train_test_split
+from sklearn.model_selection import GroupShuffleSplit
+
+from model_bundle import (
+    DEFAULT_BUNDLE_DIR, MODEL_FILES, TRAINING_FEATURE_NAMES, load_bundle, save_bundle
+)
+from stl_vectorizer_fixed import VECTORIZER_VERSION
+from training_data import STORE_DIR, load_table
+
+# python ai_orientation_predictor.py --multi-output: один лес предсказывает
+# все цели сразу (один обход деревьев на кандидата вместо двух-трех)
+MULTI_OUTPUT = '--multi-output' in sys.argv
+
+TARGET_LABELS = {'filament_length_m': 'Филамент', 'time_minutes': 'Время', 'printing_rate': 'Скорость'}
+
+FOREST_PARAMS = dict(
+    n_estimators=100,
+    max_depth=10,
+    min_samples_split=5,
+    random_state=42
+)
 
 print("="*70)
 print("🤖 ОБУЧЕНИЕ МОДЕЛИ ДЛЯ РЕКОМЕНДАЦИИ ОРИЕНТАЦИИ")
 print("="*70)
 
-# 1. Загрузка данных
-if not os.path.exists('training_dataset.json'):
-    print("❌ Файл training_dataset.json не найден!")
+# 1. Загрузка данных (столбцовое хранилище через mmap или training_dataset.json)
+table = load_table()
+if table is None:
+    print(f"❌ Хранилище {STORE_DIR}/ и файл training_dataset.json не найдены!")
     print("   Сначала создайте датасет")
     exit()
 
-try:
-    with open('training_dataset.json', 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    # Фильтруем некорректные записи
-    cleaned_data = []
-    for item in data:
-        try:
-            # Проверяем наличие всех необходимых полей
-            if all(key in item for key in ['stl_vector', 'angle_x', 'angle_y', 'angle_z', 'filament_length_m', 'time_minutes']):
-                # Проверяем, что stl_vector имеет правильную длину
-                if len(item['stl_vector']) >= 10:
-                    cleaned_data.append(item)
-                else:
-                    print(f"⚠️  Пропущена запись: stl_vector имеет длину {len(item['stl_vector'])} вместо 10")
-        except:
-            continue
-    
-    data = cleaned_data
-    
-    print(f"📊 Загружено {len(data)} записей (после очистки)")
-    
-    if len(data) < 10:
-        print(f"❌ Слишком мало данных для обучения! Только {len(data)} записей.")
-        print("   Добавьте больше данных в training_dataset.json")
-        exit()
-        
-except Exception as e:
-    print(f"❌ Ошибка загрузки данных: {e}")
+print(f"📊 Загружено {len(table)} записей ({table.source})")
+
+if len(table) < 10:
+    print(f"❌ Слишком мало данных для обучения! Только {len(table)} записей.")
+    print("   Добавьте больше данных: python update_dataset_from_csv.py")
     exit()
 
 # 2. Подготовка данных
-X = []
-y_filament = []
-y_time = []
-
-for item in data:
-    stl_vector = item['stl_vector']
-    # Убедимся, что вектор имеет 10 элементов
-    if len(stl_vector) != 10:
-        stl_vector = list(stl_vector[:10]) + [0] * max(0, 10 - len(stl_vector))
-    
-    # Используем углы из данных
-    angles = [item['angle_x'], item['angle_y'], item['angle_z']]
-    
-    features = stl_vector + angles
-    X.append(features)
-    y_filament.append(item['filament_length_m'])
-    y_time.append(item['time_minutes'])
-
-X = np.array(X)
-y_filament = np.array(y_filament)
-y_time = np.array(y_time)
+target_names = table.available_targets()
+X, Y = table.matrices(target_names)
+row_ids = table.row_ids
 
 print(f"\n📈 Размерность данных:")
 print(f"   X: {X.shape} (13 признаков на запись)")
-print(f"   y_filament: {y_filament.shape}")
-print(f"   y_time: {y_time.shape}")
+print(f"   Y: {Y.shape} ({', '.join(target_names)})")
 
-# Остальной код без изменений...
-
-# 3. Разделение на обучающую и тестовую выборки
-X_train, X_test, y_fil_train, y_fil_test, y_time_train, y_time_test = train_test_split(
-    X, y_filament, y_time, test_size=0.2, random_state=42
-)
+# 3. Разделение на обучающую и тестовую выборки по деталям: все ориентации
+# одной модели целиком в обучении или в тесте (иначе R² на тесте завышен)
+groups = table.groups
+train_idx, test_idx = next(GroupShuffleSplit(n_splits=1, test_size=0.2, random_state=42).split(X, Y, groups))
+X_train, X_test, Y_train, Y_test = X[train_idx], X[test_idx], Y[train_idx], Y[test_idx]
+ids_train, ids_test = [row_ids[i] for i in train_idx], [row_ids[i] for i in test_idx]
 
 print(f"\n📊 Разделение данных:")
 print(f"   Обучающая выборка: {X_train.shape[0]} примеров")
 print(f"   Тестовая выборка:   {X_test.shape[0]} примеров")
-
-# 4. Обучение модели для филамента
-print("\n🎯 Обучение модели для предсказания расхода филамента...")
-model_filament = RandomForestRegressor(
-    n_estimators=100,
-    max_depth=10,
-    min_samples_split=5,
-    random_state=42
-)
-model_filament.fit(X_train, y_fil_train)
-
-# 5. Обучение модели для времени печати
-print("🎯 Обучение модели для предсказания времени печати...")
-model_time = RandomForestRegressor(
-    n_estimators=100,
-    max_depth=10,
-    min_samples_split=5,
-    random_state=42
-)
-model_time.fit(X_train, y_time_train)
+print(f"   Деталей: {len(set(groups))} (разбиение по деталям)")
+
+# 4-5. Обучение: отдельный лес на каждую цель или один совместный
+train_start = time.perf_counter()
+output_scalers = {}
+if MULTI_OUTPUT:
+    print(f"\n🎯 Обучение совместной модели ({', '.join(target_names)})...")
+    # Цели в разных единицах (метры, минуты): без стандартизации критерий MSE
+    # совместного леса определяется целью с наибольшим разбросом
+    scaler_Y = StandardScaler()
+    model_joint = RandomForestRegressor(**FOREST_PARAMS)
+    model_joint.fit(X_train, scaler_Y.fit_transform(Y_train))
+    models = {'joint': model_joint}
+    output_scalers = {'joint': scaler_Y}
+    pred_train = scaler_Y.inverse_transform(model_joint.predict(X_train))
+    pred_test = scaler_Y.inverse_transform(model_joint.predict(X_test))
+else:
+    models = {}
+    for i, name in enumerate(target_names):
+        print(f"🎯 Обучение модели для предсказания: {name}...")
+        models[name] = RandomForestRegressor(**FOREST_PARAMS)
+        models[name].fit(X_train, Y_train[:, i])
+    pred_train = np.column_stack([model.predict(X_train) for model in models.values()])
+    pred_test = np.column_stack([model.predict(X_test) for model in models.values()])
+train_elapsed = time.perf_counter() - train_start
+print(f"   Время обучения: {train_elapsed:.2f} с, лесов: {len(models)}")
 
 # 6. Создание и обучение скейлера
 scaler_X = StandardScaler()
 X_train_scaled = scaler_X.fit_transform(X_train)
 X_test_scaled = scaler_X.transform(X_test)
 
-# 7. Оценка моделей
-train_score_fil = model_filament.score(X_train, y_fil_train)
-test_score_fil = model_filament.score(X_test, y_fil_test)
-train_score_time = model_time.score(X_train, y_time_train)
-test_score_time = model_time.score(X_test, y_time_test)
-
+# 7. Оценка моделей (R² по каждой цели)
+metrics = {'n_train': int(X_train.shape[0]), 'n_test': int(X_test.shape[0]),
+           'multi_output': MULTI_OUTPUT, 'train_seconds': train_elapsed}
 print(f"\n📊 Результаты обучения:")
-print(f"   Филамент (обучение): R² = {train_score_fil:.3f}")
-print(f"   Филамент (тест):     R² = {test_score_fil:.3f}")
-print(f"   Время (обучение):    R² = {train_score_time:.3f}")
-print(f"   Время (тест):        R² = {test_score_time:.3f}")
+for i, name in enumerate(target_names):
+    r2_train = r2_score(Y_train[:, i], pred_train[:, i])
+    r2_test = r2_score(Y_test[:, i], pred_test[:, i])
+    metrics[name] = {'r2_train': r2_train, 'r2_test': r2_test,
+                     'mae_test': mean_absolute_error(Y_test[:, i], pred_test[:, i])}
+    label = TARGET_LABELS.get(name, name)
+    print(f"   {label + ' (обучение):':<21}R² = {r2_train:.3f}")
+    print(f"   {label + ' (тест):':<21}R² = {r2_test:.3f}")
 
 # 8. Сохранение моделей
 os.makedirs('models_fixed', exist_ok=True)
 
-joblib.dump(model_filament, 'models_fixed/model_filament.pkl')
-joblib.dump(model_time, 'models_fixed/model_time.pkl')
+for name, model in models.items():
+    joblib.dump(model, f'models_fixed/{MODEL_FILES[name]}')
 joblib.dump(scaler_X, 'models_fixed/scaler_X.pkl')
+if MULTI_OUTPUT:
+    joblib.dump(scaler_Y, 'models_fixed/scaler_Y.pkl')
+# Модели другого режима от прошлых запусков удаляются: иначе predict_orientation.py
+# без пакета загрузил бы устаревшие model_filament.pkl/model_time.pkl
+stale_files = [file for name, file in MODEL_FILES.items() if name not in models]
+if not MULTI_OUTPUT:
+    stale_files.append('scaler_Y.pkl')
+for file in stale_files:
+    if os.path.exists(f'models_fixed/{file}'):
+        os.remove(f'models_fixed/{file}')
+        print(f"🗑️  Удален устаревший models_fixed/{file}")
 
 print("\n💾 Модели сохранены в папке 'models_fixed/'")
 
-# 9. Создание класса-рекомендателя
-class OrientationRecommender:
-    def __init__(self, model_filament, model_time, scaler_X):
-        self.model_filament = model_filament
-        self.model_time = model_time
-        self.scaler_X = scaler_X
-        self.test_orientations = [
-            [0, 0, 0],    # default
-            [90, 0, 0],   # на боку
-            [0, 90, 0],
-            [0, 0, 90],
-            [45, 0, 0],
-            [0, 45, 0],
-            [0, 0, 45],
-            [45, 45, 0],
-            [45, 0, 45],
-            [0, 45, 45],
-            [45, 45, 45],
-            [30, 60, 0],
-            [60, 30, 0]
-        ]
-    
-    def recommend(self, stl_vector, top_k=5):
-        """Рекомендует top_k лучших ориентаций для данного STL-вектора"""
-        predictions = []
-        
-        for angles in self.test_orientations:
-            # Объединяем STL-вектор с углами
-            features = list(stl_vector) + angles
-            features_scaled = self.scaler_X.transform([features])
-            
-            filament_pred = self.model_filament.predict(features_scaled)[0]
-            time_pred = self.model_time.predict(features_scaled)[0]
-            
-            # Комбинированная оценка (чем меньше, тем лучше)
-            score = 0.7 * filament_pred + 0.3 * time_pred
-            
-            predictions.append({
-                'angles': angles,
-                'filament_pred': filament_pred,
-                'time_pred': time_pred,
-                'score': score
-            })
-        
-        # Сортируем по оценке (по возрастанию)
-        predictions.sort(key=lambda x: x['score'])
-        return predictions[:top_k]
-
-# 10. Тестирование рекомендателя
+# 9. Пакет моделей для predict_orientation.py: массивы + манифест схемы.
+# Модели обучены на исходных признаках (углы в градусах), поэтому без скейлера
+save_bundle(
+    DEFAULT_BUNDLE_DIR,
+    models,
+    TRAINING_FEATURE_NAMES,
+    VECTORIZER_VERSION,
+    metrics=metrics,
+    target_outputs={'joint': target_names} if MULTI_OUTPUT else None,
+    output_scalers=output_scalers,
+    training_rows={'train': list(ids_train), 'test': list(ids_test)},
+    history=[{'date': datetime.now().isoformat(), 'mode': 'full', 'rows': len(row_ids),
+              'seconds': round(train_elapsed, 3)}]
+)
+print(f"💾 Пакет моделей сохранен в папке '{DEFAULT_BUNDLE_DIR}/'")
+
+# 10. Тестирование рекомендателя (загрузка пакета проверяет схему)
 print("\n🧪 Тестирование рекомендательной системы...")
-recommender = OrientationRecommender(model_filament, model_time, scaler_X)
+recommender = load_bundle(DEFAULT_BUNDLE_DIR, TRAINING_FEATURE_NAMES, VECTORIZER_VERSION).recommender()
 
 # Берём случайный STL-вектор из данных
 test_idx = np.random.randint(0, len(X))
@@ -0,0 +1,153 @@
+"""
+batch_vectorize.py - Параллельная векторизация STL для сборки датасета
+
+Файлы хэшируются в пуле потоков (ввод-вывод), промахи кэша признаков
+сразу отправляются в пул процессов, так что чтение следующих файлов
+идет одновременно с расчетом признаков. Результаты возвращаются
+в порядке входного списка. Файлы, которые не удалось векторизовать,
+попадают в карантин с текстом ошибки вместо вектора-заглушки.
+
+Запуск:
+    python batch_vectorize.py [папка_с_stl] [--workers N]
+"""
+
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+from feature_cache import get_default_cache, hash_file
+from stl_vectorizer_fixed import SimpleSTLVectorizer
+
+DEFAULT_WORKERS = os.cpu_count() or 1
+HASH_THREADS = 4
+QUARANTINE_FILE = "quarantine.json"
+
+_worker_vectorizer = None
+
+
+def _init_worker(streaming):
+    global _worker_vectorizer
+    _worker_vectorizer = SimpleSTLVectorizer(streaming=streaming)
+
+
+def _vectorize_one(stl_path):
+    """Задача исполнителя: (путь, результат, None) или (путь, None, ошибка)"""
+    try:
+        # Вывод векторизатора из многих процессов только мешает
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = _worker_vectorizer.extract_basic_features(stl_path, strict=True)
+        return stl_path, result, None
+    except Exception as e:
+        return stl_path, None, f"{type(e).__name__}: {e}"
+
+
+def vectorize_batch(stl_paths, workers=DEFAULT_WORKERS, cache=None, streaming=False, hashes=None):
+    """
+    Векторизует список STL.
+    Возвращает (results, quarantine):
+        results - {путь: результат extract_basic_features + 'stl_hash'} в порядке stl_paths;
+        quarantine - [{'stl_path', 'error'}] для файлов с ошибкой.
+    cache=False отключает кэш признаков; hashes - уже посчитанные хэши {путь: sha256}.
+    """
+    stl_paths = list(dict.fromkeys(str(p) for p in stl_paths))
+    cache = get_default_cache() if cache is None else cache
+    hashes = dict(hashes or {})
+    local_vectorizer = SimpleSTLVectorizer(streaming=streaming)
+
+    def hash_path(path):
+        return path, hashes.get(path) or hash_file(path)
+
+    outcomes = {}
+    pending = {}
+    from_cache = set()
+    if workers > 1:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                   initargs=(streaming,))
+    else:
+        _init_worker(streaming)
+        pool = None
+
+    try:
+        with ThreadPoolExecutor(max_workers=HASH_THREADS) as hash_pool:
+            for path, content_hash in hash_pool.map(hash_path, stl_paths):
+                hashes[path] = content_hash
+                variant = 'stream' if local_vectorizer.uses_streaming(path) else ''
+                cached = cache.get(content_hash, variant) if cache else None
+                if cached is not None:
+                    outcomes[path] = (path, cached, None)
+                    from_cache.add(path)
+                elif pool is not None:
+                    pending[path] = pool.submit(_vectorize_one, path)
+                else:
+                    outcomes[path] = _vectorize_one(path)
+
+        for path, future in pending.items():
+            outcomes[path] = future.result()
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    results = {}
+    quarantine = []
+    for path in stl_paths:
+        _, result, error = outcomes[path]
+        if error is not None:
+            quarantine.append({'stl_path': path, 'error': error})
+            continue
+
+        if cache and path not in from_cache:
+            variant = 'stream' if local_vectorizer.uses_streaming(path) else ''
+            cache.put(hashes[path], result, variant)
+        result['stl_hash'] = hashes[path]
+        results[path] = result
+
+    return results, quarantine
+
+
+def write_quarantine(quarantine, path=QUARANTINE_FILE):
+    """Сохраняет список проблемных файлов с ошибками"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(quarantine, f, indent=2, ensure_ascii=False)
+
+
+def parse_workers(argv, default=DEFAULT_WORKERS):
+    """Значение --workers N из аргументов командной строки"""
+    if '--workers' in argv:
+        index = argv.index('--workers')
+        if index + 1 < len(argv):
+            return max(1, int(argv[index + 1]))
+    return default
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    base_dir = args[0] if args else "json_files"
+    workers = parse_workers(sys.argv)
+
+    print("=" * 70)
+    print("⚙️  ПАРАЛЛЕЛЬНАЯ ВЕКТОРИЗАЦИЯ STL")
+    print("=" * 70)
+
+    stl_paths = sorted(str(p) for p in Path(base_dir).rglob("*.stl"))
+    print(f"📁 STL файлов: {len(stl_paths)}, процессов: {workers}")
+
+    start = time.perf_counter()
+    results, quarantine = vectorize_batch(stl_paths, workers=workers)
+    elapsed = time.perf_counter() - start
+
+    print(f"✅ Векторизовано: {len(results)} за {elapsed:.2f} с "
+          f"({len(stl_paths) / max(elapsed, 1e-9):.1f} файлов/с)")
+    if quarantine:
+        write_quarantine(quarantine)
+        print(f"⚠️  В карантине: {len(quarantine)} (см. {QUARANTINE_FILE})")
+        for item in quarantine[:5]:
+            print(f"   - {item['stl_path']}: {item['error'][:80]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,542 @@
+"""
+benchmarks.py - Замеры скорости узких мест конвейера
+
+Запуск:
+    python benchmarks.py                 # все замеры
+    python benchmarks.py stl_reader      # только один
+    python benchmarks.py stl_reader ../dataset/results
+"""
+
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+DEFAULT_STL_DIR = "json_files"
+
+
+def find_stl_files(base_dir):
+    """Все читаемые STL в папке (рекурсивно), без placeholder-файлов"""
+    from stl_reader import STLReadError, read_stl_triangles
+
+    files = []
+    for f in sorted(Path(base_dir).rglob("*.stl")):
+        try:
+            read_stl_triangles(f)
+        except STLReadError:
+            continue
+        files.append(f)
+    return files
+
+
+def synthetic_sphere(num_triangles, radius=50.0):
+    """Замкнутая сфера из ~num_triangles треугольников (N, 3, 3) float32"""
+    n = max(2, int(np.sqrt(num_triangles / 4)))
+    m = max(3, num_triangles // (2 * n))
+    theta = np.linspace(0, np.pi, n + 1)
+    phi = np.linspace(0, 2 * np.pi, m + 1)
+    t, p = np.meshgrid(theta, phi, indexing='ij')
+    grid = radius * np.stack([np.sin(t) * np.cos(p), np.sin(t) * np.sin(p), np.cos(t)], axis=-1)
+
+    a, b = grid[:-1, :-1], grid[1:, :-1]
+    c, d = grid[1:, 1:], grid[:-1, 1:]
+    quads = np.concatenate([np.stack([a, b, c], axis=-2), np.stack([a, c, d], axis=-2)])
+    return quads.reshape(-1, 3, 3).astype(np.float32)
+
+
+def write_binary_stl(path, triangles):
+    """Сохраняет треугольники (N, 3, 3) как бинарный STL"""
+    from stl_reader import STL_RECORD_DTYPE
+
+    records = np.zeros(len(triangles), dtype=STL_RECORD_DTYPE)
+    records['vertices'] = triangles
+    with open(path, 'wb') as f:
+        f.write(b'benchmark'.ljust(80, b' '))
+        f.write(np.uint32(len(triangles)).tobytes())
+        f.write(records.tobytes())
+
+
+def time_call(func, *args, repeat=1):
+    """Лучшее время из repeat запусков (в секундах)"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_stl_reader(base_dir=DEFAULT_STL_DIR):
+    """stl_reader против trimesh.load на файлах датасета"""
+    from stl_reader import compute_mesh_stats, read_stl_stats, read_stl_triangles
+
+    print("\n📏 Чтение STL: stl_reader против trimesh.load")
+    files = find_stl_files(base_dir)
+    if not files:
+        print(f"   ❌ В {base_dir} нет STL файлов")
+        return
+
+    total_mb = sum(f.stat().st_size for f in files) / 1e6
+    print(f"   Файлов: {len(files)}, объем: {total_mb:.1f} МБ")
+
+    def native_stats():
+        for f in files:
+            compute_mesh_stats(read_stl_triangles(f))
+
+    def native_full():
+        for f in files:
+            read_stl_stats(f)
+
+    results = {
+        'stl_reader (границы/объем/площадь)': time_call(native_stats),
+        'stl_reader (+ число вершин)': time_call(native_full),
+    }
+
+    try:
+        import trimesh
+
+        def trimesh_full():
+            for f in files:
+                mesh = trimesh.load(str(f))
+                mesh.bounds, mesh.volume, mesh.area
+
+        results['trimesh.load'] = time_call(trimesh_full)
+    except ImportError:
+        print("   ⚠️  trimesh не установлен, сравнение пропущено")
+
+    for name, seconds in results.items():
+        print(f"   {name:<38} {seconds:7.3f} с  ({total_mb / seconds:7.1f} МБ/с)")
+
+
+def bench_extended_features():
+    """Стоимость 21-признакового вектора на модель по размеру сетки"""
+    from extended_vectorizer import compute_extended_features
+
+    print("\n🔧 Расширенные признаки (21) на одну модель")
+    # Сфера - худший случай для выпуклой оболочки: все вершины лежат на ней
+    print("   Сетка: сфера (все вершины на выпуклой оболочке)")
+    for size in (10_000, 100_000, 1_000_000):
+        triangles = synthetic_sphere(size)
+        seconds = time_call(compute_extended_features, triangles, repeat=3 if size < 1_000_000 else 1)
+        print(f"   {len(triangles):>9,} треугольников: {seconds * 1000:9.1f} мс")
+
+
+def bench_orientation_geometry(num_orientations=500):
+    """Геометрия и поддержки для сотен ориентаций одной модели"""
+    from orientation_geometry import compute_orientation_features, compute_support_features
+    from rotations import euler_to_matrix
+
+    print(f"\n🧭 Геометрия {num_orientations} ориентаций на модель")
+    rng = np.random.default_rng(0)
+    rotations = euler_to_matrix(rng.uniform(-180, 180, size=(int(num_orientations), 3)))
+    for size in (10_000, 100_000):
+        triangles = synthetic_sphere(size)
+        t_geom = time_call(compute_orientation_features, triangles, rotations)
+        t_support = time_call(compute_support_features, triangles, rotations)
+        print(f"   {len(triangles):>9,} треугольников: признаки {t_geom * 1000:8.1f} мс, "
+              f"поддержки {t_support * 1000:8.1f} мс")
+
+
+def bench_streaming(num_triangles=2_000_000):
+    """Пиковая память: потоковое чтение против чтения всей сетки"""
+    import tempfile
+    import tracemalloc
+    from stl_reader import compute_mesh_stats, read_stl_stats_streaming, read_stl_triangles
+
+    num_triangles = int(num_triangles)
+    print(f"\n🌊 Потоковое чтение STL ({num_triangles:,} треугольников)")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        stl_path = os.path.join(tmp_dir, "big.stl")
+        write_binary_stl(stl_path, synthetic_sphere(num_triangles))
+        size_mb = os.path.getsize(stl_path) / 1e6
+
+        for name, func in [
+            ('целиком (memmap + float64 блоки)', lambda: compute_mesh_stats(read_stl_triangles(stl_path))),
+            ('потоково (блоки по 65536)', lambda: read_stl_stats_streaming(stl_path)),
+        ]:
+            tracemalloc.start()
+            seconds = time_call(func)
+            peak = tracemalloc.get_traced_memory()[1] / 1e6
+            tracemalloc.stop()
+            print(f"   {name:<34} {seconds:6.2f} с, пик памяти {peak:7.1f} МБ (файл {size_mb:.0f} МБ)")
+        print("   (страницы memmap не видны tracemalloc, но входят в RSS процесса)")
+
+
+def bench_recommender(models_dir="models_fixed"):
+    """Пакетный OrientationRecommender против цикла по ориентациям"""
+    import warnings
+    import joblib
+    from orientation_recommender import OrientationRecommender
+
+    print(f"\n🎯 Рекомендации ориентаций (модели из {models_dir})")
+    with warnings.catch_warnings():
+        # Предупреждения о версии sklearn при загрузке моделей
+        warnings.simplefilter("ignore")
+        recommender = OrientationRecommender(
+            joblib.load(f'{models_dir}/model_filament.pkl'),
+            joblib.load(f'{models_dir}/model_time.pkl'),
+            joblib.load(f'{models_dir}/scaler_X.pkl'),
+        )
+    num_rot = len(recommender.test_orientations)
+    rng = np.random.default_rng(0)
+
+    def recommend_loop(stl_vectors):
+        # Прежняя схема: transform и два predict на каждую ориентацию
+        for stl_vector in stl_vectors:
+            for angles in recommender.test_orientations:
+                features_scaled = recommender.scaler_X.transform([list(stl_vector) + angles])
+                recommender.model_filament.predict(features_scaled)
+                recommender.model_time.predict(features_scaled)
+
+    for num_models in (1, 100, 10_000):
+        stl_vectors = rng.uniform(1, 100, size=(num_models, 10))
+        t_batch = time_call(recommender.recommend_batch, stl_vectors, repeat=3 if num_models < 10_000 else 1)
+        line = f"   M={num_models:>6,} (x{num_rot}): пакетно {t_batch * 1000:9.1f} мс"
+        if num_models <= 100:
+            t_loop = time_call(recommend_loop, stl_vectors)
+            line += f", цикл {t_loop * 1000:9.1f} мс (x{t_loop / t_batch:.0f})"
+        else:
+            line += ", цикл пропущен (слишком долго)"
+        print(line)
+
+
+def bench_orientation_search(models_dir="models_fixed"):
+    """Плотный поиск по SO(3): число оценок и время при разных бюджетах"""
+    import warnings
+    import joblib
+    from orientation_recommender import OrientationRecommender
+    from orientation_search import recommender_score_fn, search_orientations
+
+    print(f"\n🔎 Плотный поиск ориентации (модели из {models_dir}, сфера 10 000 треугольников)")
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        recommender = OrientationRecommender(
+            joblib.load(f'{models_dir}/model_filament.pkl'),
+            joblib.load(f'{models_dir}/model_time.pkl'),
+            joblib.load(f'{models_dir}/scaler_X.pkl'),
+        )
+    stl_vector = np.random.default_rng(0).uniform(1, 100, size=10)
+    score_fn = recommender_score_fn(recommender, stl_vector, synthetic_sphere(10_000))
+    fixed = recommender.recommend(stl_vector, top_k=1)[0]['score']
+    print(f"   13 фиксированных ориентаций: оценка {fixed:.3f}")
+
+    for name, kwargs in [
+        ('без бюджета', {}),
+        ('до 2000 оценок', {'max_evaluations': 2000}),
+        ('до 0.2 с', {'time_budget': 0.2}),
+    ]:
+        result = search_orientations(score_fn, **kwargs)
+        print(f"   {name:<16} оценка {result['score']:.3f}, "
+              f"{result['evaluations']:>5} оценок за {result['elapsed'] * 1000:7.1f} мс")
+
+
+def bench_orientation_optimizer(stl_file="part-2.stl", models_dir="models_fixed", repeat=3):
+    """CMA-ES против плотной сетки на оценке рекомендателя: качество, вызовы score_fn и время"""
+    import warnings
+    import joblib
+    from orientation_optimizer import optimize_orientation
+    from orientation_recommender import OrientationRecommender
+    from orientation_search import recommender_score_fn, search_orientations
+    from print_settings import load_cura_settings
+    from stl_reader import read_stl_triangles
+    from stl_vectorizer_fixed import SimpleSTLVectorizer
+
+    print(f"\n🧬 CMA-ES против сетки SO(3) ({stl_file}, модели из {models_dir})")
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        # Как в predict_orientation.py без пакета: леса на исходных признаках
+        recommender = OrientationRecommender(
+            joblib.load(f'{models_dir}/model_filament.pkl'),
+            joblib.load(f'{models_dir}/model_time.pkl'),
+            None,
+        )
+    stl_vector = SimpleSTLVectorizer().extract_basic_features(stl_file)['vector']
+    score_fn = recommender_score_fn(
+        recommender, stl_vector, read_stl_triangles(stl_file),
+        overhang_angle=load_cura_settings()['support_settings']['overhang_angle'],
+        objective_weights={'support_filament_m': 0.7},
+    )
+    calls = [0]
+
+    def counted_score_fn(rotations):
+        calls[0] += 1
+        return score_fn(rotations)
+
+    grid = search_orientations(counted_score_fn)
+    print(f"   сетка:     оценка {grid['score']:.4f}, {grid['evaluations']:>5} оценок, "
+          f"{calls[0]:>3} вызовов, {grid['elapsed'] * 1000:6.1f} мс")
+    for seed in range(int(repeat)):
+        calls[0] = 0
+        cma = optimize_orientation(counted_score_fn, seed=seed)
+        print(f"   CMA-ES #{seed}: оценка {cma['score']:.4f}, {cma['evaluations']:>5} оценок, "
+              f"{calls[0]:>3} вызовов, {cma['elapsed'] * 1000:6.1f} мс")
+
+
+def bench_compiled_forest(models_dir="models_fixed"):
+    """Лес из массивов NumPy против RandomForestRegressor.predict"""
+    import warnings
+    import joblib
+    from compiled_forest import CompiledForest
+
+    print(f"\n🌲 Предсказание леса (model_filament из {models_dir})")
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        model = joblib.load(f'{models_dir}/model_filament.pkl')
+    forest = CompiledForest.from_model(model)
+    rng = np.random.default_rng(0)
+
+    for num_rows in (1, 13, 1_000, 100_000):
+        X = rng.normal(size=(num_rows, forest.n_features_in_))
+        repeat = 20 if num_rows <= 1_000 else 1
+        t_sklearn = time_call(model.predict, X, repeat=repeat)
+        t_forest = time_call(forest.predict, X, repeat=repeat)
+        identical = np.array_equal(model.predict(X), forest.predict(X))
+        print(f"   {num_rows:>7,} строк: sklearn {t_sklearn * 1000:8.2f} мс, массивы {t_forest * 1000:8.2f} мс "
+              f"(x{t_sklearn / t_forest:.1f}), {'совпадает' if identical else 'ОТЛИЧАЕТСЯ'}")
+
+
+def bench_multi_output(num_rows=2000, num_targets=3):
+    """Отдельные леса по целям против одного леса с несколькими выходами"""
+    from sklearn.ensemble import RandomForestRegressor
+    from compiled_forest import CompiledForest
+
+    num_rows, num_targets = int(num_rows), int(num_targets)
+    print(f"\n🎯 {num_targets} цели: отдельные леса против совместного ({num_rows} строк)")
+    rng = np.random.default_rng(0)
+    X = rng.uniform(0, 100, size=(num_rows, 13))
+    Y = X[:, :num_targets] * rng.uniform(0.5, 2, size=num_targets) + rng.normal(size=(num_rows, num_targets))
+    params = dict(n_estimators=100, max_depth=10, min_samples_split=5, random_state=42)
+
+    separate = []
+    t_fit_separate = time_call(lambda: separate.extend(
+        RandomForestRegressor(**params).fit(X, Y[:, i]) for i in range(num_targets)))
+    joint = []
+    t_fit_joint = time_call(lambda: joint.append(RandomForestRegressor(**params).fit(X, Y)))
+    print(f"   Обучение: отдельно {t_fit_separate:6.2f} с, совместно {t_fit_joint:6.2f} с")
+
+    forests = [CompiledForest.from_model(model) for model in separate]
+    joint_forest = CompiledForest.from_model(joint[0])
+    candidates = X[:13]
+    t_separate = time_call(lambda: [forest.predict(candidates) for forest in forests], repeat=20)
+    t_joint = time_call(joint_forest.predict, candidates, repeat=20)
+    print(f"   Предсказание 13 кандидатов: отдельно {t_separate * 1000:6.2f} мс, "
+          f"совместно {t_joint * 1000:6.2f} мс")
+
+
+def bench_model_bundle(models_dir="models_fixed", bundle_dir="model_bundle"):
+    """Загрузка моделей: pickle-файлы против пакета с mmap-массивами"""
+    import warnings
+    import joblib
+    from model_bundle import load_bundle
+
+    print(f"\n📦 Загрузка моделей ({models_dir} против {bundle_dir})")
+
+    def load_pickles():
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            for name in ('model_filament', 'model_time', 'scaler_X'):
+                joblib.load(f'{models_dir}/{name}.pkl')
+
+    t_pickle = time_call(load_pickles, repeat=5)
+    t_bundle = time_call(load_bundle, bundle_dir, repeat=5)
+    print(f"   joblib.load x3: {t_pickle * 1000:7.1f} мс, пакет (mmap): {t_bundle * 1000:6.1f} мс "
+          f"(x{t_pickle / t_bundle:.0f})")
+
+
+def bench_slice_lite(num_orientations=13):
+    """Slice-lite: оценка филамента и времени по слоям для нескольких ориентаций"""
+    from print_settings import load_cura_settings
+    from rotations import euler_to_matrix
+    from slice_lite import estimate_prints
+
+    print(f"\n🔪 Slice-lite, {num_orientations} ориентаций на модель")
+    settings = load_cura_settings()
+    rng = np.random.default_rng(0)
+    rotations = euler_to_matrix(rng.uniform(-180, 180, size=(int(num_orientations), 3)))
+    for size in (10_000, 100_000):
+        triangles = synthetic_sphere(size)
+        seconds = time_call(estimate_prints, triangles, rotations, settings)
+        print(f"   {len(triangles):>9,} треугольников: {seconds * 1000:8.1f} мс "
+              f"({seconds * 1000 / len(rotations):.1f} мс на ориентацию)")
+
+
+def bench_training_store(num_rows=50_000, append_rows=100):
+    """Датасет: JSON целиком против столбцового хранилища (дозапись и загрузка)"""
+    import json
+    import tempfile
+    from training_data import load_dataset, table_from_items, table_from_store
+    from training_store import TrainingStore
+
+    num_rows, append_rows = int(num_rows), int(append_rows)
+    print(f"\n🗄️  Датасет из {num_rows:,} записей, дозапись {append_rows}")
+    rng = np.random.default_rng(0)
+
+    def make_items(count, offset=0):
+        return [{'model_name': f"model_{(offset + i) // 5}", 'stl_path': f"json_files/m{offset + i}/model.stl",
+                 'stl_vector': rng.normal(size=10).tolist(), 'angle_x': 90.0, 'angle_y': 0.0, 'angle_z': 0.0,
+                 'filament_length_m': float(rng.uniform(1, 10)), 'time_minutes': float(rng.uniform(10, 300)),
+                 'features': {'volume': float(rng.uniform(1e3, 1e5))}} for i in range(count)]
+
+    items, delta = make_items(num_rows), make_items(append_rows, num_rows)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        json_path = os.path.join(tmp_dir, "training_dataset.json")
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(items, f, indent=2, ensure_ascii=False)
+        store = TrainingStore.create(os.path.join(tmp_dir, "training_store"))
+        store.append(items)
+
+        def append_json():
+            with open(json_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            with open(json_path, 'w', encoding='utf-8') as f:
+                json.dump(data + delta, f, indent=2, ensure_ascii=False)
+
+        t_json_append = time_call(append_json)
+        t_store_append = time_call(store.append, delta)
+        t_json_load = time_call(lambda: table_from_items(load_dataset(json_path)))
+        t_store_load = time_call(lambda: table_from_store(TrainingStore(store.path)))
+    print(f"   Дозапись: JSON {t_json_append * 1000:8.1f} мс, хранилище {t_store_append * 1000:6.1f} мс")
+    print(f"   Загрузка: JSON {t_json_load * 1000:8.1f} мс, хранилище {t_store_load * 1000:6.1f} мс")
+
+
+def bench_csv_ingest(num_logs=300_000, num_models=2_000):
+    """Логи печати из CSV: агрегация повторов, слияние с признаками и дозапись"""
+    import tempfile
+    import pandas as pd
+    from csv_ingest import aggregate_measurements, ingest_items, join_features, load_print_logs, to_store_items
+    from training_store import TrainingStore
+
+    num_logs, num_models = int(num_logs), int(num_models)
+    print(f"\n📥 CSV-логи: {num_logs:,} строк, {num_models:,} моделей")
+    rng = np.random.default_rng(0)
+    models = np.array([f"model_{i}" for i in range(num_models)])
+    logs = pd.DataFrame({
+        'model_name': models[rng.integers(0, num_models, num_logs)],
+        'angle_x': rng.choice([-90.0, 0.0, 90.0], num_logs),
+        'angle_y': rng.choice([-90.0, 0.0, 90.0], num_logs),
+        'angle_z': 0.0,
+        'time_minutes': rng.integers(0, 600, num_logs).astype(float),
+        'filament_length_m': rng.uniform(0, 40, num_logs).round(2),
+    })
+    features = pd.DataFrame({'model_name': models, 'stl_path': [f"{m}.stl" for m in models],
+                             'stl_hash': [f"{i:064x}" for i in range(num_models)],
+                             'stl_vector': list(rng.normal(size=(num_models, 10)))})
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_path = os.path.join(tmp_dir, "logs.csv")
+        logs.to_csv(csv_path, index=False)
+        store = TrainingStore.create(os.path.join(tmp_dir, "training_store"))
+
+        start = time.perf_counter()
+        loaded = load_print_logs([csv_path])
+        t_read = time.perf_counter() - start
+        aggregated, stats = aggregate_measurements(loaded)
+        joined = join_features(aggregated, features)
+        t_aggregate = time.perf_counter() - start - t_read
+        ingest_items(store, to_store_items(joined))
+        t_total = time.perf_counter() - start
+    print(f"   Чтение CSV {t_read:.2f} с, агрегация и слияние {t_aggregate:.2f} с, "
+          f"всего с дозаписью {t_total:.2f} с -> {stats['orientations']:,} записей")
+
+
+def bench_gcode_scanner(size_mb=100):
+    """G-code: чтение целиком против заголовка/хвоста и потокового прохода"""
+    import tempfile
+    import tracemalloc
+    from gcode_scanner import extract_estimations, scan_gcode_estimations
+
+    size_mb = float(size_mb)
+    print(f"\n📜 Оценки из G-code (~{size_mb:.0f} МБ)")
+    moves = b"".join(b"G1 X%.3f Y%.3f E%.5f\n" % (i * 0.01, i * 0.02, i * 0.001) for i in range(50_000))
+    body = moves * max(1, int(size_mb * 1e6 / len(moves)))
+    header = b";FLAVOR:Marlin\n;TIME:6666\n;Filament used: 4.88m\n;LAYER_COUNT:123\nM104 S200\n"
+    footer = b"; filament used [mm] = 4880.0\n; estimated printing time (normal mode) = 1h 51m 6s\n"
+
+    def read_whole(path):
+        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+            return extract_estimations(f.read())
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, prefix, suffix in [('заголовок (Cura)', header, b""), ('хвост (PrusaSlicer)', b"", footer),
+                                     ('нет оценок', b"", b"")]:
+            gcode_path = os.path.join(tmp_dir, "big.gcode")
+            with open(gcode_path, 'wb') as f:
+                f.write(prefix)
+                f.write(body)
+                f.write(suffix)
+            for label, func in [('целиком', read_whole), ('сканер', scan_gcode_estimations)]:
+                tracemalloc.start()
+                seconds = time_call(func, gcode_path)
+                peak = tracemalloc.get_traced_memory()[1] / 1e6
+                tracemalloc.stop()
+                print(f"   {name:<20} {label:<8} {seconds * 1000:8.1f} мс, пик памяти {peak:7.1f} МБ")
+            os.remove(gcode_path)
+
+
+def bench_gcode_motion(size_mb=50):
+    """Разбор траектории G-code: пропускная способность (МБ/с)"""
+    import tempfile
+    from gcode_motion import analyze_gcode
+
+    size_mb = float(size_mb)
+    print(f"\n🧭 Траектория G-code (~{size_mb:.0f} МБ)")
+    rng = np.random.default_rng(0)
+    xy = rng.uniform(0, 220, size=(20_000, 2))
+    extrude = "".join(f"G1 X{x:.3f} Y{y:.3f} E{e:.5f}\n" for (x, y), e in zip(xy, rng.uniform(0.01, 0.2, len(xy))))
+    travel = "".join(f"G0 F6000 X{x:.3f} Y{y:.3f}\n" for x, y in xy[:2_000])
+    layer = ";TYPE:WALL-OUTER\nG1 F1800\n" + extrude + ";TYPE:FILL\n" + travel + extrude
+    num_layers = max(1, int(size_mb * 1e6 / len(layer)))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        gcode_path = os.path.join(tmp_dir, "big.gcode")
+        with open(gcode_path, 'w', encoding='utf-8') as f:
+            f.write(";FLAVOR:Marlin\nM83\nG28\n")
+            for i in range(num_layers):
+                f.write(f"G0 Z{0.2 * (i + 1):.2f}\n")
+                f.write(layer)
+        seconds = time_call(analyze_gcode, gcode_path)
+        report = analyze_gcode(gcode_path)
+    size = report['bytes'] / 1e6
+    print(f"   {report['moves']:,} перемещений, {size:.0f} МБ: {seconds:.2f} с ({size / seconds:.1f} МБ/с)")
+    print(f"   Филамент {report['filament_length_m']:.1f} м, время {report['time_minutes']:.0f} мин, "
+          f"слоев {report['layer_count']}")
+
+
+BENCHMARKS = {
+    'stl_reader': bench_stl_reader,
+    'extended_features': bench_extended_features,
+    'orientation_geometry': bench_orientation_geometry,
+    'streaming': bench_streaming,
+    'recommender': bench_recommender,
+    'orientation_search': bench_orientation_search,
+    'orientation_optimizer': bench_orientation_optimizer,
+    'slice_lite': bench_slice_lite,
+    'compiled_forest': bench_compiled_forest,
+    'model_bundle': bench_model_bundle,
+    'multi_output': bench_multi_output,
+    'training_store': bench_training_store,
+    'csv_ingest': bench_csv_ingest,
+    'gcode_scanner': bench_gcode_scanner,
+    'gcode_motion': bench_gcode_motion,
+}
+
+
+def main():
+    names = sys.argv[1:2] or list(BENCHMARKS)
+    extra_args = sys.argv[2:]
+
+    print("=" * 70)
+    print("⏱️  ЗАМЕРЫ ПРОИЗВОДИТЕЛЬНОСТИ")
+    print("=" * 70)
+
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"❌ Неизвестный замер: {name}. Доступны: {', '.join(BENCHMARKS)}")
+            return
+        BENCHMARKS[name](*extra_args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+compiled_forest.py - Лес решающих деревьев в виде плоских массивов NumPy
+
+Обученный RandomForestRegressor (или ExtraTreesRegressor / одно дерево)
+выгружается в непрерывные массивы узлов всех деревьев: feature, threshold,
+left, right, value. Вычисление идет сразу по всем деревьям и всем строкам
+пакета: на каждом шаге глубины для матрицы (деревья, строки) выбирается
+левый или правый потомок. Листья ссылаются сами на себя, поэтому хватает
+ровно max_depth шагов без масок.
+
+Предсказания побитово совпадают с model.predict: признаки приводятся к
+float32, как в sklearn, сравнение "x <= threshold" идет в float64, листья
+суммируются по деревьям в том же порядке и делятся на число деревьев.
+Для загрузки и предсказания sklearn не нужен.
+
+Выигрыш - на малых пакетах (одна модель, десятки ориентаций), где
+model.predict тратит время на проверки входа и вызов каждого дерева;
+на пакетах от тысячи строк скомпилированный обход sklearn быстрее.
+
+Экспорт всех моделей папки (model_*.pkl -> model_*.forest.npz) с проверкой:
+    python compiled_forest.py models_fixed
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+FOREST_SUFFIX = ".forest.npz"
+FOREST_FORMAT_VERSION = 1
+# Строк в одном блоке обхода: массивы (деревья, строки) остаются в кэше
+APPLY_BLOCK_ROWS = 8192
+
+
+def export_forest(model):
+    """
+    Плоские массивы леса (словарь для np.savez):
+        feature (N,) int32, threshold (N,) float64, left/right (N,) int64 -
+        глобальные номера узлов (у листа - сам лист), missing_left (N,) bool,
+        value (N, n_outputs) float64, roots (T,) int64,
+        max_depth, n_features_in, n_outputs, format_version.
+    """
+    estimators = getattr(model, 'estimators_', None)
+    if estimators is None:
+        estimators = [model]
+    trees = [estimator.tree_ for estimator in estimators]
+    if any(tree.n_classes.max() > 1 for tree in trees):
+        raise ValueError("Поддерживаются только регрессионные деревья")
+
+    counts = np.array([tree.node_count for tree in trees], dtype=np.int64)
+    roots = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+    feature, threshold, left, right, missing_left, value = [], [], [], [], [], []
+    for root, tree in zip(roots, trees):
+        is_leaf = tree.children_left < 0
+        local = np.arange(tree.node_count)
+        feature.append(np.where(is_leaf, 0, tree.feature))
+        threshold.append(np.where(is_leaf, np.inf, tree.threshold))
+        left.append(root + np.where(is_leaf, local, tree.children_left))
+        right.append(root + np.where(is_leaf, local, tree.children_right))
+        missing = getattr(tree, 'missing_go_to_left', None)
+        missing_left.append(np.zeros(tree.node_count, dtype=bool) if missing is None
+                            else np.asarray(missing, dtype=bool))
+        value.append(tree.value[:, :, 0])
+
+    return {
+        'feature': np.concatenate(feature).astype(np.int32),
+        'threshold': np.concatenate(threshold).astype(np.float64),
+        'left': np.concatenate(left).astype(np.int64),
+        'right': np.concatenate(right).astype(np.int64),
+        'missing_left': np.concatenate(missing_left),
+        'value': np.concatenate(value).astype(np.float64),
+        'roots': roots,
+        'max_depth': np.int64(max(tree.max_depth for tree in trees)),
+        'n_features_in': np.int64(getattr(model, 'n_features_in_', trees[0].n_features)),
+        'n_outputs': np.int64(trees[0].n_outputs),
+        'format_version': np.int64(FOREST_FORMAT_VERSION),
+    }
+
+
+class CompiledForest:
+    """
+    Лес из плоских массивов с интерфейсом регрессора sklearn:
+    predict(X) и n_features_in_ (подходит для OrientationRecommender).
+    """
+
+    def __init__(self, arrays):
+        version = int(arrays['format_version'])
+        if version != FOREST_FORMAT_VERSION:
+            raise ValueError(f"Неподдерживаемая версия формата леса: {version}")
+        self.feature = np.asarray(arrays['feature'], dtype=np.intp)
+        self.threshold = np.asarray(arrays['threshold'])
+        self.left = np.asarray(arrays['left'])
+        self.right = np.asarray(arrays['right'])
+        self.missing_left = np.asarray(arrays['missing_left'])
+        self.value = np.asarray(arrays['value'])
+        self.roots = np.asarray(arrays['roots'], dtype=np.intp)
+        self.max_depth = int(arrays['max_depth'])
+        self.n_features_in_ = int(arrays['n_features_in'])
+        self.n_outputs_ = int(arrays['n_outputs'])
+        self.has_missing = bool(self.missing_left.any())
+        # Потомки узла подряд: [правый, левый], индекс 2 * узел + (x <= порог)
+        self._children = np.stack([self.right, self.left], axis=1).astype(np.intp).ravel()
+
+    @classmethod
+    def from_model(cls, model):
+        return cls(export_forest(model))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls({key: data[key] for key in data.files})
+
+    def save(self, path):
+        np.savez(path, feature=self.feature.astype(np.int32), threshold=self.threshold, left=self.left,
+                 right=self.right, missing_left=self.missing_left, value=self.value,
+                 roots=self.roots, max_depth=np.int64(self.max_depth),
+                 n_features_in=np.int64(self.n_features_in_), n_outputs=np.int64(self.n_outputs_),
+                 format_version=np.int64(FOREST_FORMAT_VERSION))
+
+    def apply(self, X):
+        """Глобальные номера листьев (T, n) для каждой пары (дерево, строка)"""
+        # Как в sklearn: признаки в float32, сравнение с порогом float64
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Ожидается матрица (n, {self.n_features_in_}), получено {X.shape}")
+        # Признаки по столбцам: строки блока лежат в памяти подряд
+        X_t = np.ascontiguousarray(X.T, dtype=np.float64)
+        leaves = np.empty((len(self.roots), len(X)), dtype=np.intp)
+        for start in range(0, len(X), APPLY_BLOCK_ROWS):
+            block = X_t[:, start:start + APPLY_BLOCK_ROWS]
+            num_rows = block.shape[1]
+            flat, columns = block.ravel(), np.arange(num_rows)
+            nodes = np.repeat(self.roots[:, None], num_rows, axis=1)
+            for _ in range(self.max_depth):
+                x = np.take(flat, np.take(self.feature, nodes) * num_rows + columns)
+                go_left = x <= np.take(self.threshold, nodes)
+                if self.has_missing:
+                    go_left = np.where(np.isnan(x), np.take(self.missing_left, nodes), go_left)
+                nodes = np.take(self._children, 2 * nodes + go_left)
+            leaves[:, start:start + num_rows] = nodes
+        return leaves
+
+    def predict(self, X):
+        """Среднее по деревьям: (n,) для одной цели, (n, n_outputs) для нескольких"""
+        leaf_values = self.value[self.apply(X)]
+        # Суммирование по деревьям в порядке sklearn (y_hat += tree.predict)
+        y_hat = np.zeros(leaf_values.shape[1:])
+        for tree_values in leaf_values:
+            y_hat += tree_values
+        y_hat /= len(self.roots)
+        return y_hat[:, 0] if self.n_outputs_ == 1 else y_hat
+
+
+def forest_path(model_path):
+    """model_filament.pkl -> model_filament.forest.npz"""
+    model_path = Path(model_path)
+    return model_path.with_name(model_path.stem + FOREST_SUFFIX)
+
+
+def export_models_dir(models_dir, check_rows=1000, seed=0):
+    """
+    Экспортирует все model_*.pkl папки в .forest.npz и проверяет побитовое
+    совпадение на check_rows случайных строках. Возвращает список
+    (имя, путь или None, совпадение).
+    """
+    import joblib
+
+    rng = np.random.default_rng(seed)
+    results = []
+    for model_path in sorted(Path(models_dir).glob("model_*.pkl")):
+        try:
+            model = joblib.load(model_path)
+            forest = CompiledForest.from_model(model)
+        except (ValueError, AttributeError, ImportError, ModuleNotFoundError) as e:
+            print(f"⚠️  {model_path.name}: {e}")
+            results.append((model_path.name, None, False))
+            continue
+
+        X = rng.normal(scale=3.0, size=(check_rows, forest.n_features_in_))
+        identical = np.array_equal(forest.predict(X), model.predict(X))
+        path = forest_path(model_path)
+        forest.save(path)
+        results.append((model_path.name, path, identical))
+    return results
+
+
+def main():
+    import warnings
+    warnings.filterwarnings('ignore')
+
+    models_dir = sys.argv[1] if len(sys.argv) > 1 else "models_fixed"
+
+    print("=" * 70)
+    print("🌲 ЭКСПОРТ ЛЕСОВ В МАССИВЫ NUMPY")
+    print("=" * 70)
+
+    if not Path(models_dir).exists():
+        print(f"❌ Папка {models_dir} не найдена!")
+        return
+
+    for name, path, identical in export_models_dir(models_dir):
+        if path is None:
+            continue
+        status = "✅ совпадает побитово" if identical else "❌ предсказания отличаются"
+        print(f"   {name:<28} -> {path.name:<36} {status}")
+    print(f"💾 {models_dir}")
+
+
+if __name__ == "__main__":
+    main()
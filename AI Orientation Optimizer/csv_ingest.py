@@ -0,0 +1,232 @@
+"""
+csv_ingest.py - Массовая загрузка логов печати из CSV в хранилище
+
+CSV с колонками model_name, angle_x, angle_y, angle_z, filament_length_m,
+time_minutes (simple_3d_print_data.csv, best_orientations.csv и выгрузки
+логов печати) обрабатываются целиком операциями pandas:
+    - вырожденные строки (нулевые или пустые филамент/время) отбрасываются;
+    - повторные измерения одной ориентации (model_name + углы), включая
+      точные дубликаты строк, сводятся в одну запись: среднее меток,
+      дисперсия и число измерений;
+    - признаки STL присоединяются одним слиянием по model_name: для каждой
+      модели один раз векторизуется исходная (неповернутая) модель
+      json_files/<модель>/default/model.stl через кэш признаков.
+Результат дописывается в training_store/. Ориентация (содержимое STL +
+углы) ищется среди всех живых записей хранилища: если она уже есть из
+другого источника (training_dataset.json, синхронизация json_files/),
+запись из CSV пропускается, а прежние записи из CSV той же ориентации
+заменяются (tombstone), если метки изменились, и пропускаются, если нет.
+
+Запуск:
+    python csv_ingest.py [файл.csv ...] [--dry-run] [--workers N]
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from batch_vectorize import DEFAULT_WORKERS, vectorize_batch
+from dataset_sync import find_pairs
+from training_store import STORE_DIR, TrainingStore, open_store, orientation_key
+
+DEFAULT_CSV_FILES = ["simple_3d_print_data.csv", "best_orientations.csv"]
+JSON_BASE_PATH = "json_files"
+CSV_SOURCE = "csv_ingest"
+REFERENCE_ORIENTATION = "default"
+KEY_COLUMNS = ['model_name', 'angle_x', 'angle_y', 'angle_z']
+LABEL_COLUMNS = ['filament_length_m', 'time_minutes']
+CSV_DTYPES = {'model_name': 'string', 'angle_x': 'float64', 'angle_y': 'float64', 'angle_z': 'float64',
+              'filament_length_m': 'float64', 'time_minutes': 'float64'}
+
+
+def load_print_logs(csv_paths):
+    """Все CSV в один DataFrame (только нужные колонки, типы заданы заранее)"""
+    import pandas as pd
+
+    frames = [pd.read_csv(path, usecols=list(CSV_DTYPES), dtype=CSV_DTYPES) for path in csv_paths]
+    if not frames:
+        return pd.DataFrame({name: pd.Series(dtype=dtype) for name, dtype in CSV_DTYPES.items()})
+    return pd.concat(frames, ignore_index=True)
+
+
+def aggregate_measurements(logs):
+    """
+    Отбрасывает вырожденные строки и сводит повторные измерения.
+    Возвращает (DataFrame: KEY_COLUMNS, средние меток, filament_var,
+    time_var, measurements; статистика).
+    """
+    labels = logs[LABEL_COLUMNS]
+    valid = labels.notna().all(axis=1) & (labels > 0).all(axis=1) & logs['model_name'].notna()
+    clean = logs[valid]
+    grouped = clean.groupby(KEY_COLUMNS, sort=True, dropna=False)[LABEL_COLUMNS]
+    aggregated = grouped.mean()
+    variance = grouped.var(ddof=0)
+    aggregated['filament_var'] = variance['filament_length_m']
+    aggregated['time_var'] = variance['time_minutes']
+    aggregated['measurements'] = grouped.size()
+    aggregated = aggregated.reset_index()
+    stats = {
+        'rows': len(logs),
+        'degenerate': int((~valid).sum()),
+        'exact_duplicates': int(clean.duplicated().sum()),
+        'orientations': len(aggregated),
+        'repeated': int((aggregated['measurements'] > 1).sum()),
+    }
+    return aggregated, stats
+
+
+def reference_stl_paths(base_dir=JSON_BASE_PATH):
+    """{модель: исходный STL} - папка default с print_info.json (углы 0, 0, 0)"""
+    pairs, _ = find_pairs(base_dir)
+    references = {}
+    for key, (stl_path, _) in pairs.items():
+        parts = key.split('/')
+        if len(parts) == 2 and parts[1] == REFERENCE_ORIENTATION:
+            references[parts[0]] = Path(stl_path).as_posix()
+    return references
+
+
+def model_features(models, base_dir=JSON_BASE_PATH, workers=DEFAULT_WORKERS):
+    """
+    DataFrame признаков исходных STL моделей (model_name, stl_path,
+    stl_hash, stl_vector) и список моделей без STL или с ошибкой.
+    """
+    import pandas as pd
+
+    references = reference_stl_paths(base_dir)
+    paths = {model: references[model] for model in models if model in references}
+    vectorized, quarantine = vectorize_batch(list(paths.values()), workers=workers)
+    rows = [{'model_name': model, 'stl_path': path, 'stl_hash': vectorized[path]['stl_hash'],
+             'stl_vector': vectorized[path]['vector'].tolist()}
+            for model, path in paths.items() if path in vectorized]
+    missing = sorted(set(models) - {row['model_name'] for row in rows})
+    return pd.DataFrame(rows, columns=['model_name', 'stl_path', 'stl_hash', 'stl_vector']), missing, quarantine
+
+
+def join_features(aggregated, features):
+    """Внутреннее слияние агрегированных измерений с признаками по model_name"""
+    features = features.astype({'model_name': 'string'})
+    return aggregated.merge(features, on='model_name', how='inner', validate='many_to_one')
+
+
+def to_store_items(joined):
+    """Записи для TrainingStore.append"""
+    columns = {name: joined[name].to_numpy() for name in joined.columns}
+    # Векторы - списки float (одно преобразование на весь пакет)
+    stl_vectors = np.array(joined['stl_vector'].tolist(), dtype=np.float64).reshape(len(joined), -1).tolist()
+    return [{
+        'model_name': str(columns['model_name'][i]),
+        'stl_path': columns['stl_path'][i],
+        'stl_hash': columns['stl_hash'][i],
+        'stl_vector': stl_vectors[i],
+        'angle_x': float(columns['angle_x'][i]),
+        'angle_y': float(columns['angle_y'][i]),
+        'angle_z': float(columns['angle_z'][i]),
+        'filament_length_m': float(columns['filament_length_m'][i]),
+        'time_minutes': float(columns['time_minutes'][i]),
+        'filament_var': float(columns['filament_var'][i]),
+        'time_var': float(columns['time_var'][i]),
+        'measurements': int(columns['measurements'][i]),
+        'source': CSV_SOURCE,
+    } for i in range(len(joined))]
+
+
+def is_csv_source(source):
+    return bool(source) and (source == CSV_SOURCE or source.endswith('.csv'))
+
+
+def ingest_items(store, items):
+    """
+    Дописывает записи в хранилище. Ориентация (содержимое STL + углы; для
+    записей без stl_hash - модель + углы) ищется среди всех живых записей:
+        - есть запись другого источника - запись из CSV пропускается,
+          а записи из CSV той же ориентации удаляются как дубликаты;
+        - есть одна запись из CSV с теми же метками - без изменений;
+        - иначе прежние записи из CSV заменяются новой.
+    Возвращает (добавлено, заменено, без изменений, пропущено).
+    """
+    live = store.live_mask()
+    groups = store.group_names()
+    stl_hashes = store.column('stl_hash')
+    angles = store.column('angles')
+    filament = store.column('filament_length_m')
+    time_minutes = store.column('time_minutes')
+    existing = {}
+    for row, meta in enumerate(store.metadata()):
+        if live[row]:
+            stl_hash = stl_hashes[row].decode('ascii')
+            existing.setdefault(orientation_key(stl_hash or groups[row], angles[row]), []).append(
+                (row, is_csv_source(meta.get('source'))))
+
+    new_items, stale_rows, unchanged, skipped = [], [], 0, 0
+    for item in items:
+        item_angles = (item['angle_x'], item['angle_y'], item['angle_z'])
+        matches = (existing.pop(orientation_key(item['stl_hash'], item_angles), [])
+                   + existing.pop(orientation_key(item['model_name'], item_angles), []))
+        csv_rows = [row for row, from_csv in matches if from_csv]
+        if len(csv_rows) < len(matches):
+            # Измерение уже есть из другого источника: не дублируем
+            skipped += 1
+            stale_rows.extend(csv_rows)
+            continue
+        if len(csv_rows) == 1 and filament[csv_rows[0]] == item['filament_length_m'] \
+                and time_minutes[csv_rows[0]] == item['time_minutes']:
+            unchanged += 1
+            continue
+        stale_rows.extend(csv_rows)
+        new_items.append(item)
+    store.append(new_items, source=CSV_SOURCE)
+    store.delete(stale_rows)
+    return len(new_items), len(stale_rows), unchanged, skipped
+
+
+def main():
+    from batch_vectorize import parse_workers
+
+    csv_paths = [a for a in sys.argv[1:] if a.lower().endswith('.csv')] or DEFAULT_CSV_FILES
+    dry_run = '--dry-run' in sys.argv
+    workers = parse_workers(sys.argv)
+
+    print("=" * 70)
+    print("📥 ЗАГРУЗКА ЛОГОВ ПЕЧАТИ ИЗ CSV")
+    print("=" * 70)
+
+    missing_files = [path for path in csv_paths if not Path(path).exists()]
+    if missing_files:
+        print(f"❌ Файлы не найдены: {', '.join(missing_files)}")
+        return
+
+    start = time.perf_counter()
+    logs = load_print_logs(csv_paths)
+    aggregated, stats = aggregate_measurements(logs)
+    print(f"📊 Строк: {stats['rows']}, точных дубликатов: {stats['exact_duplicates']}, "
+          f"вырожденных (нулевые метки): {stats['degenerate']}")
+    print(f"   Ориентаций после агрегации: {stats['orientations']} "
+          f"(из них с повторными измерениями: {stats['repeated']})")
+
+    models = sorted(aggregated['model_name'].unique())
+    features, missing, quarantine = model_features(models, workers=workers)
+    joined = join_features(aggregated, features)
+    elapsed = time.perf_counter() - start
+    print(f"   Моделей: {len(models)}, с признаками STL: {len(features)}, записей: {len(joined)} "
+          f"({elapsed:.2f} с)")
+    if missing:
+        print(f"⚠️  Нет исходного STL ({JSON_BASE_PATH}/<модель>/{REFERENCE_ORIENTATION}/): {', '.join(missing)}")
+    for item in quarantine:
+        print(f"   - {item['stl_path']}: {item['error'][:80]}")
+
+    if dry_run:
+        print("\n⏭️  --dry-run: хранилище не изменено")
+        return
+
+    store = open_store(STORE_DIR) or TrainingStore.create(STORE_DIR)
+    added, replaced, unchanged, skipped = ingest_items(store, to_store_items(joined))
+    print(f"\n✅ Добавлено: {added}, удалено старых записей из CSV: {replaced}, без изменений: {unchanged}, "
+          f"уже есть из другого источника: {skipped}")
+    print(f"💾 {STORE_DIR}/ (записей: {int(store.live_mask().sum())})")
+
+
+if __name__ == "__main__":
+    main()
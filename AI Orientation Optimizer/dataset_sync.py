@@ -0,0 +1,235 @@
+"""
+dataset_sync.py - Инкрементальная синхронизация json_files/ с хранилищем
+
+Пара для обучения - папка ориентации с print_info.json и STL рядом:
+model.stl, а если его нет - единственный STL в папке (остальные файлы,
+например print_info.json.backup, не участвуют). Пары находятся за один
+проход по дереву, без перебора всех STL x JSON папки.
+
+Манифест синхронизации (training_store/sync_manifest.json) хранит для
+каждой пары размер, mtime и sha256 обоих файлов и номера строк хранилища.
+При следующем запуске файлы с прежними размером и mtime не читаются
+вовсе; при изменении stat считается хэш, и пара обрабатывается заново,
+только если изменилось содержимое. Строки измененных пар и пар, которых
+больше нет в дереве, помечаются удаленными (tombstone) в хранилище.
+Удаляются только строки, принадлежащие манифесту, и строки заменяемой
+пары - только после дозаписи замены: если STL попал в карантин, прежние
+строки остаются и принадлежат паре до следующей синхронизации.
+
+Строки, которые уже есть в хранилище (например, перенесенные из
+training_dataset.json), при первой синхронизации привязываются к своей
+паре по хэшу STL, углам и меткам, без повторной векторизации.
+"""
+
+import json
+import os
+from pathlib import Path
+
+from batch_vectorize import DEFAULT_WORKERS, vectorize_batch
+from feature_cache import hash_file
+from training_store import orientation_key
+
+SYNC_MANIFEST_NAME = "sync_manifest.json"
+SYNC_MANIFEST_VERSION = 1
+PRINT_INFO_NAME = "print_info.json"
+MODEL_STL_NAME = "model.stl"
+
+
+def find_pairs(base_dir):
+    """
+    Пары за один проход по дереву: ({ключ папки: (stl_path, json_path)},
+    [папки с print_info.json без однозначного STL]).
+    """
+    pairs = {}
+    unpaired = []
+    for root, dirs, files in os.walk(base_dir):
+        dirs.sort()
+        if PRINT_INFO_NAME not in files:
+            continue
+        stl_files = sorted(f for f in files if f.lower().endswith('.stl'))
+        if MODEL_STL_NAME in stl_files:
+            stl_file = MODEL_STL_NAME
+        elif len(stl_files) == 1:
+            stl_file = stl_files[0]
+        else:
+            unpaired.append(root)
+            continue
+        key = Path(os.path.relpath(root, base_dir)).as_posix()
+        pairs[key] = (os.path.join(root, stl_file), os.path.join(root, PRINT_INFO_NAME))
+    return pairs, unpaired
+
+
+def file_fingerprint(path, previous=None):
+    """
+    {'path', 'size', 'mtime_ns', 'sha256'}; при совпадении размера и mtime
+    с previous хэш берется из него без чтения файла.
+    """
+    stat = os.stat(path)
+    path = Path(path).as_posix()
+    if (previous and previous.get('path') == path and previous.get('size') == stat.st_size
+            and previous.get('mtime_ns') == stat.st_mtime_ns):
+        return previous
+    return {'path': path, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': hash_file(path)}
+
+
+def read_print_info(json_path):
+    """Поля записи из print_info.json (ValueError, если меток нет)"""
+    with open(json_path, 'r', encoding='utf-8') as f:
+        json_data = json.load(f)
+    angles = json_data.get("rotation_info", {}).get("angles_degrees", {})
+    estimated = json_data.get("estimated_values", {})
+    if estimated.get("filament_length_m") is None or estimated.get("time_minutes") is None:
+        raise ValueError("нет filament_length_m / time_minutes в estimated_values")
+    info = {
+        'model_name': json_data.get("model_name", "unknown"),
+        'angle_x': float(angles.get("x", 0)),
+        'angle_y': float(angles.get("y", 0)),
+        'angle_z': float(angles.get("z", 0)),
+        'filament_length_m': float(estimated["filament_length_m"]),
+        'time_minutes': float(estimated["time_minutes"]),
+    }
+    if estimated.get("printing_rate") is not None:
+        info['printing_rate'] = float(estimated["printing_rate"])
+    return info
+
+
+def load_sync_manifest(store_dir):
+    path = Path(store_dir) / SYNC_MANIFEST_NAME
+    if not path.exists():
+        return {'version': SYNC_MANIFEST_VERSION, 'pairs': {}}
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('version') != SYNC_MANIFEST_VERSION:
+        return {'version': SYNC_MANIFEST_VERSION, 'pairs': {}}
+    return manifest
+
+
+def save_sync_manifest(store_dir, manifest):
+    path = Path(store_dir) / SYNC_MANIFEST_NAME
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _existing_rows(store, owned_rows):
+    """{ключ (хэш STL, углы): строка} неудаленных строк, не привязанных к парам"""
+    live = store.live_mask()
+    stl_hashes = store.column('stl_hash')
+    angles = store.column('angles')
+    existing = {}
+    for row in range(store.num_rows):
+        stl_hash = stl_hashes[row].decode('ascii')
+        if live[row] and stl_hash and row not in owned_rows:
+            existing.setdefault(orientation_key(stl_hash, angles[row]), row)
+    return existing
+
+
+def _same_labels(store, row, info):
+    return (float(store.column('filament_length_m')[row]) == info['filament_length_m']
+            and float(store.column('time_minutes')[row]) == info['time_minutes'])
+
+
+def sync_dataset(base_dir, store, workers=DEFAULT_WORKERS):
+    """
+    Синхронизирует пары base_dir с хранилищем. Возвращает отчет:
+    added, updated, deleted, unchanged, adopted - число пар;
+    errors - [(пара, текст ошибки)], quarantine - [{'stl_path', 'error'}],
+    unpaired - папки без однозначного STL.
+    """
+    manifest = load_sync_manifest(store.path)
+    known = manifest['pairs']
+    pairs, unpaired = find_pairs(base_dir)
+    report = {'added': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0, 'adopted': 0,
+              'errors': [], 'quarantine': [], 'unpaired': unpaired}
+
+    # 1. Отпечатки: хэш считается только для файлов с новым stat
+    pending = {}
+    stale_rows = []
+    for key, (stl_path, json_path) in pairs.items():
+        previous = known.get(key, {})
+        try:
+            stl_fp = file_fingerprint(stl_path, previous.get('stl'))
+            json_fp = file_fingerprint(json_path, previous.get('json'))
+        except OSError as e:
+            report['errors'].append((key, str(e)))
+            continue
+        if previous and stl_fp['sha256'] == previous['stl'].get('sha256') \
+                and json_fp['sha256'] == previous['json'].get('sha256'):
+            # Содержимое то же (файл пересохранен или скопирован) - обновляем stat
+            known[key] = {**previous, 'stl': stl_fp, 'json': json_fp}
+            report['unchanged'] += 1
+            continue
+        pending[key] = (stl_fp, json_fp)
+
+    # 2. Пар больше нет в дереве - их строки удаляются, если на шаге 3
+    #    их не привяжет к себе или не заменит перемещенная или переименованная пара
+    manifest_rows = {int(row) for entry in known.values() for row in entry['rows']}
+    for key in [key for key in known if key not in pairs]:
+        stale_rows.extend(known.pop(key)['rows'])
+        report['deleted'] += 1
+
+    # 3. Новые и измененные пары: чтение JSON, привязка существующих строк
+    owned_rows = {row for entry in known.values() for row in entry['rows']}
+    existing = _existing_rows(store, owned_rows) if pending else {}
+    to_vectorize = {}
+    adopted_rows = set()
+    for key, (stl_fp, json_fp) in pending.items():
+        try:
+            info = read_print_info(json_fp['path'])
+        except (OSError, ValueError) as e:
+            report['errors'].append((key, str(e)))
+            continue
+        status = 'updated' if key in known else 'added'
+        # Строки, которые заменит новая запись пары (удаляются после дозаписи)
+        replaced = [int(row) for row in known.pop(key)['rows']] if key in known else []
+        angles = (info['angle_x'], info['angle_y'], info['angle_z'])
+        row = existing.pop(orientation_key(stl_fp['sha256'], angles), None)
+        if row is not None and _same_labels(store, row, info):
+            known[key] = {'stl': stl_fp, 'json': json_fp, 'rows': [int(row)]}
+            adopted_rows.add(int(row))
+            stale_rows.extend(replaced)
+            report[status] += 1
+            report['adopted'] += 1
+            continue
+        # Чужие строки (например, из csv_ingest) синхронизация не удаляет
+        if row is not None and int(row) in manifest_rows:
+            replaced.append(int(row))
+        to_vectorize[key] = (stl_fp, json_fp, info, status, replaced)
+
+    # 4. Векторизация (кэш признаков по содержимому) и дозапись в хранилище
+    hashes = {stl_fp['path']: stl_fp['sha256'] for stl_fp, _, _, _, _ in to_vectorize.values()}
+    vectorized, quarantine = vectorize_batch(list(hashes), workers=workers, hashes=hashes)
+    report['quarantine'] = quarantine
+    quarantined = {item['stl_path'] for item in quarantine}
+    new_keys, new_entries = [], []
+    kept_rows = set()
+    for key, (stl_fp, json_fp, info, status, replaced) in to_vectorize.items():
+        # Пара из карантина проверяется снова (пустые отпечатки), а заменяемые
+        # строки остаются за ней, пока замена не будет дописана
+        if stl_fp['path'] in quarantined:
+            if replaced:
+                known[key] = {'stl': {}, 'json': {}, 'rows': replaced}
+                kept_rows.update(replaced)
+            continue
+        stale_rows.extend(replaced)
+        report[status] += 1
+        result = vectorized[stl_fp['path']]
+        new_keys.append(key)
+        new_entries.append({
+            **info,
+            'stl_path': stl_fp['path'],
+            'json_path': json_fp['path'],
+            'stl_vector': result['vector'].tolist(),
+            'features': result['features'],
+            'stl_hash': result['stl_hash'],
+        })
+    rows = store.append(new_entries, source=str(base_dir))
+    for key, row in zip(new_keys, rows):
+        stl_fp, json_fp, _, _, _ = to_vectorize[key]
+        known[key] = {'stl': stl_fp, 'json': json_fp, 'rows': [int(row)]}
+    store.delete(sorted({int(row) for row in stale_rows} - adopted_rows - kept_rows))
+
+    save_sync_manifest(store.path, manifest)
+    report['rows'] = int(store.live_mask().sum())
+    return report
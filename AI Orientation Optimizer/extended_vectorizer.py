@@ -0,0 +1,152 @@
+"""
+extended_vectorizer.py - Расширенный векторизатор STL (21 признак)
+
+Признаки совпадают с stl_vectors/stl_vectors_metadata.csv: размеры,
+соотношения сторон, центр масс, выпуклость, разброс нормалей и вершин.
+Все признаки считаются редукциями NumPy по массивам граней без циклов
+Python; выпуклая оболочка строится один раз на модель.
+
+Запуск:
+    python extended_vectorizer.py [папка_с_stl] [папка_вывода]
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from orientation_geometry import DOWN_FACE_NORMAL_Z, center_of_mass, face_normals
+from stl_reader import STLReadError, compute_mesh_stats, read_stl_triangles, unique_vertices
+
+EXTENDED_VECTORIZER_VERSION = 1
+
+EXTENDED_FEATURE_NAMES = [
+    'width', 'depth', 'height', 'volume', 'area',
+    'aspect_xy', 'aspect_yz', 'aspect_xz', 'flatness',
+    'com_x', 'com_y', 'com_z',
+    'convexity', 'surface_to_volume',
+    'normals_std_x', 'normals_std_y', 'normals_std_z',
+    'down_faces_ratio',
+    'vertices_std_x', 'vertices_std_y', 'vertices_std_z',
+]
+
+
+def _safe_ratio(a, b):
+    return float(a / b) if b != 0 else 0.0
+
+
+def convex_hull_volume(vertices):
+    """Объем выпуклой оболочки (0.0 для вырожденной, например плоской, сетки)"""
+    from scipy.spatial import ConvexHull, QhullError
+
+    try:
+        return float(ConvexHull(vertices).volume)
+    except (QhullError, ValueError):
+        return 0.0
+
+
+def compute_extended_features(triangles):
+    """Вектор EXTENDED_FEATURE_NAMES (float64) для массива треугольников (N, 3, 3)"""
+    tri = np.asarray(triangles, dtype=np.float64)
+    stats = compute_mesh_stats(tri)
+    vertices = unique_vertices(tri)
+
+    width, depth, height = stats['bounds'][1] - stats['bounds'][0]
+    volume, area = stats['volume'], stats['area']
+    normals = face_normals(tri)
+
+    return np.array([
+        width, depth, height, volume, area,
+        _safe_ratio(width, depth),
+        _safe_ratio(depth, height),
+        _safe_ratio(width, height),
+        _safe_ratio(min(width, depth, height), max(width, depth, height)),
+        *center_of_mass(tri),
+        _safe_ratio(volume, convex_hull_volume(vertices)),
+        _safe_ratio(area, volume),
+        *normals.std(axis=0),
+        np.mean(normals[:, 2] < DOWN_FACE_NORMAL_Z),
+        *vertices.std(axis=0),
+    ])
+
+
+class ExtendedSTLVectorizer:
+    """Векторизатор STL с 21 признаком (формат stl_vectors)"""
+
+    def __init__(self):
+        self.feature_names = list(EXTENDED_FEATURE_NAMES)
+
+    def extract_features(self, stl_path):
+        """
+        Извлекает расширенные признаки из STL файла.
+        Возвращает словарь с ключами 'vector', 'features' и 'success'.
+        """
+        try:
+            vector = compute_extended_features(read_stl_triangles(stl_path))
+        except (STLReadError, OSError) as e:
+            print(f"  ⚠️  Ошибка анализа {stl_path}: {str(e)[:50]}...")
+            return {'vector': None, 'features': {}, 'success': False}
+
+        return {
+            'vector': vector,
+            'features': dict(zip(self.feature_names, vector.tolist())),
+            'success': True,
+        }
+
+
+def build_stl_vectors(base_dir="json_files", output_dir="stl_vectors", prefix="stl_vectors"):
+    """
+    Векторизует все STL из base_dir/<модель>/<ориентация>/ и сохраняет
+    матрицу <prefix>_features.npy (float32, M x 21) с типизированным
+    индексом и схемой (формат stl_vectors.py, открывается через mmap).
+    Возвращает (путь матрицы, путь схемы, форма).
+    """
+    from stl_vectors import save_stl_vectors
+
+    base_dir = Path(base_dir)
+    vectorizer = ExtendedSTLVectorizer()
+    vectors = []
+    rows = []
+
+    for stl_path in sorted(base_dir.rglob("*.stl")):
+        result = vectorizer.extract_features(stl_path)
+        if not result['success']:
+            continue
+
+        rel_path = stl_path.relative_to(base_dir)
+        parts = rel_path.parts
+        rows.append({
+            'vector_index': len(vectors),
+            'stl_path': (base_dir / rel_path).as_posix(),
+            'model_folder': parts[0] if len(parts) > 2 else '',
+            'orientation_folder': parts[1] if len(parts) > 2 else '',
+            'filename': stl_path.name,
+        })
+        vectors.append(result['vector'])
+
+    matrix = np.asarray(vectors, dtype=np.float32).reshape(-1, len(EXTENDED_FEATURE_NAMES))
+    features_path, _, schema_path = save_stl_vectors(matrix, rows, EXTENDED_FEATURE_NAMES, output_dir, prefix)
+    return features_path, schema_path, matrix.shape
+
+
+def main():
+    base_dir = sys.argv[1] if len(sys.argv) > 1 else "json_files"
+    output_dir = sys.argv[2] if len(sys.argv) > 2 else "stl_vectors"
+
+    print("=" * 70)
+    print("🔧 РАСШИРЕННАЯ ВЕКТОРИЗАЦИЯ STL (21 ПРИЗНАК)")
+    print("=" * 70)
+
+    if not os.path.exists(base_dir):
+        print(f"❌ Папка {base_dir} не найдена!")
+        return
+
+    features_path, schema_path, shape = build_stl_vectors(base_dir, output_dir)
+    print(f"✅ Векторов: {shape[0]} x {shape[1]}")
+    print(f"💾 {features_path}")
+    print(f"💾 {schema_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+feature_cache.py - Дисковый кэш признаков STL
+
+Ключ записи - хэш содержимого STL (sha256) плюс версия векторизатора,
+поэтому переименованный или перемещенный файл берется из кэша,
+а измененный файл пересчитывается. Размер кэша ограничен:
+при переполнении удаляются записи, которые дольше всего не читались (LRU).
+"""
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+from stl_vectorizer_fixed import VECTORIZER_VERSION, vectorizer as default_vectorizer
+
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parent / "feature_cache"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def hash_file(path):
+    """sha256 содержимого файла (читается блоками)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class FeatureCache:
+    """Кэш результатов extract_basic_features с LRU-вытеснением по размеру"""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES,
+                 version=VECTORIZER_VERSION):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        self._total_bytes = None
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _entry_path(self, content_hash, variant=''):
+        key = f"{content_hash}-v{self.version}" + (f"-{variant}" if variant else '')
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, content_hash, variant=''):
+        """Возвращает запись по хэшу содержимого или None"""
+        path = self._entry_path(content_hash, variant)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+
+        # Время изменения файла служит отметкой последнего обращения для LRU
+        os.utime(path)
+        self.hits += 1
+        return {
+            'vector': np.array(entry['vector']),
+            'features': entry['features'],
+            'success': True,
+            'stl_hash': content_hash,
+        }
+
+    def put(self, content_hash, result, variant=''):
+        """
+        Сохраняет успешный результат векторизации.
+        variant отделяет результаты разных режимов расчета (например, потокового).
+        """
+        path = self._entry_path(content_hash, variant)
+        path.parent.mkdir(exist_ok=True)
+
+        entry = {
+            'version': self.version,
+            'vector': np.asarray(result['vector'], dtype=np.float64).tolist(),
+            'features': {k: v.item() if isinstance(v, np.generic) else v
+                         for k, v in result['features'].items()},
+            'created': time.time(),
+        }
+        # Запись через временный файл, чтобы параллельные процессы не читали половину
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+
+        if self._total_bytes is not None:
+            self._total_bytes += path.stat().st_size
+        self._evict_if_needed()
+
+    def _entries(self):
+        return [p for p in self.cache_dir.glob("*/*.json") if p.is_file()]
+
+    def _evict_if_needed(self):
+        if self._total_bytes is None:
+            self._total_bytes = sum(p.stat().st_size for p in self._entries())
+        if self._total_bytes <= self.max_bytes:
+            return
+
+        entries = sorted(self._entries(), key=lambda p: p.stat().st_mtime)
+        for path in entries:
+            if self._total_bytes <= self.max_bytes:
+                break
+            try:
+                size = path.stat().st_size
+                path.unlink()
+                self._total_bytes -= size
+            except OSError:
+                continue
+
+    def clear(self):
+        """Удаляет все записи кэша"""
+        for path in self._entries():
+            path.unlink()
+        self._total_bytes = 0
+
+
+_default_cache = None
+
+
+def get_default_cache():
+    """Общий экземпляр кэша для скриптов"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = FeatureCache()
+    return _default_cache
+
+
+def extract_features_cached(stl_path, vectorizer=None, cache=None):
+    """
+    extract_basic_features с кэшем по содержимому файла.
+    В результат добавляется ключ 'stl_hash'; неудачные анализы не кэшируются.
+    """
+    vectorizer = vectorizer or default_vectorizer
+    cache = cache or get_default_cache()
+
+    content_hash = hash_file(stl_path)
+    # В потоковом режиме число вершин оценивается, такие записи хранятся отдельно
+    variant = 'stream' if vectorizer.uses_streaming(stl_path) else ''
+    cached = cache.get(content_hash, variant)
+    if cached is not None:
+        return cached
+
+    result = vectorizer.extract_basic_features(stl_path)
+    if result.get('success'):
+        cache.put(content_hash, result, variant)
+    result['stl_hash'] = content_hash
+    return result
@@ -0,0 +1,487 @@
+"""
+gcode_motion.py - Разбор траектории G-code: экструзия, перемещения, время
+
+Файл читается блоками по CHUNK_BYTES, каждый блок разбирается векторно
+(NumPy по байтам, без цикла по строкам):
+    - строки G0/G1, G90/G91, M82/M83, G92, G28 и комментарии ;TYPE:
+      находятся по первым байтам строк;
+    - параметры X, Y, Z, E, F (до ';') переводятся в числа по столбцам
+      символов сразу для всех параметров блока;
+    - координаты при абсолютном и относительном режиме (отдельно для
+      E: M82/M83) и сбросах G92/G28 - кумулятивные суммы с перезапуском.
+Результат - массивы x, y, z, e, f, type на каждое перемещение.
+
+По ним считаются фактический расход филамента (сумма приращений E),
+экструзия и холостой путь по слоям и по типам линий (;TYPE:), а время -
+по трапецеидальному профилю скорости с ограничениями принтера
+(скорости, ускорения и рывки осей, профиль Ender-3 V2 по умолчанию):
+прямой и обратный проходы планировщика - накопительные минимумы.
+
+Используется в unified_analyzer.py, если в G-code нет оценок слайсера:
+    python gcode_motion.py файл.gcode [принтер]
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from gcode_scanner import filament_grams
+
+# Параметры прошивки Creality Ender-3 V2 (M201/M203/M204/M205,
+# определение принтера в Cura). Оси: X, Y, Z, E
+PRINTER_PROFILES = {
+    'Creality Ender-3 V2': {
+        'max_feedrate': (500.0, 500.0, 5.0, 25.0),  # мм/с
+        'max_acceleration': (500.0, 500.0, 100.0, 5000.0),  # мм/с²
+        'print_acceleration': 500.0,
+        'travel_acceleration': 500.0,
+        'retract_acceleration': 500.0,
+        'max_jerk': (10.0, 10.0, 0.4, 5.0),  # мм/с
+        'default_feedrate': 1500.0,  # мм/мин до первого F
+    },
+}
+DEFAULT_PRINTER = 'Creality Ender-3 V2'
+MOTION_SOURCE = "gcode_motion"
+
+# Блок около 2 МБ: рабочие массивы разбора помещаются в кэш процессора
+CHUNK_BYTES = 2 * 1024 * 1024
+# Наибольшая длина числа параметра (символов после буквы оси)
+NUMBER_WIDTH = 16
+# Последние перемещения блока ждут следующего блока: их скорости
+# на стыках зависят от того, что дальше (как буфер планировщика)
+PLANNER_HOLD_MOVES = 64
+# Перемещения короче (мм) считаются нулевыми
+MIN_MOVE_MM = 1e-9
+# Шаг округления высоты слоя, мм
+LAYER_Z_DECIMALS = 3
+
+AXES = 'XYZEF'
+# Типы строк
+MOVE, ABSOLUTE, RELATIVE, SET_POSITION, HOME, E_ABSOLUTE, E_RELATIVE, LINE_TYPE = range(1, 9)
+PARAMETER_KINDS = (MOVE, SET_POSITION, HOME)
+
+_AXIS_CODE = np.full(256, -1, dtype=np.int8)
+for _i, _letter in enumerate(AXES):
+    _AXIS_CODE[ord(_letter)] = _i
+_NUMBER_CHAR = np.zeros(256, dtype=bool)
+_NUMBER_CHAR[[ord(c) for c in '0123456789.-+']] = True
+_DIGIT = np.zeros(256, dtype=bool)
+_DIGIT[[ord(c) for c in '0123456789.']] = True
+_TYPE_PREFIX = np.frombuffer(b'TYPE:', dtype=np.uint8)
+_POW10 = 10.0 ** np.arange(NUMBER_WIDTH + 1)
+
+
+def printer_profile(name=None):
+    """Профиль принтера по имени (из cura_settings.json), иначе Ender-3 V2"""
+    return PRINTER_PROFILES.get(name or DEFAULT_PRINTER, PRINTER_PROFILES[DEFAULT_PRINTER])
+
+
+def iter_chunks(gcode_path, chunk_bytes=CHUNK_BYTES):
+    """Блоки файла из целых строк (каждый заканчивается '\\n')"""
+    carry = b''
+    with open(gcode_path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_bytes)
+            if not chunk:
+                break
+            cut = chunk.rfind(b'\n') + 1
+            if not cut:
+                carry += chunk
+                continue
+            yield carry + chunk[:cut]
+            carry = chunk[cut:]
+    if carry:
+        yield carry + b'\n'
+
+
+def parse_numbers(padded, begin):
+    """
+    Десятичные числа, начинающиеся с позиций begin буфера padded (uint8,
+    дополнен нулями). Разбор по столбцам символов: целая мантисса по схеме
+    Горнера и одно деление на 10^(знаков после точки) - результат совпадает
+    с float(). Пустые и нечисловые значения - NaN.
+    """
+    mantissa = np.zeros(len(begin), dtype=np.int64)
+    decimals = np.zeros(len(begin), dtype=np.int64)
+    has_digits = np.zeros(len(begin), dtype=bool)
+    alive = np.ones(len(begin), dtype=bool)
+    after_dot = np.zeros(len(begin), dtype=bool)
+    negative = padded[begin] == ord('-')
+    for column in range(NUMBER_WIDTH):
+        char = padded[begin + column]
+        alive &= _NUMBER_CHAR[char]
+        if not alive.any():
+            break
+        digit = char - np.uint8(ord('0'))
+        is_digit = alive & (digit <= 9)
+        after_dot |= alive & (char == ord('.'))
+        mantissa = np.where(is_digit, mantissa * 10 + digit, mantissa)
+        decimals += is_digit & after_dot
+        has_digits |= is_digit
+    values = mantissa / _POW10[decimals]
+    values[negative] = -values[negative]
+    values[~has_digits] = np.nan
+    # Числа длиннее NUMBER_WIDTH (в G-code не встречаются) - по одному
+    for i in np.flatnonzero(alive & _NUMBER_CHAR[padded[begin + NUMBER_WIDTH]]):
+        end = begin[i]
+        while _NUMBER_CHAR[padded[end]]:
+            end += 1
+        try:
+            values[i] = float(padded[begin[i]:end].tobytes())
+        except ValueError:
+            values[i] = np.nan
+    return values
+
+
+def tokenize_chunk(chunk):
+    """
+    Значимые строки блока: (типы строк (R,), значения XYZEF (5, R) с NaN,
+    наличие параметров (5, R), имена ;TYPE: в порядке строк LINE_TYPE).
+    """
+    buf = np.frombuffer(chunk, dtype=np.uint8)
+    padded = np.concatenate([buf, np.zeros(NUMBER_WIDTH + 8, dtype=np.uint8)])
+    ends = np.flatnonzero(buf == ord('\n'))
+    starts = np.concatenate([[0], ends[:-1] + 1])
+
+    # 1. Команда - по первым байтам строки
+    c0, c1, c2, c3 = (padded[starts + k] for k in range(4))
+    g = c0 == ord('G')
+    m = c0 == ord('M')
+    end2, end3 = ~_DIGIT[c2], ~_DIGIT[c3]
+    kind = np.zeros(len(starts), dtype=np.int8)
+    kind[g & ((c1 == ord('0')) | (c1 == ord('1'))) & end2] = MOVE
+    kind[g & (c1 == ord('9')) & (c2 == ord('0')) & end3] = ABSOLUTE
+    kind[g & (c1 == ord('9')) & (c2 == ord('1')) & end3] = RELATIVE
+    kind[g & (c1 == ord('9')) & (c2 == ord('2')) & end3] = SET_POSITION
+    kind[g & (c1 == ord('2')) & (c2 == ord('8')) & end3] = HOME
+    kind[m & (c1 == ord('8')) & (c2 == ord('2')) & end3] = E_ABSOLUTE
+    kind[m & (c1 == ord('8')) & (c2 == ord('3')) & end3] = E_RELATIVE
+    comments = np.flatnonzero(c0 == ord(';'))
+    prefix = padded[starts[comments][:, None] + np.arange(1, 1 + len(_TYPE_PREFIX))]
+    type_lines = comments[(prefix == _TYPE_PREFIX).all(axis=1)]
+    kind[type_lines] = LINE_TYPE
+
+    records = np.flatnonzero(kind)
+    record_of_line = np.full(len(starts), -1, dtype=np.int64)
+    record_of_line[records] = np.arange(len(records))
+    values = np.full((len(AXES), len(records)), np.nan)
+    present = np.zeros((len(AXES), len(records)), dtype=bool)
+
+    # 2. Параметры: буквы осей в строках с параметрами, до комментария
+    pos = np.flatnonzero(_AXIS_CODE[buf] >= 0)
+    line = np.searchsorted(ends, pos)
+    semicolons = np.flatnonzero(buf == ord(';'))
+    first = np.searchsorted(semicolons, starts)
+    comment_start = np.append(semicolons, len(buf))[first]
+    keep = np.isin(kind[line], PARAMETER_KINDS) & (pos < np.minimum(comment_start, ends)[line])
+    pos, line = pos[keep], line[keep]
+    rows, axes = record_of_line[line], _AXIS_CODE[buf[pos]]
+    values[axes, rows] = parse_numbers(padded, pos + 1)
+    present[axes, rows] = True
+
+    type_names = [chunk[s + 1 + len(_TYPE_PREFIX):e].strip().decode('utf-8', 'ignore')
+                  for s, e in zip(starts[type_lines], ends[type_lines])]
+    return kind[records], values, present, type_names
+
+
+class MotionState:
+    """Состояние разбора между блоками: позиция, режимы, F, тип линии"""
+
+    def __init__(self, profile):
+        self.position = np.zeros(4)
+        self.absolute_xyz = True
+        self.absolute_e = True
+        self.feedrate = profile['default_feedrate']
+        self.line_type = -1
+        self.type_codes = {}
+
+
+def _forward_fill(mask, values, initial):
+    """values[i] из последней строки с mask до i включительно, иначе initial"""
+    last = np.where(mask, np.arange(len(mask)), -1)
+    np.maximum.accumulate(last, out=last)
+    return np.where(last >= 0, values[np.maximum(last, 0)], initial)
+
+
+def moves_from_records(kinds, values, present, type_names, state):
+    """
+    Перемещения блока: словарь массивов x, y, z, e (после перемещения),
+    f (мм/мин), type (код ;TYPE:, -1 - неизвестен), dx, dy, dz, de.
+    state обновляется для следующего блока.
+    """
+    n = len(kinds)
+    index = np.arange(n)
+    is_move = kinds == MOVE
+    mode_xyz = (kinds == ABSOLUTE) | (kinds == RELATIVE)
+    absolute_xyz = _forward_fill(mode_xyz, kinds == ABSOLUTE, state.absolute_xyz)
+    absolute_e = _forward_fill(mode_xyz | (kinds == E_ABSOLUTE) | (kinds == E_RELATIVE),
+                               (kinds == ABSOLUTE) | (kinds == E_ABSOLUTE), state.absolute_e)
+    home_all = (kinds == HOME) & ~present[:3].any(axis=0)
+
+    # Позиция: абсолютные значения и G92/G28 - перезапуск суммы приращений
+    positions = np.empty((4, n))
+    for axis in range(4):
+        given = present[axis] & ~np.isnan(values[axis])
+        absolute = absolute_e if axis == 3 else absolute_xyz
+        reset = (is_move & given & absolute) | ((kinds == SET_POSITION) & given)
+        reset_value = values[axis].copy()
+        if axis < 3:
+            home = (kinds == HOME) & (present[axis] | home_all)
+            reset |= home
+            reset_value[home] = 0.0
+        offsets = np.cumsum(np.where(is_move & given & ~absolute, values[axis], 0.0))
+        last = np.where(reset, index, -1)
+        np.maximum.accumulate(last, out=last)
+        safe_last = np.maximum(last, 0)
+        base = np.where(last >= 0, reset_value[safe_last] - offsets[safe_last], state.position[axis])
+        positions[axis] = base + offsets
+
+    feed_given = is_move & present[4] & ~np.isnan(values[4])
+    feedrate = _forward_fill(feed_given, values[4], state.feedrate)
+    codes = np.array([state.type_codes.setdefault(name, len(state.type_codes)) for name in type_names],
+                     dtype=np.int64)
+    type_values = np.full(n, -1, dtype=np.int64)
+    type_values[kinds == LINE_TYPE] = codes
+    line_type = _forward_fill(kinds == LINE_TYPE, type_values, state.line_type)
+
+    moves = np.flatnonzero(is_move)
+    end = positions[:, moves]
+    delta = end - np.where(moves > 0, positions[:, moves - 1], state.position[:, None])
+    result = {
+        'x': end[0], 'y': end[1], 'z': end[2], 'e': end[3],
+        'f': feedrate[moves], 'type': line_type[moves].astype(np.int16),
+        'dx': delta[0], 'dy': delta[1], 'dz': delta[2], 'de': delta[3],
+    }
+    if n:
+        state.position = positions[:, -1].copy()
+        state.absolute_xyz = bool(absolute_xyz[-1])
+        state.absolute_e = bool(absolute_e[-1])
+        state.feedrate = float(feedrate[-1])
+        state.line_type = int(line_type[-1])
+    return result
+
+
+def iter_moves(gcode_path, printer=None, chunk_bytes=CHUNK_BYTES):
+    """Перемещения файла блоками: (словарь массивов, MotionState)"""
+    state = MotionState(printer_profile(printer))
+    for chunk in iter_chunks(gcode_path, chunk_bytes):
+        yield moves_from_records(*tokenize_chunk(chunk), state), state
+
+
+class KinematicPlanner:
+    """
+    Время перемещений по трапецеидальному профилю скорости.
+    Скорость на стыке ограничена рывком осей (classic jerk), разгон и
+    торможение - ускорением; прямой проход (успеть разогнаться) и
+    обратный (успеть затормозить) считаются накопительными минимумами
+    квадратов скоростей. Последние PLANNER_HOLD_MOVES перемещений
+    досчитываются со следующим блоком.
+    """
+
+    def __init__(self, profile):
+        self.max_feedrate = np.asarray(profile['max_feedrate'], dtype=np.float64)[:, None]
+        self.max_acceleration = np.asarray(profile['max_acceleration'], dtype=np.float64)[:, None]
+        self.max_jerk = np.asarray(profile['max_jerk'], dtype=np.float64)[:, None]
+        self.print_acceleration = profile['print_acceleration']
+        self.travel_acceleration = profile['travel_acceleration']
+        self.retract_acceleration = profile['retract_acceleration']
+        self.pending = None
+        self.start_speed2 = None
+
+    def _segments(self, moves, payload):
+        """Длина, скорость, ускорение, направление и безопасная скорость перемещений"""
+        length_xyz = np.sqrt(moves['dx'] ** 2 + moves['dy'] ** 2 + moves['dz'] ** 2)
+        e_only = length_xyz <= MIN_MOVE_MM
+        length = np.where(e_only, np.abs(moves['de']), length_xyz)
+        keep = np.flatnonzero(length > MIN_MOVE_MM)
+        length, e_only = length[keep], e_only[keep]
+        # Оси - строки (4, N): покомпонентные операции по непрерывным массивам
+        direction = np.stack([moves[key][keep] for key in ('dx', 'dy', 'dz', 'de')]) / length
+        unit = np.abs(direction)
+
+        speed = np.maximum(moves['f'][keep] / 60.0, 1e-3)
+        speed = np.minimum(speed, 1.0 / np.max(unit / self.max_feedrate, axis=0))
+        acceleration = np.where(e_only, self.retract_acceleration,
+                                np.where(direction[3] > 0, self.print_acceleration, self.travel_acceleration))
+        acceleration = np.minimum(acceleration, 1.0 / np.max(unit / self.max_acceleration, axis=0))
+        # Скорость, с которой перемещение можно начать с места (рывок осей)
+        safe = np.minimum(speed, 1.0 / np.max(unit / self.max_jerk, axis=0))
+        return {'length': length, 'speed': speed, 'acceleration': acceleration,
+                'direction': direction, 'safe': safe, 'payload': payload[keep]}
+
+    def add(self, moves, payload, final=False):
+        """
+        Добавляет перемещения блока (payload - значение для каждого, например
+        слой). Возвращает (время, payload) досчитанных перемещений.
+        """
+        segments = self._segments(moves, payload)
+        if self.pending is not None:
+            segments = {key: np.concatenate([self.pending[key], segments[key]], axis=-1) for key in segments}
+        n = len(segments['length'])
+        if n == 0:
+            return np.zeros(0), segments['payload']
+        length, speed = segments['length'], segments['speed']
+        acceleration, direction, safe = segments['acceleration'], segments['direction'], segments['safe']
+
+        # Предел скорости на стыках: рывок каждой оси при смене направления
+        junction_speed = np.minimum(speed[:-1], speed[1:])
+        with np.errstate(divide='ignore'):
+            jerk = np.abs(direction[:, :-1] - direction[:, 1:]) * junction_speed
+            factor = np.minimum(1.0, np.min(self.max_jerk / jerk, axis=0))
+        junction = np.maximum(junction_speed * factor, np.minimum(safe[:-1], safe[1:]))
+        start = safe[0] ** 2 if self.start_speed2 is None else self.start_speed2
+        cap2 = np.concatenate([[min(start, speed[0] ** 2)], junction ** 2])
+
+        # Прямой и обратный проходы: v_i² <= v_(i-1)² + 2·a·L
+        reach = np.concatenate([[0.0], np.cumsum(2.0 * acceleration * length)])
+        entry2 = np.minimum.accumulate(cap2 - reach[:-1]) + reach[:-1]
+        end2 = safe[-1] ** 2 if final else speed[-1] ** 2
+        limits = np.append(entry2, end2) + reach
+        speeds2 = np.minimum.accumulate(limits[::-1])[::-1] - reach
+
+        v0, v1 = np.sqrt(np.maximum(speeds2[:-1], 0)), np.sqrt(np.maximum(speeds2[1:], 0))
+        accel_distance = (speed ** 2 - v0 ** 2) / (2 * acceleration)
+        decel_distance = (speed ** 2 - v1 ** 2) / (2 * acceleration)
+        cruise = length - accel_distance - decel_distance
+        peak = np.where(cruise >= 0, speed,
+                        np.minimum(speed, np.sqrt((2 * acceleration * length + v0 ** 2 + v1 ** 2) / 2)))
+        times = (peak - v0) / acceleration + (peak - v1) / acceleration + np.maximum(cruise, 0) / speed
+
+        done = n if final else max(0, n - PLANNER_HOLD_MOVES)
+        self.pending = {key: value[..., done:] for key, value in segments.items()}
+        self.start_speed2 = float(speeds2[done]) if done < n else None
+        return times[:done], segments['payload'][:done]
+
+
+def _accumulate(totals, keys, values):
+    """
+    totals[ключ] += сумма values по ключам (ключ NaN -> None). Ключи
+    (слой, тип линии) меняются редко - суммы по участкам постоянства.
+    """
+    if not len(keys):
+        return
+    same = (keys[1:] == keys[:-1]) | (np.isnan(keys[1:]) & np.isnan(keys[:-1]))
+    runs = np.concatenate([[0], np.flatnonzero(~same) + 1])
+    for key, value in zip(keys[runs].tolist(), np.add.reduceat(values, runs).tolist()):
+        key = None if key != key else key
+        totals[key] = totals.get(key, 0.0) + value
+
+
+def analyze_gcode(gcode_path, printer=None, chunk_bytes=CHUNK_BYTES):
+    """
+    Полный разбор траектории. Возвращает словарь: filament_length_m и
+    material_g (по сумме приращений E), extrusion_mm, travel_mm,
+    time_minutes (планировщик), layer_count, layers (z, extrusion_mm,
+    travel_mm, time_s - массивы по слоям), extrusion_by_type, moves,
+    bytes, parse_seconds, printer.
+    """
+    start = time.perf_counter()
+    profile = printer_profile(printer)
+    planner = KinematicPlanner(profile)
+    state = MotionState(profile)
+    layer_z = np.nan
+    extrusion, travel, layer_time, by_type = {}, {}, {}, {}
+    num_moves, total_time = 0, 0.0
+
+    chunks = iter_chunks(gcode_path, chunk_bytes)
+    chunk = next(chunks, None)
+    while chunk is not None:
+        moves = moves_from_records(*tokenize_chunk(chunk), state)
+        chunk = next(chunks, None)
+        num_moves += len(moves['de'])
+
+        # Слой - высота последнего перемещения с экструзией
+        length_xyz = np.sqrt(moves['dx'] ** 2 + moves['dy'] ** 2 + moves['dz'] ** 2)
+        extruding = (moves['de'] > 0) & (length_xyz > MIN_MOVE_MM)
+        layers = _forward_fill(extruding, np.round(moves['z'], LAYER_Z_DECIMALS), layer_z)
+        if len(layers):
+            layer_z = layers[-1]
+
+        _accumulate(extrusion, layers, moves['de'])
+        _accumulate(travel, layers, np.where(extruding, 0.0, length_xyz))
+        _accumulate(by_type, moves['type'].astype(np.float64), moves['de'])
+        times, time_layers = planner.add(moves, layers, final=chunk is None)
+        _accumulate(layer_time, time_layers, times)
+        total_time += float(times.sum())
+
+    # Перемещения до первой экструзии (прогрев, подъезд) - в первый слой
+    heights = sorted(key for key in set(extrusion) | set(layer_time) if key is not None)
+    if heights:
+        for totals in (extrusion, travel, layer_time):
+            if None in totals:
+                totals[heights[0]] = totals.get(heights[0], 0.0) + totals.pop(None)
+    type_names = {code: name for name, code in state.type_codes.items()}
+    extrusion_mm = float(sum(extrusion.values()))
+    return {
+        'filament_length_m': extrusion_mm / 1000,
+        'material_g': filament_grams(extrusion_mm / 1000),
+        'extrusion_mm': extrusion_mm,
+        'travel_mm': float(sum(travel.values())),
+        'time_minutes': total_time / 60,
+        'layer_count': sum(1 for z in heights if extrusion.get(z, 0.0) > 0),
+        'layers': {
+            'z': np.array(heights),
+            'extrusion_mm': np.array([extrusion.get(z, 0.0) for z in heights]),
+            'travel_mm': np.array([travel.get(z, 0.0) for z in heights]),
+            'time_s': np.array([layer_time.get(z, 0.0) for z in heights]),
+        },
+        'extrusion_by_type': {type_names.get(int(code) if code is not None else -1, 'UNKNOWN'): mm
+                              for code, mm in by_type.items()},
+        'moves': num_moves,
+        'bytes': Path(gcode_path).stat().st_size,
+        'parse_seconds': time.perf_counter() - start,
+        'printer': printer if printer in PRINTER_PROFILES else DEFAULT_PRINTER,
+    }
+
+
+def motion_estimations(report):
+    """Оценки в формате unified_analyzer.py по результату analyze_gcode"""
+    return {
+        'time_minutes': report['time_minutes'],
+        'material_g': report['material_g'],
+        'layer_count': report['layer_count'],
+        'filament_length_m': report['filament_length_m'],
+        'success': report['moves'] > 0 and report['extrusion_mm'] > 0,
+        'source': MOTION_SOURCE,
+    }
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Использование: python gcode_motion.py файл.gcode [принтер]")
+        return
+    gcode_path = sys.argv[1]
+    printer = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_PRINTER
+
+    print("=" * 70)
+    print("🧭 РАЗБОР ТРАЕКТОРИИ G-CODE")
+    print("=" * 70)
+    if not Path(gcode_path).exists():
+        print(f"❌ Файл {gcode_path} не найден!")
+        return
+    if printer not in PRINTER_PROFILES:
+        print(f"⚠️  Профиль '{printer}' неизвестен, используется {DEFAULT_PRINTER}")
+
+    report = analyze_gcode(gcode_path, printer)
+    size_mb = report['bytes'] / 1e6
+    print(f"📊 Перемещений: {report['moves']:,}, {size_mb:.1f} МБ за {report['parse_seconds']:.2f} с "
+          f"({size_mb / max(report['parse_seconds'], 1e-9):.1f} МБ/с)")
+    print(f"   Филамент: {report['filament_length_m']:.2f} м ({report['material_g']:.1f} г), "
+          f"холостой путь: {report['travel_mm'] / 1000:.1f} м")
+    print(f"   Время (трапеции, {report['printer']}): {report['time_minutes']:.1f} мин, "
+          f"слоев: {report['layer_count']}")
+    for name, mm in sorted(report['extrusion_by_type'].items(), key=lambda item: -item[1]):
+        if mm > 0:
+            print(f"   {name:<20} {mm / 1000:8.2f} м")
+
+    from gcode_scanner import scan_gcode_estimations
+    estimations, _ = scan_gcode_estimations(gcode_path)
+    if estimations['success']:
+        print(f"🎯 Оценка слайсера: {estimations['time_minutes']:.1f} мин, "
+              f"{estimations['filament_length_m']:.2f} м")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""
+gcode_scanner.py - Потоковое чтение оценок слайсера из G-code
+
+Оценки печати слайсер пишет комментариями: Cura - в заголовке
+(;TIME:, ;Filament used:, ;LAYER_COUNT:), PrusaSlicer/OrcaSlicer - в
+конце файла (; estimated printing time, ; filament used [mm],
+; total layers count). Поэтому файл не читается целиком:
+    1. начало файла (HEAD_BYTES) в двоичном режиме;
+    2. если найдены не все поля - конец файла (TAIL_BYTES) через seek;
+    3. если и там нет времени или филамента - потоковый проход по файлу
+       блоками по 1 МБ с остановкой, как только найдены все поля; строки
+       длиннее MAX_LINE_BYTES пропускаются, не накапливаясь в памяти.
+Память не зависит от размера файла, время на обычный файл - два чтения
+по 64-128 КБ. Разбираются только строки-комментарии (начинаются с ';').
+"""
+
+import math
+import re
+import sys
+from pathlib import Path
+
+HEAD_BYTES = 64 * 1024
+# Хвост больше заголовка: за оценками PrusaSlicer идет дамп настроек
+TAIL_BYTES = 128 * 1024
+# Блок потокового прохода по всему файлу
+STREAM_CHUNK_BYTES = 1024 * 1024
+# Строка длиннее (двоичные данные, миниатюры без переводов строк) не копится
+# в памяти, а пропускается до перевода строки: комментарии с оценками короткие
+MAX_LINE_BYTES = STREAM_CHUNK_BYTES
+GCODE_KEYWORDS = (b'G1', b'G0', b'G28', b'M104', b'M140')
+ESTIMATION_FIELDS = ('time', 'filament', 'layers')
+# Без них оценка неполная и нужен проход по всему файлу;
+# числа слоев может не быть вовсе - ради него весь файл не читается
+REQUIRED_FIELDS = ('time', 'filament')
+
+# Пересчет длины филамента в граммы (как раньше в unified_analyzer.py)
+FILAMENT_DIAMETER_MM = 1.75
+FILAMENT_DENSITY = 1.25  # г/см³
+
+# Строки-комментарии блока ищутся одним регулярным выражением (в C)
+_COMMENT_LINE_RE = re.compile(rb'^[ \t]*(;[^\r\n]*)', re.MULTILINE)
+_CURA_FILAMENT_RE = re.compile(r'([\d.]+)\s*m')
+_NUMBER_RE = re.compile(r'(\d+)')
+_PRINT_TIME_MIN_RE = re.compile(r'(\d+)\s*min', re.IGNORECASE)
+_PRUSA_TIME_RE = re.compile(r'^;\s*estimated printing time \(normal mode\)\s*=\s*(.+)$')
+_PRUSA_DURATION_RE = re.compile(r'(\d+)\s*([dhms])')
+_PRUSA_FILAMENT_RE = re.compile(r'^;\s*filament used \[(mm|m)\]\s*=\s*(.+)$')
+_PRUSA_LAYERS_RE = re.compile(r'^;\s*total layers? count\s*=\s*(\d+)')
+_DURATION_MINUTES = {'d': 1440.0, 'h': 60.0, 'm': 1.0, 's': 1.0 / 60}
+
+
+def empty_estimations():
+    """Пустые оценки (формат unified_analyzer.py)"""
+    return {
+        'time_minutes': 0,
+        'material_g': 0.0,
+        'layer_count': 0,
+        'filament_length_m': 0.0,
+        'success': False
+    }
+
+
+def filament_grams(filament_m):
+    """Масса филамента по длине в метрах"""
+    radius_cm = FILAMENT_DIAMETER_MM / 20
+    return filament_m * 100 * math.pi * radius_cm ** 2 * FILAMENT_DENSITY
+
+
+def _set_time(estimations, found, minutes):
+    estimations['time_minutes'] = minutes
+    estimations['success'] = True
+    found.add('time')
+
+
+def _set_filament(estimations, found, filament_m):
+    estimations['filament_length_m'] = filament_m
+    estimations['material_g'] = filament_grams(filament_m)
+    estimations['success'] = True
+    found.add('filament')
+
+
+def parse_estimation_line(line, estimations, found):
+    """
+    Разбирает одну строку-комментарий (уже без пробелов по краям).
+    Уже найденные поля (found) не перезаписываются: заголовок
+    приоритетнее хвоста.
+    """
+    if 'time' not in found:
+        if line.startswith(';TIME:'):
+            time_str = line[6:].strip()
+            try:
+                if ':' in time_str:  # Формат HH:MM:SS
+                    parts = time_str.split(':')
+                    if len(parts) == 3:
+                        h, m, s = map(int, parts)
+                        _set_time(estimations, found, h * 60 + m + s / 60)
+                else:  # Секунды
+                    _set_time(estimations, found, float(time_str) / 60)
+            except ValueError:
+                pass
+            return
+        if ';Print time:' in line:
+            match = _PRINT_TIME_MIN_RE.search(line)
+            if match:
+                _set_time(estimations, found, int(match.group(1)))
+            return
+        match = _PRUSA_TIME_RE.match(line)
+        if match:
+            parts = _PRUSA_DURATION_RE.findall(match.group(1))
+            if parts:
+                _set_time(estimations, found, sum(int(v) * _DURATION_MINUTES[u] for v, u in parts))
+            return
+
+    if 'filament' not in found:
+        if ';Filament used:' in line:
+            match = _CURA_FILAMENT_RE.search(line)
+            if match:
+                try:
+                    _set_filament(estimations, found, float(match.group(1)))
+                except ValueError:
+                    pass
+            return
+        match = _PRUSA_FILAMENT_RE.match(line)
+        if match:
+            # Несколько экструдеров - значения через запятую
+            try:
+                total = sum(float(v) for v in match.group(2).split(',') if v.strip())
+            except ValueError:
+                return
+            _set_filament(estimations, found, total / 1000 if match.group(1) == 'mm' else total)
+            return
+
+    if 'layers' not in found:
+        if ';LAYER_COUNT:' in line or ';Layer count:' in line:
+            match = _NUMBER_RE.search(line)
+        else:
+            match = _PRUSA_LAYERS_RE.match(line)
+        if match:
+            estimations['layer_count'] = int(match.group(1))
+            found.add('layers')
+
+
+def _scan_block(block, estimations, found):
+    """Разбирает комментарии двоичного блока; True, если найдены все поля"""
+    for match in _COMMENT_LINE_RE.finditer(block):
+        parse_estimation_line(match.group(1).decode('utf-8', 'ignore').strip(), estimations, found)
+        if len(found) == len(ESTIMATION_FIELDS):
+            return True
+    return False
+
+
+def _has_keywords(block):
+    return any(keyword in block for keyword in GCODE_KEYWORDS)
+
+
+def extract_estimations(content):
+    """Оценки из текста G-code, уже прочитанного в память"""
+    estimations, found = empty_estimations(), set()
+    for line in content.split('\n'):
+        line = line.strip()
+        if line.startswith(';'):
+            parse_estimation_line(line, estimations, found)
+            if len(found) == len(ESTIMATION_FIELDS):
+                break
+    return estimations
+
+
+def scan_gcode_estimations(gcode_path, head_bytes=HEAD_BYTES, tail_bytes=TAIL_BYTES):
+    """
+    Оценки слайсера из файла без чтения его целиком.
+    Возвращает (оценки, сведения о чтении: is_gcode - есть ли команды
+    G-code, mode - 'head', 'head+tail' или 'full', bytes_read).
+    """
+    estimations, found = empty_estimations(), set()
+    size = Path(gcode_path).stat().st_size
+    scan = {'is_gcode': False, 'mode': 'head', 'bytes_read': 0}
+
+    with open(gcode_path, 'rb') as f:
+        if size <= head_bytes + tail_bytes:
+            # Небольшой файл - одно чтение
+            block = f.read()
+            scan['bytes_read'] = len(block)
+            scan['is_gcode'] = _has_keywords(block)
+            _scan_block(block, estimations, found)
+            return estimations, scan
+
+        # 1. Заголовок: только целые строки
+        head = f.read(head_bytes)
+        head_end = head.rfind(b'\n') + 1
+        scan['bytes_read'] = len(head)
+        scan['is_gcode'] = _has_keywords(head)
+        if _scan_block(head[:head_end], estimations, found) and scan['is_gcode']:
+            return estimations, scan
+
+        # 2. Хвост: первая (обрезанная) строка отбрасывается
+        f.seek(size - tail_bytes)
+        tail = f.read()
+        scan['bytes_read'] += len(tail)
+        scan['mode'] = 'head+tail'
+        scan['is_gcode'] = scan['is_gcode'] or _has_keywords(tail)
+        _scan_block(tail[tail.find(b'\n') + 1:], estimations, found)
+        if scan['is_gcode'] and all(field in found for field in REQUIRED_FIELDS):
+            return estimations, scan
+
+        # 3. Проход по всему файлу после заголовка блоками (память O(блок))
+        scan['mode'] = 'full'
+        f.seek(head_end)
+        carry = b''
+        # Начало блока - продолжение пропускаемой длинной строки
+        skip_line = False
+        while True:
+            chunk = f.read(STREAM_CHUNK_BYTES)
+            scan['bytes_read'] += len(chunk)
+            if not chunk:
+                block = b'' if skip_line else carry
+            else:
+                # Неполная последняя строка переходит в следующий блок
+                cut = chunk.rfind(b'\n') + 1
+                if cut:
+                    block, carry = carry + chunk[:cut], chunk[cut:]
+                    if skip_line:
+                        block, skip_line = block[block.find(b'\n') + 1:], False
+                else:
+                    block, carry = b'', carry + chunk
+                if len(carry) > MAX_LINE_BYTES:
+                    carry, skip_line = b'', True
+            scan['is_gcode'] = scan['is_gcode'] or _has_keywords(block)
+            if (_scan_block(block, estimations, found) and scan['is_gcode']) or not chunk:
+                break
+    return estimations, scan
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Использование: python gcode_scanner.py файл.gcode [...]")
+        return
+
+    for path in sys.argv[1:]:
+        try:
+            estimations, scan = scan_gcode_estimations(path)
+        except OSError as e:
+            print(f"❌ {path}: {e}")
+            continue
+        status = "✅" if estimations['success'] and scan['is_gcode'] else "⚠️ "
+        print(f"{status} {path}: {estimations['time_minutes']:.0f} мин, "
+              f"{estimations['filament_length_m']:.2f} м ({estimations['material_g']:.1f} г), "
+              f"слоев {estimations['layer_count']} | чтение: {scan['mode']}, "
+              f"{scan['bytes_read'] / 1024:.0f} КБ")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+incremental_training.py - Дообучение пакета моделей на новых записях датасета
+
+Пакет (model_bundle) хранит идентификаторы обучающих записей (хранилище
+training_store/ или training_dataset.json), которые видели его модели. Дообучение берет только записи, добавленные
+после сборки пакета, и добавляет к лесам деревья (warm_start), обученные
+на этой дельте; число новых деревьев пропорционально доле новых записей,
+так что время дообучения зависит от размера дельты, а не всего датасета.
+
+Полное переобучение (ai_orientation_predictor.py) запускается, только если
+метрики дрейфа это требуют:
+    - записи удалены или изменены (их нельзя "вычесть" из деревьев);
+    - дельта слишком велика относительно уже виденных записей;
+    - большая доля значений признаков новых записей вне диапазона
+      обучения (деревья не экстраполируют);
+    - ошибка текущих моделей на дельте намного больше ошибки на тесте.
+
+Запуск:
+    python incremental_training.py          # дообучение или переобучение по дрейфу
+    python incremental_training.py --full   # принудительное переобучение
+"""
+
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from model_bundle import (
+    DEFAULT_BUNDLE_DIR, MODEL_FILES, TRAINING_FEATURE_NAMES, ScaledOutputModel, load_bundle,
+    load_training_rows, save_bundle
+)
+from training_data import load_table
+
+MODELS_DIR = "models_fixed"
+
+# Пороги дрейфа, при превышении которых дообучение заменяется полным
+MAX_DELTA_SHARE = 0.5           # новых записей относительно обучающих
+MAX_OUT_OF_RANGE_SHARE = 0.25   # значений признаков дельты вне диапазона обучения
+MAX_ERROR_RATIO = 2.0           # MAE на дельте / MAE на тесте при обучении
+MIN_NEW_TREES = 1
+
+
+def predict_targets(bundle, X):
+    """Предсказания моделей пакета по целям: {цель: (n,)}"""
+    predictions = {}
+    for name, model in bundle.models.items():
+        pred = model.predict(X).reshape(len(X), -1)
+        for i, output in enumerate(bundle.outputs[name]):
+            predictions[output] = pred[:, i]
+    return predictions
+
+
+def drift_metrics(bundle, X_seen, X_delta, Y_delta, target_names, removed):
+    """
+    Метрики дрейфа дельты относительно записей, на которых обучен пакет.
+    Возвращает (словарь метрик, список причин полного переобучения).
+    """
+    metrics = {
+        'delta_rows': len(X_delta),
+        'seen_rows': len(X_seen),
+        'removed_rows': removed,
+        'delta_share': len(X_delta) / max(len(X_seen), 1),
+    }
+    metrics['out_of_range_share'] = 0.0
+    if len(X_seen) and len(X_delta):
+        outside = (X_delta < X_seen.min(axis=0)) | (X_delta > X_seen.max(axis=0))
+        metrics['out_of_range_share'] = float(outside.mean())
+
+    predictions = predict_targets(bundle, X_delta) if len(X_delta) else {}
+    error_ratios = {}
+    for i, name in enumerate(target_names):
+        baseline = bundle.metrics.get(name, {}).get('mae_test')
+        if baseline and name in predictions:
+            mae = float(np.mean(np.abs(predictions[name] - Y_delta[:, i])))
+            error_ratios[name] = mae / baseline
+    metrics['error_ratio'] = error_ratios
+
+    reasons = []
+    if removed:
+        reasons.append(f"удалено или изменено записей: {removed}")
+    if metrics['delta_share'] > MAX_DELTA_SHARE:
+        reasons.append(f"новых записей {metrics['delta_share']:.0%} от обучающих (> {MAX_DELTA_SHARE:.0%})")
+    if metrics['out_of_range_share'] > MAX_OUT_OF_RANGE_SHARE:
+        reasons.append(f"вне диапазона обучения {metrics['out_of_range_share']:.0%} значений признаков")
+    for name, ratio in error_ratios.items():
+        if ratio > MAX_ERROR_RATIO:
+            reasons.append(f"ошибка {name} на новых записях в {ratio:.1f} раза выше, чем на тесте")
+    return metrics, reasons
+
+
+def full_retrain(multi_output):
+    """Полное переобучение ai_orientation_predictor.py (тот же режим целей)"""
+    command = [sys.executable, 'ai_orientation_predictor.py'] + (['--multi-output'] if multi_output else [])
+    return subprocess.run(command).returncode == 0
+
+
+def add_trees(model, X_delta, y_delta, num_seen):
+    """
+    Добавляет к лесу деревья, обученные только на дельте. Их число - доля
+    дельты от виденных записей, так что вклад новых данных в среднее
+    по деревьям примерно равен их доле в датасете.
+    """
+    num_new = max(MIN_NEW_TREES, int(round(model.n_estimators * len(X_delta) / max(num_seen, 1))))
+    model.set_params(warm_start=True, n_estimators=model.n_estimators + num_new)
+    model.fit(X_delta, y_delta)
+    model.set_params(warm_start=False)
+    return num_new
+
+
+def main():
+    import warnings
+    import joblib
+    from sklearn.metrics import r2_score
+    from stl_vectorizer_fixed import VECTORIZER_VERSION
+
+    warnings.filterwarnings('ignore')
+    force_full = '--full' in sys.argv
+
+    print("=" * 70)
+    print("🔁 ДООБУЧЕНИЕ МОДЕЛЕЙ НА НОВЫХ ЗАПИСЯХ")
+    print("=" * 70)
+
+    table = load_table()
+    if table is None:
+        print("❌ Обучающие записи не найдены!")
+        return
+
+    try:
+        bundle = load_bundle(DEFAULT_BUNDLE_DIR, TRAINING_FEATURE_NAMES, VECTORIZER_VERSION)
+        seen = load_training_rows(DEFAULT_BUNDLE_DIR)
+    except (OSError, ValueError) as e:
+        print(f"⚠️  Пакет моделей не загружен ({e}), полное обучение")
+        full_retrain('--multi-output' in sys.argv)
+        return
+    multi_output = bool(bundle.metrics.get('multi_output'))
+    if seen is None or force_full:
+        print("⚠️  Полное переобучение" + (" (--full)" if force_full else ": пакет не хранит записи обучения"))
+        full_retrain(multi_output)
+        return
+
+    # Номер строки таблицы по идентификатору записи (первое вхождение)
+    by_id = {}
+    for row, row_id in enumerate(table.row_ids):
+        by_id.setdefault(row_id, row)
+    seen_train, seen_test = seen.get('train', []), seen.get('test', [])
+    known = set(seen_train) | set(seen_test)
+    delta_ids = [row_id for row_id in by_id if row_id not in known]
+    removed = sum(1 for row_id in known if row_id not in by_id)
+
+    target_names = [output for outputs in bundle.outputs.values() for output in outputs]
+    print(f"📊 Записей: {len(by_id)}, в пакете: {len(seen_train)} обучающих + {len(seen_test)} тестовых, "
+          f"новых: {len(delta_ids)}")
+    if not delta_ids and not removed:
+        print("✅ Новых записей нет, пакет актуален")
+        return
+
+    X_seen, _ = table.matrices(target_names, [by_id[i] for i in seen_train if i in by_id])
+    X_delta, Y_delta = table.matrices(target_names, [by_id[i] for i in delta_ids])
+    metrics, reasons = drift_metrics(bundle, X_seen, X_delta, Y_delta, target_names, removed)
+    print(f"   Доля новых: {metrics['delta_share']:.0%}, "
+          f"значений вне диапазона обучения: {metrics['out_of_range_share']:.0%}")
+    for name, ratio in metrics['error_ratio'].items():
+        print(f"   Ошибка {name}: x{ratio:.2f} от тестовой")
+
+    if reasons:
+        print("⚠️  Дрейф данных, полное переобучение:")
+        for reason in reasons:
+            print(f"   • {reason}")
+        full_retrain(multi_output)
+        return
+
+    # Дообучение: новые деревья только на дельте
+    start = time.perf_counter()
+    models = {}
+    added_trees = 0
+    column = 0
+    for name, outputs in bundle.outputs.items():
+        model = joblib.load(Path(MODELS_DIR) / MODEL_FILES[name])
+        y_delta = Y_delta[:, column:column + len(outputs)]
+        if name in bundle.output_scalers:
+            # Новые деревья - в тех же стандартизованных единицах, что и прежние
+            y_delta = bundle.output_scalers[name].transform(y_delta)
+        added_trees = add_trees(model, X_delta, y_delta if len(outputs) > 1 else y_delta[:, 0], len(X_seen))
+        models[name] = model
+        column += len(outputs)
+    elapsed = time.perf_counter() - start
+    print(f"\n🎯 Добавлено деревьев: {added_trees} на модель за {elapsed:.2f} с "
+          f"(обучение на {len(X_delta)} записях)")
+
+    # Оценка на тех же отложенных записях, что и при полном обучении
+    new_metrics = {key: value for key, value in bundle.metrics.items() if key not in target_names}
+    test_rows = [by_id[i] for i in seen_test if i in by_id]
+    if test_rows:
+        X_test, Y_test = table.matrices(target_names, test_rows)
+        pred_test = np.column_stack([
+            (ScaledOutputModel(model, bundle.output_scalers[name]) if name in bundle.output_scalers else model)
+            .predict(X_test).reshape(len(X_test), -1)
+            for name, model in models.items()
+        ])
+        print(f"\n📊 Результаты на тестовой выборке:")
+        for i, name in enumerate(target_names):
+            r2_test = r2_score(Y_test[:, i], pred_test[:, i]) if len(X_test) > 1 else float('nan')
+            new_metrics[name] = {**bundle.metrics.get(name, {}), 'r2_test': r2_test,
+                                 'mae_test': float(np.mean(np.abs(pred_test[:, i] - Y_test[:, i])))}
+            print(f"   {name + ' (тест):':<30}R² = {r2_test:.3f}")
+
+    for name, model in models.items():
+        joblib.dump(model, Path(MODELS_DIR) / MODEL_FILES[name])
+    history = bundle.manifest.get('history', []) + [{
+        'date': datetime.now().isoformat(), 'mode': 'incremental', 'rows': len(delta_ids),
+        'added_trees': added_trees, 'seconds': round(elapsed, 3), 'drift': metrics,
+    }]
+    save_bundle(
+        DEFAULT_BUNDLE_DIR, models, TRAINING_FEATURE_NAMES, VECTORIZER_VERSION,
+        metrics=new_metrics,
+        target_outputs={name: outputs for name, outputs in bundle.outputs.items() if len(outputs) > 1},
+        output_scalers=bundle.output_scalers,
+        training_rows={'train': seen_train + delta_ids, 'test': seen_test},
+        history=history,
+    )
+    print(f"💾 Пакет моделей обновлен: {DEFAULT_BUNDLE_DIR}/ (обновлений: {len(history)})")
+
+
+if __name__ == "__main__":
+    main()
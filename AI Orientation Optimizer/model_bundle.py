@@ -0,0 +1,443 @@
+"""
+model_bundle.py - Версионированный пакет обученных моделей
+
+Один каталог вместо набора pickle-файлов:
+    manifest.json            - схема: признаки и их единицы, единицы углов,
+                               версия векторизатора, цели, масштабирование
+                               входа, метрики обучения, список массивов
+    <цель>/<массив>.npy      - лес цели в плоских массивах (compiled_forest)
+    <цель>/output_*.npy      - масштабирование выходов, если лес обучен
+                               на стандартизованных целях
+    scaler/center.npy, scale.npy - масштабирование входа, если оно было
+
+Массивы открываются через np.load(mmap_mode='r'): загрузка занимает
+миллисекунды, а несколько рабочих процессов делят одни страницы памяти
+(кэш страниц ОС). Манифест пишется последним, поэтому недописанный пакет
+не загружается. Несовпадение схемы (формат, версия векторизатора, список
+признаков, формы массивов) отклоняется при загрузке, а не проявляется
+неверными предсказаниями.
+
+Пакет из уже обученных pickle-моделей:
+    python model_bundle.py models_fixed model_bundle
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from compiled_forest import CompiledForest, export_forest
+from orientation_geometry import ORIENTATION_FEATURE_NAMES
+
+BUNDLE_FORMAT_VERSION = 2
+MANIFEST_NAME = "manifest.json"
+# Какие записи датасета видели модели пакета (для дообучения)
+TRAINING_ROWS_NAME = "training_rows.json"
+DEFAULT_BUNDLE_DIR = "model_bundle"
+
+# Признаки STL-вектора (stl_vectorizer_fixed.SimpleSTLVectorizer.feature_names)
+STL_FEATURE_NAMES = ['width', 'depth', 'height', 'volume', 'area',
+                     'num_vertices', 'num_faces', 'center_x', 'center_y', 'center_z']
+ANGLE_FEATURE_NAMES = ['angle_x', 'angle_y', 'angle_z']
+# Схема признаков ai_orientation_predictor.py: STL-вектор и углы в градусах
+TRAINING_FEATURE_NAMES = STL_FEATURE_NAMES + ANGLE_FEATURE_NAMES
+
+FEATURE_UNITS = {
+    'width': 'mm', 'depth': 'mm', 'height': 'mm', 'volume': 'mm3', 'area': 'mm2',
+    'num_vertices': 'count', 'num_faces': 'count',
+    'center_x': 'ratio', 'center_y': 'ratio', 'center_z': 'ratio',
+    'angle_x': 'deg', 'angle_y': 'deg', 'angle_z': 'deg',
+    'com_z': 'mm', 'down_faces_ratio': 'ratio',
+}
+TARGET_UNITS = {'filament_length_m': 'm', 'time_minutes': 'min', 'printing_rate': 'ratio'}
+FILAMENT_TARGET = 'filament_length_m'
+TIME_TARGET = 'time_minutes'
+# Pickle-файлы sklearn-моделей в models_fixed по именам моделей пакета
+MODEL_FILES = {'joint': 'model_joint.pkl', FILAMENT_TARGET: 'model_filament.pkl',
+               TIME_TARGET: 'model_time.pkl', 'printing_rate': 'model_printing_rate.pkl'}
+# Цели ai_orientation_predictor.py в порядке столбцов Y (выходов совместной модели)
+PICKLE_TARGETS = (FILAMENT_TARGET, TIME_TARGET, 'printing_rate')
+
+# Типы массивов пакета совпадают с типами CompiledForest: mmap без копий
+FOREST_ARRAY_DTYPES = {
+    'feature': np.intp, 'threshold': np.float64, 'left': np.intp, 'right': np.intp,
+    'missing_left': np.bool_, 'value': np.float64, 'roots': np.intp,
+}
+FOREST_SCALARS = ['max_depth', 'n_features_in', 'n_outputs', 'format_version']
+
+
+class BundleSchemaError(ValueError):
+    """Пакет моделей не соответствует ожидаемой схеме"""
+
+
+class FeatureScaler:
+    """Масштабирование (X - center) / scale, как StandardScaler/RobustScaler.transform"""
+
+    def __init__(self, center, scale):
+        self.center = center
+        self.scale = scale
+        self.n_features_in_ = len(scale)
+
+    @classmethod
+    def from_sklearn(cls, scaler):
+        center = getattr(scaler, 'mean_', None)
+        if center is None:
+            center = getattr(scaler, 'center_', None)
+        scale = getattr(scaler, 'scale_', None)
+        n = scaler.n_features_in_
+        return cls(np.zeros(n) if center is None else np.asarray(center, dtype=np.float64),
+                   np.ones(n) if scale is None else np.asarray(scale, dtype=np.float64))
+
+    def transform(self, X):
+        X = np.array(X, dtype=np.float64)
+        X -= self.center
+        X /= self.scale
+        return X
+
+    def inverse_transform(self, X):
+        X = np.array(X, dtype=np.float64)
+        X *= self.scale
+        X += self.center
+        return X
+
+
+class ScaledOutputModel:
+    """
+    Лес, обученный на стандартизованных целях: predict возвращает
+    предсказания в исходных единицах (scaler.inverse_transform).
+    """
+
+    def __init__(self, model, scaler):
+        self.model = model
+        self.scaler = scaler
+        self.n_features_in_ = model.n_features_in_
+
+    def predict(self, X):
+        pred = np.asarray(self.model.predict(X), dtype=np.float64)
+        return self.scaler.inverse_transform(pred.reshape(len(pred), -1)).reshape(pred.shape)
+
+
+def dataset_row_id(item):
+    """Идентификатор записи training_dataset.json по ее содержимому"""
+    payload = json.dumps(item, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def load_training_rows(bundle_dir=DEFAULT_BUNDLE_DIR):
+    """
+    Записи, которые видели модели пакета: {'train': [id], 'test': [id]}
+    (test - отложенные для оценки). None, если пакет их не хранит.
+    """
+    path = Path(bundle_dir) / TRAINING_ROWS_NAME
+    if not path.exists():
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _array_entry(path, array):
+    return {'path': path, 'shape': list(array.shape), 'dtype': array.dtype.str}
+
+
+def save_bundle(bundle_dir, models, feature_names, vectorizer_version, scaler=None,
+                metrics=None, angles_unit='deg', feature_units=None, notes=None, target_outputs=None,
+                training_rows=None, history=None, output_scalers=None):
+    """
+    Сохраняет пакет: models - {имя цели: обученный лес}, feature_names -
+    порядок столбцов X при обучении, scaler - объект с transform, примененный
+    к X до fit (None, если модели обучены на исходных признаках).
+    target_outputs - {имя модели: [цели по столбцам predict]} для моделей
+    с несколькими выходами (у остальных единственный выход - сама цель).
+    output_scalers - {имя модели: скейлер целей}, если модель обучена на
+    стандартизованных целях; при загрузке predict возвращает исходные единицы.
+    training_rows - {'train': [id], 'test': [id]} записей датасета
+    (dataset_row_id), history - список обновлений пакета.
+    Каталог заменяется целиком. Возвращает манифест.
+    """
+    target_outputs = target_outputs or {}
+    output_scalers = output_scalers or {}
+    bundle_dir = Path(bundle_dir)
+    tmp_dir = bundle_dir.with_name(bundle_dir.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    feature_units = {**FEATURE_UNITS, **(feature_units or {})}
+    files = []
+    targets = []
+    for name, model in models.items():
+        arrays = export_forest(model)
+        if int(arrays['n_features_in']) != len(feature_names):
+            raise BundleSchemaError(f"{name}: модель ждет {int(arrays['n_features_in'])} признаков, "
+                                    f"в схеме {len(feature_names)}")
+        outputs = list(target_outputs.get(name, [name]))
+        if len(outputs) != int(arrays['n_outputs']):
+            raise BundleSchemaError(f"{name}: {int(arrays['n_outputs'])} выходов, названо {len(outputs)}")
+        (tmp_dir / name).mkdir()
+        target_files = {}
+        for key, dtype in FOREST_ARRAY_DTYPES.items():
+            array = np.ascontiguousarray(arrays[key], dtype=dtype)
+            path = f"{name}/{key}.npy"
+            np.save(tmp_dir / path, array)
+            target_files[key] = path
+            files.append(_array_entry(path, array))
+        output_scaling = {'type': 'none'}
+        if name in output_scalers:
+            output_scaler = output_scalers[name]
+            if not isinstance(output_scaler, FeatureScaler):
+                output_scaler = FeatureScaler.from_sklearn(output_scaler)
+            if output_scaler.n_features_in_ != len(outputs):
+                raise BundleSchemaError(f"{name}: скейлер целей на {output_scaler.n_features_in_} выходов, "
+                                        f"у модели {len(outputs)}")
+            output_scaling = {'type': 'affine', 'arrays': {}}
+            for key in ('center', 'scale'):
+                array = np.ascontiguousarray(getattr(output_scaler, key), dtype=np.float64)
+                path = f"{name}/output_{key}.npy"
+                np.save(tmp_dir / path, array)
+                output_scaling['arrays'][key] = path
+                files.append(_array_entry(path, array))
+        targets.append({
+            'name': name,
+            'outputs': [{'name': output, 'unit': TARGET_UNITS.get(output, '')} for output in outputs],
+            'kind': 'forest',
+            'n_trees': len(arrays['roots']),
+            **{key: int(arrays[key]) for key in FOREST_SCALARS},
+            'arrays': target_files,
+            'output_scaling': output_scaling,
+        })
+
+    input_scaling = {'type': 'none'}
+    if scaler is not None:
+        scaler = scaler if isinstance(scaler, FeatureScaler) else FeatureScaler.from_sklearn(scaler)
+        if scaler.n_features_in_ != len(feature_names):
+            raise BundleSchemaError(f"Скейлер на {scaler.n_features_in_} признаков, в схеме {len(feature_names)}")
+        (tmp_dir / "scaler").mkdir()
+        input_scaling = {'type': 'affine', 'arrays': {}}
+        for key in ('center', 'scale'):
+            array = np.ascontiguousarray(getattr(scaler, key), dtype=np.float64)
+            path = f"scaler/{key}.npy"
+            np.save(tmp_dir / path, array)
+            input_scaling['arrays'][key] = path
+            files.append(_array_entry(path, array))
+
+    manifest = {
+        'format_version': BUNDLE_FORMAT_VERSION,
+        'created_date': datetime.now().isoformat(),
+        'vectorizer_version': vectorizer_version,
+        'features': [{'name': name, 'unit': feature_units.get(name, '')} for name in feature_names],
+        'angles_unit': angles_unit,
+        'input_scaling': input_scaling,
+        'targets': targets,
+        'metrics': metrics or {},
+        'files': files,
+    }
+    if notes:
+        manifest['notes'] = notes
+    if history:
+        manifest['history'] = history
+    if training_rows is not None:
+        with open(tmp_dir / TRAINING_ROWS_NAME, 'w', encoding='utf-8') as f:
+            json.dump(training_rows, f)
+        manifest['training_rows'] = {'file': TRAINING_ROWS_NAME,
+                                     **{part: len(ids) for part, ids in training_rows.items()}}
+    # Манифест - последним: пакет без него считается недописанным
+    with open(tmp_dir / MANIFEST_NAME, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+    shutil.rmtree(bundle_dir, ignore_errors=True)
+    os.replace(tmp_dir, bundle_dir)
+    return manifest
+
+
+class ModelBundle:
+    """
+    Загруженный пакет: manifest, feature_names, models {имя: CompiledForest
+    или ScaledOutputModel}, outputs {имя модели: [цели по столбцам predict]},
+    scaler, output_scalers {имя модели: скейлер целей}.
+    """
+
+    def __init__(self, bundle_dir, manifest, models, scaler, output_scalers=None):
+        self.bundle_dir = Path(bundle_dir)
+        self.manifest = manifest
+        self.feature_names = [feature['name'] for feature in manifest['features']]
+        self.models = models
+        self.outputs = {target['name']: [output['name'] for output in target['outputs']]
+                        for target in manifest['targets']}
+        self.scaler = scaler
+        self.output_scalers = output_scalers or {}
+
+    @property
+    def metrics(self):
+        return self.manifest.get('metrics', {})
+
+    def recommender(self, test_orientations=None):
+        """
+        OrientationRecommender по целям филамента и времени. Порядок признаков
+        пакета должен совпадать с OrientationRecommender.build_feature_matrix:
+        STL-вектор, углы, затем признаки ориентации.
+        """
+        from orientation_recommender import OrientationRecommender
+
+        # Совместная модель, у которой первые выходы - филамент и время,
+        # иначе отдельные модели этих целей
+        joint = [name for name, outputs in self.outputs.items()
+                 if outputs[:2] == [FILAMENT_TARGET, TIME_TARGET]]
+        if joint:
+            model_filament, model_time = self.models[joint[0]], None
+        else:
+            for name in (FILAMENT_TARGET, TIME_TARGET):
+                if self.outputs.get(name) != [name]:
+                    raise BundleSchemaError(f"В пакете нет цели {name}")
+            model_filament, model_time = self.models[FILAMENT_TARGET], self.models[TIME_TARGET]
+
+        num_extra = len(self.feature_names) - len(TRAINING_FEATURE_NAMES)
+        layout = TRAINING_FEATURE_NAMES + ORIENTATION_FEATURE_NAMES[:max(num_extra, 0)]
+        if self.feature_names != layout:
+            raise BundleSchemaError(f"Порядок признаков {self.feature_names} не поддерживается "
+                                    f"рекомендателем (ожидается {layout})")
+        return OrientationRecommender(model_filament, model_time, self.scaler,
+                                      test_orientations=test_orientations,
+                                      angles_in_radians=self.manifest['angles_unit'] == 'rad',
+                                      feature_names=self.feature_names)
+
+
+def _load_array(bundle_dir, entry, mmap):
+    array = np.load(bundle_dir / entry['path'], mmap_mode='r' if mmap else None, allow_pickle=False)
+    if list(array.shape) != entry['shape'] or array.dtype.str != entry['dtype']:
+        raise BundleSchemaError(f"{entry['path']}: {array.shape} {array.dtype.str}, "
+                                f"в манифесте {tuple(entry['shape'])} {entry['dtype']}")
+    return array
+
+
+def load_bundle(bundle_dir=DEFAULT_BUNDLE_DIR, feature_names=None, vectorizer_version=None, mmap=True):
+    """
+    Загружает пакет и проверяет схему. feature_names и vectorizer_version -
+    ожидания вызывающего кода (None - не проверять); при несовпадении
+    выбрасывается BundleSchemaError.
+    """
+    bundle_dir = Path(bundle_dir)
+    manifest_path = bundle_dir / MANIFEST_NAME
+    if not manifest_path.exists():
+        raise FileNotFoundError(f"Нет {MANIFEST_NAME} в {bundle_dir}")
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    if manifest.get('format_version') != BUNDLE_FORMAT_VERSION:
+        raise BundleSchemaError(f"Формат пакета {manifest.get('format_version')}, "
+                                f"поддерживается {BUNDLE_FORMAT_VERSION}")
+    if vectorizer_version is not None and manifest.get('vectorizer_version') != vectorizer_version:
+        raise BundleSchemaError(f"Модели обучены на признаках версии {manifest.get('vectorizer_version')}, "
+                                f"векторизатор - версии {vectorizer_version}")
+    names = [feature['name'] for feature in manifest['features']]
+    if feature_names is not None and list(feature_names) != names:
+        raise BundleSchemaError(f"Признаки пакета {names} не совпадают с ожидаемыми {list(feature_names)}")
+
+    entries = {entry['path']: entry for entry in manifest['files']}
+    models = {}
+    output_scalers = {}
+    for target in manifest['targets']:
+        arrays = {key: _load_array(bundle_dir, entries[path], mmap) for key, path in target['arrays'].items()}
+        arrays.update({key: target[key] for key in FOREST_SCALARS})
+        if target['n_outputs'] != len(target['outputs']):
+            raise BundleSchemaError(f"{target['name']}: {target['n_outputs']} выходов, "
+                                    f"в манифесте {len(target['outputs'])}")
+        if target['n_features_in'] != len(names):
+            raise BundleSchemaError(f"{target['name']}: {target['n_features_in']} признаков, в схеме {len(names)}")
+        models[target['name']] = CompiledForest(arrays)
+
+        output_scaling = target.get('output_scaling', {'type': 'none'})
+        if output_scaling['type'] == 'affine':
+            output_scaler = FeatureScaler(*(_load_array(bundle_dir, entries[output_scaling['arrays'][key]], mmap)
+                                            for key in ('center', 'scale')))
+            if output_scaler.n_features_in_ != target['n_outputs']:
+                raise BundleSchemaError(f"{target['name']}: скейлер целей на {output_scaler.n_features_in_} "
+                                        f"выходов, у модели {target['n_outputs']}")
+            output_scalers[target['name']] = output_scaler
+            models[target['name']] = ScaledOutputModel(models[target['name']], output_scaler)
+        elif output_scaling['type'] != 'none':
+            raise BundleSchemaError(f"Неизвестное масштабирование выходов: {output_scaling['type']}")
+
+    scaler = None
+    scaling = manifest.get('input_scaling', {'type': 'none'})
+    if scaling['type'] == 'affine':
+        scaler = FeatureScaler(*(_load_array(bundle_dir, entries[scaling['arrays'][key]], mmap)
+                                 for key in ('center', 'scale')))
+        if scaler.n_features_in_ != len(names):
+            raise BundleSchemaError(f"Скейлер на {scaler.n_features_in_} признаков, в схеме {len(names)}")
+    elif scaling['type'] != 'none':
+        raise BundleSchemaError(f"Неизвестное масштабирование входа: {scaling['type']}")
+
+    return ModelBundle(bundle_dir, manifest, models, scaler, output_scalers)
+
+
+def bundle_from_pickles(models_dir, bundle_dir, vectorizer_version, scaled=False):
+    """
+    Пакет из pickle-моделей ai_orientation_predictor.py (model_*.pkl,
+    в режиме --multi-output - model_joint.pkl и scaler_Y.pkl).
+    Схема признаков - TRAINING_FEATURE_NAMES; scaled=True, если модели
+    обучены на масштабированных признаках (тогда берется scaler_X.pkl).
+    Если моделей нет, существующий пакет не перезаписывается (FileNotFoundError).
+    """
+    import joblib
+
+    models_dir = Path(models_dir)
+    models = {}
+    target_outputs = {}
+    output_scalers = {}
+    joint_path = models_dir / MODEL_FILES['joint']
+    if joint_path.exists():
+        models['joint'] = joblib.load(joint_path)
+        # Выходы совместной модели - цели в порядке ai_orientation_predictor.py
+        target_outputs['joint'] = list(PICKLE_TARGETS[:models['joint'].n_outputs_])
+        scaler_y_path = models_dir / 'scaler_Y.pkl'
+        if scaler_y_path.exists():
+            output_scalers['joint'] = joblib.load(scaler_y_path)
+    for target in PICKLE_TARGETS:
+        path = models_dir / MODEL_FILES[target]
+        if path.exists():
+            models[target] = joblib.load(path)
+    if not models:
+        raise FileNotFoundError(f"В {models_dir} нет моделей ({', '.join(MODEL_FILES.values())})")
+    scaler = joblib.load(models_dir / 'scaler_X.pkl') if scaled else None
+    return save_bundle(bundle_dir, models, TRAINING_FEATURE_NAMES, vectorizer_version, scaler=scaler,
+                       notes=f"Преобразовано из {models_dir.as_posix()}/*.pkl",
+                       target_outputs=target_outputs, output_scalers=output_scalers)
+
+
+def main():
+    import time
+    import warnings
+    warnings.filterwarnings('ignore')
+    from stl_vectorizer_fixed import VECTORIZER_VERSION
+
+    models_dir = sys.argv[1] if len(sys.argv) > 1 else "models_fixed"
+    bundle_dir = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_BUNDLE_DIR
+
+    print("=" * 70)
+    print("📦 ПАКЕТ МОДЕЛЕЙ ИЗ PICKLE-ФАЙЛОВ")
+    print("=" * 70)
+
+    if not Path(models_dir).exists():
+        print(f"❌ Папка {models_dir} не найдена!")
+        return
+
+    try:
+        manifest = bundle_from_pickles(models_dir, bundle_dir, VECTORIZER_VERSION)
+    except FileNotFoundError as e:
+        print(f"❌ {e}")
+        print(f"   Пакет {bundle_dir}/ не изменен")
+        return
+    start = time.perf_counter()
+    bundle = load_bundle(bundle_dir, TRAINING_FEATURE_NAMES, VECTORIZER_VERSION)
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"✅ Цели: {', '.join(target['name'] for target in manifest['targets'])}")
+    print(f"✅ Признаков: {len(bundle.feature_names)}, загрузка {elapsed:.1f} мс (mmap)")
+    print(f"💾 {bundle_dir}/{MANIFEST_NAME}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+orientation_geometry.py - Геометрические признаки сразу для многих ориентаций
+
+Сетка читается один раз, K матриц поворота применяются одним матричным
+умножением на блок вершин: (3n, 3) @ (3, 3K). Поворачивать модель
+и сохранять отдельный STL для каждой ориентации не нужно.
+"""
+
+import numpy as np
+
+from stl_reader import DEFAULT_CHUNK_SIZE, unique_vertices
+
+# Грань считается "смотрящей вниз", если z-компонента нормали меньше порога
+DOWN_FACE_NORMAL_Z = -0.7
+
+ORIENTATION_FEATURE_NAMES = ['width', 'depth', 'height', 'com_z', 'down_faces_ratio']
+# Признаки, не меняющиеся при повороте модели вокруг вертикали
+Z_INVARIANT_FEATURE_NAMES = ['height', 'com_z', 'down_faces_ratio']
+
+
+# С какого числа ориентаций границы считаются по уникальным вершинам
+UNIQUE_VERTICES_MIN_ROTATIONS = 16
+# Предел числа элементов (блок граней x ориентации) во временных массивах
+MAX_BLOCK_ELEMENTS = 1 << 19
+
+
+def _block_size(num_rot, chunk_size):
+    """Размер блока граней, чтобы временные массивы (n, K) оставались небольшими"""
+    return max(256, min(chunk_size, MAX_BLOCK_ELEMENTS // max(num_rot, 1)))
+
+
+def face_normals(tri):
+    """Единичные нормали граней для блока треугольников (n, 3, 3)"""
+    normals = np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0])
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    return np.divide(normals, lengths, out=np.zeros_like(normals), where=lengths > 0)
+
+
+def center_of_mass(triangles, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Центр масс замкнутой сетки через знаковые тетраэдры от начала координат"""
+    moment = np.zeros(3)
+    volume = 0.0
+    for start in range(0, len(triangles), chunk_size):
+        tri = np.asarray(triangles[start:start + chunk_size], dtype=np.float64)
+        tet_volume = np.einsum('ij,ij->i', tri[:, 0], np.cross(tri[:, 1], tri[:, 2])) / 6.0
+        moment += tet_volume @ tri.sum(axis=1) / 4.0
+        volume += tet_volume.sum()
+
+    if abs(volume) < 1e-12:
+        # Незамкнутая сетка: берем среднее вершин
+        return np.asarray(triangles, dtype=np.float64).reshape(-1, 3).mean(axis=0)
+    return moment / volume
+
+
+def compute_orientation_features(triangles, rotations, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Признаки ORIENTATION_FEATURE_NAMES для каждой из K ориентаций.
+    triangles: (N, 3, 3), rotations: (K, 3, 3) -> матрица (K, 5).
+    com_z считается от стола (минимальная z после поворота).
+    """
+    rotations = np.asarray(rotations, dtype=np.float64).reshape(-1, 3, 3)
+    num_rot = len(rotations)
+    num_faces = len(triangles)
+    block = _block_size(num_rot, chunk_size)
+
+    # Столбцы 3k..3k+2 - оси x, y, z k-й ориентации
+    stacked = rotations.transpose(2, 0, 1).reshape(3, 3 * num_rot)
+    z_axes = rotations[:, 2, :].T
+
+    bounds_min = np.full(3 * num_rot, np.inf)
+    bounds_max = np.full(3 * num_rot, -np.inf)
+    down_faces = np.zeros(num_rot)
+
+    # Границы зависят только от вершин: при многих ориентациях дешевле
+    # один раз убрать повторы вершин, чем проецировать вершины каждой грани
+    points = unique_vertices(triangles) if num_rot > UNIQUE_VERTICES_MIN_ROTATIONS else None
+
+    for start in range(0, num_faces, block):
+        tri = np.asarray(triangles[start:start + block], dtype=np.float64)
+        if points is None:
+            projected = tri.reshape(-1, 3) @ stacked
+            bounds_min = np.minimum(bounds_min, projected.min(axis=0))
+            bounds_max = np.maximum(bounds_max, projected.max(axis=0))
+        down_faces += (face_normals(tri) @ z_axes < DOWN_FACE_NORMAL_Z).sum(axis=0)
+
+    if points is not None:
+        for start in range(0, len(points), 3 * block):
+            projected = points[start:start + 3 * block] @ stacked
+            bounds_min = np.minimum(bounds_min, projected.min(axis=0))
+            bounds_max = np.maximum(bounds_max, projected.max(axis=0))
+
+    extents = (bounds_max - bounds_min).reshape(num_rot, 3)
+    com_z = rotations[:, 2, :] @ center_of_mass(triangles, chunk_size) - bounds_min[2::3]
+
+    return np.column_stack([extents, com_z, down_faces / max(num_faces, 1)])
+
+
+SUPPORT_FEATURE_NAMES = ['overhang_area', 'support_volume', 'bed_contact_area']
+
+# Допуск по высоте (мм) для граней, лежащих на столе
+BED_CONTACT_TOLERANCE = 0.05
+# Грань лежит на столе, если ее нормаль почти строго вниз
+BED_CONTACT_NORMAL_Z = -0.999
+
+
+def _min_z(triangles, z_axes, chunk_size):
+    """Минимальная z всех вершин для каждой ориентации (K,)"""
+    min_z = np.full(z_axes.shape[1], np.inf)
+    for start in range(0, len(triangles), chunk_size):
+        tri = np.asarray(triangles[start:start + chunk_size], dtype=np.float64)
+        min_z = np.minimum(min_z, (tri.reshape(-1, 3) @ z_axes).min(axis=0))
+    return min_z
+
+
+def compute_support_features(triangles, rotations, overhang_angle=45.0,
+                             chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Оценка поддержек для K ориентаций без слайсинга -> матрица (K, 3):
+    overhang_area - площадь нависающих граней (мм²), наклон от вертикали
+        больше overhang_angle, как support_settings.overhang_angle в Cura;
+    support_volume - объем столбов от нависаний до стола (мм³),
+        без учета перекрытия самой моделью;
+    bed_contact_area - площадь граней, лежащих на столе (мм²).
+    """
+    rotations = np.asarray(rotations, dtype=np.float64).reshape(-1, 3, 3)
+    z_axes = rotations[:, 2, :].T
+    block = _block_size(len(rotations), chunk_size)
+    min_z = _min_z(triangles, z_axes, block)
+    overhang_z = -np.sin(np.radians(overhang_angle))
+
+    totals = np.zeros((len(rotations), 3))
+    for start in range(0, len(triangles), block):
+        tri = np.asarray(triangles[start:start + block], dtype=np.float64)
+        cross = np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0])
+        area = 0.5 * np.linalg.norm(cross, axis=1)
+
+        normal_z = face_normals(tri) @ z_axes                    # (n, K)
+        height = tri.mean(axis=1) @ z_axes - min_z               # (n, K)
+        on_bed = (normal_z < BED_CONTACT_NORMAL_Z) & (height < BED_CONTACT_TOLERANCE)
+        overhang = (normal_z < overhang_z) & ~on_bed
+
+        totals[:, 0] += area @ overhang
+        # Проекция грани на стол, умноженная на высоту над столом
+        totals[:, 1] += area @ np.where(overhang, -normal_z * height, 0.0)
+        totals[:, 2] += area @ on_bed
+
+    return totals
+
+
+FILAMENT_DIAMETER_MM = 1.75
+# Плотность заполнения поддержек (доля объема), как support_infill_rate в Cura
+SUPPORT_INFILL_RATE = 0.2
+
+
+def support_filament_m(support_volume, infill_rate=SUPPORT_INFILL_RATE,
+                       filament_diameter=FILAMENT_DIAMETER_MM):
+    """Перевод объема поддержек (мм³) в метры филамента"""
+    cross_section = np.pi * (filament_diameter / 2) ** 2
+    return np.asarray(support_volume) * infill_rate / cross_section / 1000.0
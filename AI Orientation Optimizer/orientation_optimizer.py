@@ -0,0 +1,175 @@
+"""
+orientation_optimizer.py - Непрерывная оптимизация ориентации (CMA-ES)
+
+Оценка ориентации рассматривается как функция-"черный ящик" от
+кватерниона: CMA-ES ищет минимум в R^4, каждый вектор нормируется
+в поворот. Несколько перезапусков из разных точек SO(3) идут
+одновременно: кандидаты поколения всех перезапусков оцениваются одним
+вызовом score_fn (один predict на цель). Перезапуск останавливается,
+когда улучшение застопорилось или шаг стал меньше заданного. Градиенты модели не нужны.
+"""
+
+import time
+
+import numpy as np
+
+from rotations import matrix_to_euler, quaternion_to_matrix, uniform_quaternions
+
+DEFAULT_RESTARTS = 4
+DEFAULT_MAX_EVALUATIONS = 600
+# Грубая сетка, из лучших точек которой стартуют перезапуски
+DEFAULT_SEED_SAMPLES = 64
+# Остановка: столько поколений подряд без улучшения лучше чем на tolerance
+DEFAULT_PATIENCE = 20
+DEFAULT_TOLERANCE = 1e-6
+# Кандидатов на поколение в каждом перезапуске (стандартное 4 + 3 ln n = 8 для n=4):
+# на оценке рекомендателя стоимость определяется числом вызовов predict,
+# а не числом строк, поэтому поколения крупнее при том же бюджете
+DEFAULT_POPULATION = 16
+MIN_SIGMA = 1e-3
+
+
+class _CMAES:
+    """
+    Состояние одного запуска CMA-ES (Hansen, "The CMA Evolution Strategy: A Tutorial").
+    ask() выдает кандидатов поколения, tell() принимает их оценки: так
+    поколения нескольких запусков оцениваются одним вызовом score_fn.
+    """
+
+    def __init__(self, start, sigma, rng, population=None):
+        n = len(start)
+        self.n, self.rng = n, rng
+        self.lam = population or 4 + int(3 * np.log(n))
+        self.mu = self.lam // 2
+        weights = np.log(self.mu + 0.5) - np.log(np.arange(1, self.mu + 1))
+        self.weights = weights / weights.sum()
+        self.mueff = 1 / np.sum(self.weights ** 2)
+
+        self.cc = (4 + self.mueff / n) / (n + 4 + 2 * self.mueff / n)
+        self.cs = (self.mueff + 2) / (n + self.mueff + 5)
+        self.c1 = 2 / ((n + 1.3) ** 2 + self.mueff)
+        self.cmu = min(1 - self.c1, 2 * (self.mueff - 2 + 1 / self.mueff) / ((n + 2) ** 2 + self.mueff))
+        self.damps = 1 + 2 * max(0, np.sqrt((self.mueff - 1) / (n + 1)) - 1) + self.cs
+        self.chi_n = np.sqrt(n) * (1 - 1 / (4 * n) + 1 / (21 * n ** 2))
+
+        self.mean = np.asarray(start, dtype=np.float64)
+        self.sigma = sigma
+        self.pc, self.ps = np.zeros(n), np.zeros(n)
+        self.cov = np.eye(n)
+        self.basis, self.scales = np.eye(n), np.ones(n)
+
+        self.best_x, self.best_score = self.mean.copy(), np.inf
+        self.evaluations = self.generations = self.stall = 0
+        self._y = None
+
+    def ask(self):
+        """Кандидаты очередного поколения (lam, n)"""
+        z = self.rng.standard_normal((self.lam, self.n))
+        self._y = (z * self.scales) @ self.basis.T
+        return self.mean + self.sigma * self._y
+
+    def tell(self, x, scores, tolerance):
+        """Обновление по оценкам кандидатов, выданных последним ask()"""
+        n, y = self.n, self._y
+        self.evaluations += self.lam
+        self.generations += 1
+
+        order = np.argsort(scores, kind='stable')
+        # Лучшая точка и ее оценка меняются только вместе; застоем считается
+        # поколение, улучшившее результат меньше чем на tolerance
+        if scores[order[0]] < self.best_score:
+            self.stall = 0 if scores[order[0]] < self.best_score - tolerance else self.stall + 1
+            self.best_x, self.best_score = x[order[0]].copy(), scores[order[0]]
+        else:
+            self.stall += 1
+
+        # Обновление среднего, путей эволюции, ковариации и шага
+        y_sel = y[order[:self.mu]]
+        y_w = self.weights @ y_sel
+        mean = self.mean + self.sigma * y_w
+        # Кватернион и его кратные задают один поворот: держим среднее на единичной сфере
+        norm = np.linalg.norm(mean)
+        self.mean, self.sigma = mean / norm, self.sigma / norm
+        inv_sqrt = self.basis @ np.diag(1 / self.scales) @ self.basis.T
+        cs, cc = self.cs, self.cc
+        self.ps = (1 - cs) * self.ps + np.sqrt(cs * (2 - cs) * self.mueff) * (inv_sqrt @ y_w)
+        hsig = (np.linalg.norm(self.ps) / np.sqrt(1 - (1 - cs) ** (2 * self.generations)) / self.chi_n
+                < 1.4 + 2 / (n + 1))
+        self.pc = (1 - cc) * self.pc + hsig * np.sqrt(cc * (2 - cc) * self.mueff) * y_w
+        self.cov = ((1 - self.c1 - self.cmu) * self.cov
+                    + self.c1 * (np.outer(self.pc, self.pc) + (not hsig) * cc * (2 - cc) * self.cov)
+                    + self.cmu * (y_sel.T * self.weights) @ y_sel)
+        self.sigma *= np.exp((cs / self.damps) * (np.linalg.norm(self.ps) / self.chi_n - 1))
+
+        cov = (self.cov + self.cov.T) / 2
+        eigenvalues, self.basis = np.linalg.eigh(cov)
+        self.cov = cov
+        self.scales = np.sqrt(np.maximum(eigenvalues, 1e-20))
+
+    def stopped(self, patience):
+        """Застой дольше patience поколений или шаг меньше MIN_SIGMA"""
+        return self.stall >= patience or self.sigma * self.scales.max() < MIN_SIGMA
+
+
+def optimize_orientation(score_fn, restarts=DEFAULT_RESTARTS, max_evaluations=DEFAULT_MAX_EVALUATIONS,
+                         seed_samples=DEFAULT_SEED_SAMPLES, patience=DEFAULT_PATIENCE,
+                         tolerance=DEFAULT_TOLERANCE, population=DEFAULT_POPULATION, seed=0):
+    """
+    Минимизирует score_fn(rotations (K, 3, 3)) -> (K,) с перезапусками CMA-ES.
+    Сначала одним пакетом оценивается грубая сетка из seed_samples поворотов;
+    перезапуски стартуют из restarts лучших ее точек с шагом порядка шага сетки.
+    Перезапуски идут одновременно: кандидаты очередного поколения всех
+    активных запусков оцениваются одним вызовом score_fn (у леса время
+    predict почти не зависит от размера небольшого пакета). Остановившийся
+    запуск отдает свою долю бюджета остальным; если бюджета на поколение
+    всех запусков не хватает, продолжаются лучшие. population=None -
+    стандартный размер поколения CMA-ES.
+    Возвращает словарь как search_orientations: matrix, angles, score,
+    evaluations (включая сетку), elapsed, а также restarts - (оценка, число
+    оценок) по выполненным запускам.
+    """
+    start_time = time.perf_counter()
+    rng = np.random.default_rng(seed)
+
+    grid = uniform_quaternions(seed_samples)
+    grid_scores = np.asarray(score_fn(quaternion_to_matrix(grid)), dtype=np.float64)
+    evaluations = len(grid)
+    order = np.argsort(grid_scores, kind='stable')
+    # Расстояние между соседними кватернионами сетки: объем S^3 равен 2pi²
+    sigma = (2 * np.pi ** 2 / seed_samples) ** (1 / 3) / 2
+    runs = [_CMAES(start, sigma, rng, population) for start in grid[order[:restarts]]]
+
+    active = list(runs)
+    while active:
+        # Поколение всех запусков, на которые хватает бюджета (лучшие первыми)
+        active.sort(key=lambda run: run.best_score)
+        batch, budget = [], max_evaluations - evaluations
+        for run in active:
+            if run.lam <= budget:
+                batch.append(run)
+                budget -= run.lam
+        if not batch:
+            break
+        candidates = [run.ask() for run in batch]
+        scores = np.asarray(score_fn(quaternion_to_matrix(np.concatenate(candidates))), dtype=np.float64)
+        evaluations += len(scores)
+        offset = 0
+        for run, x in zip(batch, candidates):
+            run.tell(x, scores[offset:offset + len(x)], tolerance)
+            offset += len(x)
+        active = [run for run in batch if not run.stopped(patience)]
+
+    best_q, best_score = grid[order[0]], grid_scores[order[0]]
+    for run in runs:
+        if run.evaluations and run.best_score < best_score:
+            best_q, best_score = run.best_x, run.best_score
+
+    matrix = quaternion_to_matrix(best_q)
+    return {
+        'matrix': matrix,
+        'angles': matrix_to_euler(matrix),
+        'score': float(best_score),
+        'evaluations': evaluations,
+        'elapsed': time.perf_counter() - start_time,
+        'restarts': [(float(run.best_score), run.evaluations) for run in runs if run.evaluations],
+    }
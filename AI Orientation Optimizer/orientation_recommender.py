@@ -0,0 +1,334 @@
+"""
+orientation_recommender.py - Рекомендатель ориентаций для обученных моделей
+
+Общий для ai_orientation_predictor.py и predict_orientation.py.
+Матрица признаков строится сразу для всех M моделей и K ориентаций,
+так что пакет оценивается одним transform и одним predict на цель
+вместо 3 вызовов sklearn на каждую ориентацию.
+"""
+
+import numpy as np
+
+from orientation_geometry import ORIENTATION_FEATURE_NAMES, Z_INVARIANT_FEATURE_NAMES
+from pareto import pareto_mask
+from rotations import euler_to_matrix
+
+# Базовый набор проверяемых ориентаций (углы в градусах)
+DEFAULT_TEST_ORIENTATIONS = [
+    [0, 0, 0],    # default
+    [90, 0, 0],   # на боку
+    [0, 90, 0],
+    [0, 0, 90],
+    [45, 0, 0],
+    [0, 45, 0],
+    [0, 0, 45],
+    [45, 45, 0],
+    [45, 0, 45],
+    [0, 45, 45],
+    [45, 45, 45],
+    [30, 60, 0],
+    [60, 30, 0]
+]
+
+# Веса целей в общей оценке (чем меньше оценка, тем лучше)
+FILAMENT_WEIGHT = 0.7
+TIME_WEIGHT = 0.3
+
+# Имена основных целей; их веса можно переопределить в objective_weights
+FILAMENT_OBJECTIVE = 'filament_m'
+TIME_OBJECTIVE = 'time_min'
+# Цели, которые лучше увеличивать: в Парето-фронт идут со знаком минус
+MAXIMIZED_OBJECTIVES = {'pose_probability', 'bed_contact_area_mm2'}
+
+# Относительный шаг квантования сигнатур эквивалентных кандидатов
+SIGNATURE_TOLERANCE = 1e-3
+
+
+def combined_score(filament_pred, time_pred, objectives=None, objective_weights=None):
+    """
+    Общая оценка ориентаций: взвешенные филамент, время и дополнительные цели.
+    Веса филамента и времени по умолчанию FILAMENT_WEIGHT и TIME_WEIGHT.
+    """
+    objectives = objectives or {}
+    objective_weights = objective_weights or {}
+    scores = (objective_weights.get(FILAMENT_OBJECTIVE, FILAMENT_WEIGHT) * filament_pred
+              + objective_weights.get(TIME_OBJECTIVE, TIME_WEIGHT) * time_pred)
+    for name, values in objectives.items():
+        scores = scores + objective_weights.get(name, 0.0) * values
+    return scores
+
+
+def _quantize(values, tolerance):
+    """Квантование столбцов с шагом tolerance от наибольшего модуля в столбце"""
+    values = np.asarray(values, dtype=np.float64).reshape(len(values), -1)
+    scale = np.abs(values).max(axis=0)
+    step = tolerance * np.where(scale > 0, scale, 1.0)
+    return np.round(values / step) + 0.0
+
+
+def equivalent_candidates(orientations, orientation_features=None, extra_objectives=None,
+                          tolerance=SIGNATURE_TOLERANCE):
+    """
+    Номер кандидата-представителя (K,) для каждой ориентации.
+    Без признаков ориентации эквивалентны углы, отличающиеся только поворотом
+    вокруг вертикали (совпадает направление "вверх" в системе модели).
+    С признаками (K, m) в порядке ORIENTATION_FEATURE_NAMES сравниваются
+    квантованные признаки, не зависящие от поворота вокруг вертикали,
+    и дополнительные цели - так склеиваются и симметричные положения детали.
+    Представитель - первый кандидат группы в исходном порядке.
+    """
+    if orientation_features is None:
+        up = euler_to_matrix(np.asarray(orientations, dtype=np.float64).reshape(-1, 3))[:, 2, :]
+        signature = np.round(up / tolerance) + 0.0
+    else:
+        orientation_features = np.asarray(orientation_features, dtype=np.float64)
+        columns = [ORIENTATION_FEATURE_NAMES.index(name) for name in Z_INVARIANT_FEATURE_NAMES]
+        # Столбцы после ORIENTATION_FEATURE_NAMES (например, поддержки) тоже инвариантны
+        columns += list(range(len(ORIENTATION_FEATURE_NAMES), orientation_features.shape[1]))
+        parts = [orientation_features[:, columns]]
+        parts += [np.asarray(values, dtype=np.float64).reshape(-1, 1)
+                  for values in (extra_objectives or {}).values()]
+        signature = _quantize(np.hstack(parts), tolerance)
+
+    _, first, inverse = np.unique(signature, axis=0, return_index=True, return_inverse=True)
+    return first[inverse.ravel()]
+
+
+class CandidateSet:
+    """
+    Сырые значения целей всех кандидатов одной модели: filament_m, time_min
+    и дополнительные цели. Переранжирование под любые веса и Парето-фронт
+    считаются по сохраненной матрице, без повторного вызова моделей.
+    """
+
+    def __init__(self, orientations, filament_pred, time_pred, objectives=None, owners=None):
+        objectives = objectives or {}
+        self.orientations = [list(a) for a in orientations]
+        self.objective_names = [FILAMENT_OBJECTIVE, TIME_OBJECTIVE] + list(objectives)
+        self.values = np.column_stack([filament_pred, time_pred] + list(objectives.values()))
+        num_rot = len(self.orientations)
+        self.owners = np.arange(num_rot) if owners is None else np.asarray(owners)
+        self.is_owner = self.owners == np.arange(num_rot)
+
+    def scores(self, objective_weights=None):
+        """Общая оценка каждого кандидата при заданных весах"""
+        extra = {name: self.values[:, i] for i, name in enumerate(self.objective_names[2:], 2)}
+        return combined_score(self.values[:, 0], self.values[:, 1], extra, objective_weights)
+
+    def _entry(self, k, score):
+        return {
+            'angles': self.orientations[k],  # углы в градусах для вывода
+            'filament_pred': self.values[k, 0],
+            'time_pred': self.values[k, 1],
+            'score': score,
+            'objectives': {name: float(self.values[k, i])
+                           for i, name in enumerate(self.objective_names[2:], 2)},
+            'equivalent': [self.orientations[j] for j in np.flatnonzero(self.owners == k) if j != k]
+        }
+
+    def rank(self, objective_weights=None, top_k=5):
+        """top_k различных кандидатов по общей оценке (по возрастанию)"""
+        scores = self.scores(objective_weights)
+        # Устойчивая сортировка: при равных оценках порядок кандидатов
+        order = np.argsort(np.where(self.is_owner, scores, np.inf), kind='stable')
+        return [self._entry(k, scores[k]) for k in order[:min(top_k, self.is_owner.sum())]]
+
+    def pareto_front(self, names=None, objective_weights=None):
+        """
+        Недоминируемые кандидаты по целям names (по умолчанию все цели),
+        упорядоченные по общей оценке. Цели из MAXIMIZED_OBJECTIVES
+        считаются тем лучше, чем больше.
+        """
+        names = names or self.objective_names
+        columns = [self.objective_names.index(name) for name in names]
+        signs = np.array([-1.0 if name in MAXIMIZED_OBJECTIVES else 1.0 for name in names])
+        representatives = np.flatnonzero(self.is_owner)
+        mask = pareto_mask(self.values[np.ix_(representatives, columns)] * signs)
+
+        scores = self.scores(objective_weights)
+        front = representatives[mask]
+        front = front[np.argsort(scores[front], kind='stable')]
+        return [self._entry(k, scores[k]) for k in front]
+
+
+class OrientationRecommender:
+    def __init__(self, model_filament, model_time, scaler_X, test_orientations=None,
+                 angles_in_radians=False, feature_names=None):
+        # model_time=None: model_filament - совместная модель, predict которой
+        # возвращает (n, 2+) со столбцами [филамент, время, ...]
+        self.model_filament = model_filament
+        self.model_time = model_time
+        # None - модели обучены на исходных (немасштабированных) признаках
+        self.scaler_X = scaler_X
+        self.test_orientations = [list(a) for a in (test_orientations or DEFAULT_TEST_ORIENTATIONS)]
+        # Единицы углов в признаках должны совпадать с обучением модели
+        self.angles_in_radians = angles_in_radians
+        # Схема признаков модели (model_bundle): признаки ориентации после
+        # STL-вектора и углов обязательны, без нее недостающие заполняются нулями
+        self.feature_names = None if feature_names is None else list(feature_names)
+
+    def build_feature_matrix(self, stl_vectors, orientation_features=None, orientations=None):
+        """
+        Матрица признаков (M*K, n) для M STL-векторов и K ориентаций:
+        STL-вектор + углы, затем признаки ориентации и нули до числа
+        признаков модели. Строка m*K + k соответствует модели m и ориентации k.
+        orientation_features - (K, m) общая для всех моделей или (M, K, m).
+        orientations - углы (K, 3) в градусах, по умолчанию test_orientations.
+        """
+        stl_vectors = np.atleast_2d(np.asarray(stl_vectors, dtype=np.float64))
+        num_models = len(stl_vectors)
+        if orientations is None:
+            orientations = self.test_orientations
+        angles = np.asarray(orientations, dtype=np.float64).reshape(-1, 3)
+        if self.angles_in_radians:
+            angles = np.radians(angles)
+        num_rot = len(angles)
+
+        base = np.concatenate([
+            np.repeat(stl_vectors, num_rot, axis=0),
+            np.tile(angles, (num_models, 1)),
+        ], axis=1)
+
+        expected_len = getattr(self.scaler_X if self.scaler_X is not None else self.model_filament,
+                               'n_features_in_', base.shape[1])
+        missing = expected_len - base.shape[1]
+        if missing <= 0:
+            return base
+
+        if self.feature_names is not None:
+            required = self.feature_names[base.shape[1]:]
+            available = 0 if orientation_features is None else np.shape(orientation_features)[-1]
+            if available < missing:
+                raise ValueError(f"Модель ожидает признаки ориентации {required}, передано {available}")
+
+        extra = np.zeros((len(base), missing))
+        if orientation_features is not None:
+            orientation_features = np.asarray(orientation_features, dtype=np.float64)
+            if orientation_features.ndim == 2:
+                orientation_features = np.broadcast_to(
+                    orientation_features, (num_models,) + orientation_features.shape)
+            used = orientation_features.reshape(num_models * num_rot, -1)[:, :missing]
+            extra[:, :used.shape[1]] = used
+        return np.concatenate([base, extra], axis=1)
+
+    def predict_batch(self, stl_vectors, orientation_features=None, orientations=None, owners=None):
+        """
+        Предсказания филамента и времени, каждое формы (M, K).
+        owners - представители эквивалентных кандидатов, (K,) или (M, K):
+        модели вызываются только для представителей, остальные кандидаты
+        получают предсказания своего представителя.
+        """
+        features = self.build_feature_matrix(stl_vectors, orientation_features, orientations)
+        num_models = len(np.atleast_2d(stl_vectors))
+        num_rot = len(features) // num_models
+
+        rows = slice(None)
+        if owners is not None:
+            owners = np.broadcast_to(owners, (num_models, num_rot))
+            owner_rows = (owners + num_rot * np.arange(num_models)[:, None]).ravel()
+            rows = np.unique(owner_rows)
+
+        features_scaled = features[rows]
+        if self.scaler_X is not None:
+            features_scaled = self.scaler_X.transform(features_scaled)
+        filament_pred = np.empty(len(features))
+        time_pred = np.empty(len(features))
+        if self.model_time is None:
+            joint_pred = self.model_filament.predict(features_scaled)
+            filament_pred[rows], time_pred[rows] = joint_pred[:, 0], joint_pred[:, 1]
+        else:
+            filament_pred[rows] = self.model_filament.predict(features_scaled)
+            time_pred[rows] = self.model_time.predict(features_scaled)
+        if owners is not None:
+            filament_pred, time_pred = filament_pred[owner_rows], time_pred[owner_rows]
+        return filament_pred.reshape(num_models, num_rot), time_pred.reshape(num_models, num_rot)
+
+    def candidate_owners(self, num_models, orientations, orientation_features=None,
+                         extra_objectives=None):
+        """Представители эквивалентных кандидатов (M, K) (см. equivalent_candidates)"""
+        extra_objectives = {name: np.asarray(values, dtype=np.float64)
+                            for name, values in (extra_objectives or {}).items()}
+        per_model = (orientation_features is not None and np.ndim(orientation_features) == 3) or \
+            any(values.ndim == 2 for values in extra_objectives.values())
+        if not per_model:
+            owners = equivalent_candidates(orientations, orientation_features, extra_objectives)
+            return np.broadcast_to(owners, (num_models, len(owners)))
+
+        num_rot = len(orientations)
+        features = None
+        if orientation_features is not None:
+            features = np.broadcast_to(orientation_features, (num_models, num_rot, np.shape(orientation_features)[-1]))
+        objectives = {name: np.broadcast_to(values, (num_models, num_rot))
+                      for name, values in extra_objectives.items()}
+        return np.array([
+            equivalent_candidates(orientations, None if features is None else features[m],
+                                  {name: values[m] for name, values in objectives.items()})
+            for m in range(num_models)
+        ])
+
+    def evaluate_batch(self, stl_vectors, orientation_features=None, extra_objectives=None,
+                       orientations=None, dedupe=True):
+        """
+        Предсказания для M STL-векторов и всех кандидатов -> список из M CandidateSet.
+        extra_objectives - {имя: массив (K,) или (M, K)}.
+        orientations - кандидаты вместо test_orientations (например, устойчивые положения).
+        dedupe - склеивать эквивалентные кандидаты (поворот вокруг вертикали,
+        симметрия детали) до предсказания, так что рейтинг содержит разные варианты.
+        """
+        extra_objectives = extra_objectives or {}
+        if orientations is None:
+            orientations = self.test_orientations
+        num_models = len(np.atleast_2d(stl_vectors))
+        num_rot = len(orientations)
+
+        owners = None
+        if dedupe:
+            owners = self.candidate_owners(num_models, orientations, orientation_features, extra_objectives)
+        filament_pred, time_pred = self.predict_batch(stl_vectors, orientation_features, orientations, owners)
+
+        objectives = {name: np.broadcast_to(np.asarray(values, dtype=np.float64), (num_models, num_rot))
+                      for name, values in extra_objectives.items()}
+        return [
+            CandidateSet(orientations, filament_pred[m], time_pred[m],
+                         {name: values[m] for name, values in objectives.items()},
+                         None if owners is None else owners[m])
+            for m in range(num_models)
+        ]
+
+    def evaluate(self, stl_vector, orientation_features=None, extra_objectives=None,
+                 orientations=None, dedupe=True):
+        """CandidateSet одной модели для переранжирования и Парето-фронта"""
+        return self.evaluate_batch([stl_vector], orientation_features, extra_objectives,
+                                   orientations, dedupe)[0]
+
+    def recommend_batch(self, stl_vectors, top_k=5, orientation_features=None,
+                        extra_objectives=None, objective_weights=None, orientations=None,
+                        dedupe=True):
+        """
+        Рекомендации сразу для M STL-векторов: список из M списков top_k.
+        objective_weights - веса дополнительных целей (и, при необходимости,
+        filament_m/time_min); склеенные эквивалентные углы - в 'equivalent'.
+        Остальные параметры - как у evaluate_batch.
+        """
+        candidate_sets = self.evaluate_batch(stl_vectors, orientation_features, extra_objectives,
+                                             orientations, dedupe)
+        return [candidates.rank(objective_weights, top_k) for candidates in candidate_sets]
+
+    def recommend(self, stl_vector, top_k=5, orientation_features=None,
+                  extra_objectives=None, objective_weights=None, orientations=None,
+                  dedupe=True):
+        """
+        Рекомендует top_k лучших ориентаций для данного STL-вектора.
+        orientation_features - матрица (число кандидатов, m) признаков,
+        зависящих от ориентации (SimpleSTLVectorizer.extract_orientation_features);
+        ими заполняются дополнительные признаки модели вместо нулей.
+        extra_objectives - словарь {имя: массив по ориентациям}, например
+        расход на поддержки; objective_weights - их веса в общей оценке.
+        orientations - свой список углов-кандидатов вместо test_orientations.
+        dedupe - склеивать эквивалентные кандидаты (см. recommend_batch).
+        """
+        return self.recommend_batch(
+            [stl_vector], top_k=top_k, orientation_features=orientation_features,
+            extra_objectives=extra_objectives, objective_weights=objective_weights,
+            orientations=orientations, dedupe=dedupe
+        )[0]
@@ -0,0 +1,113 @@
+"""
+orientation_search.py - Плотный поиск ориентации по SO(3)
+
+Вместо 13 фиксированных углов оцениваются тысячи почти равномерных
+поворотов (спираль super-Fibonacci) пакетами, затем окрестности лучших
+кандидатов уточняются с шагом, уменьшающимся вдвое на каждом круге.
+Поиск ограничен числом оценок и/или временем, поэтому задержка
+предсказуема. Результат - матрица поворота и углы Эйлера (градусы).
+"""
+
+import time
+
+import numpy as np
+
+from orientation_geometry import compute_orientation_features, compute_support_features, support_filament_m
+from orientation_recommender import combined_score
+from rotations import grid_spacing_deg, local_rotations, matrix_to_euler, uniform_rotations
+
+DEFAULT_NUM_SAMPLES = 4096
+DEFAULT_REFINE_TOP = 8
+DEFAULT_REFINE_SAMPLES = 64
+DEFAULT_REFINE_ROUNDS = 4
+DEFAULT_BATCH_SIZE = 1024
+
+
+def search_orientations(score_fn, num_samples=DEFAULT_NUM_SAMPLES, refine_top=DEFAULT_REFINE_TOP,
+                        refine_samples=DEFAULT_REFINE_SAMPLES, refine_rounds=DEFAULT_REFINE_ROUNDS,
+                        max_evaluations=None, time_budget=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Ищет поворот с минимальной оценкой.
+    score_fn(rotations (K, 3, 3)) -> оценки (K,), чем меньше, тем лучше.
+    max_evaluations - предел числа оцененных поворотов, time_budget - секунд;
+    по исчерпании бюджета возвращается лучшее из уже оцененного.
+    Возвращает словарь: matrix, angles, score, evaluations, elapsed,
+    top_matrices/top_scores (refine_top лучших, по возрастанию оценки).
+    """
+    start = time.perf_counter()
+    evaluations = 0
+    best_rot = np.empty((0, 3, 3))
+    best_scores = np.empty(0)
+
+    def budget_left():
+        if time_budget is not None and time.perf_counter() - start >= time_budget:
+            return 0
+        if max_evaluations is not None:
+            return max_evaluations - evaluations
+        return np.inf
+
+    def evaluate(rotations):
+        # Оценка пакетами с проверкой бюджета перед каждым пакетом
+        nonlocal evaluations, best_rot, best_scores
+        for offset in range(0, len(rotations), batch_size):
+            left = budget_left()
+            if left <= 0:
+                return False
+            batch = rotations[offset:offset + int(min(batch_size, left))]
+            scores = np.asarray(score_fn(batch), dtype=np.float64)
+            evaluations += len(batch)
+
+            merged_rot = np.concatenate([best_rot, batch])
+            merged_scores = np.concatenate([best_scores, scores])
+            keep = np.argsort(merged_scores, kind='stable')[:refine_top]
+            best_rot, best_scores = merged_rot[keep], merged_scores[keep]
+        return True
+
+    # Грубая сетка, затем уточнение вокруг лучших с шагом, уменьшающимся вдвое
+    step = grid_spacing_deg(num_samples)
+    if evaluate(uniform_rotations(num_samples)):
+        for _ in range(refine_rounds):
+            local = local_rotations(refine_samples, step)
+            candidates = (local[None, :] @ best_rot[:, None]).reshape(-1, 3, 3)
+            if not evaluate(candidates):
+                break
+            step /= 2
+
+    if not len(best_scores):
+        raise ValueError("Бюджет поиска исчерпан до первой оценки")
+
+    return {
+        'matrix': best_rot[0],
+        'angles': matrix_to_euler(best_rot[0]),
+        'score': float(best_scores[0]),
+        'evaluations': evaluations,
+        'elapsed': time.perf_counter() - start,
+        'top_matrices': best_rot,
+        'top_scores': best_scores,
+    }
+
+
+def recommender_score_fn(recommender, stl_vector, triangles=None, overhang_angle=None,
+                         objective_weights=None):
+    """
+    Функция оценки поворотов для search_orientations на основе рекомендателя.
+    Если даны треугольники модели, признаки ориентации считаются для каждого
+    пакета поворотов; при overhang_angle добавляется расход на поддержки
+    (цель 'support_filament_m' с весом из objective_weights).
+    """
+    objective_weights = objective_weights or {}
+
+    def score_fn(rotations):
+        orientation_features = None
+        objectives = {}
+        if triangles is not None:
+            orientation_features = compute_orientation_features(triangles, rotations)
+            if overhang_angle is not None and objective_weights.get('support_filament_m'):
+                support = compute_support_features(triangles, rotations, overhang_angle)
+                objectives['support_filament_m'] = support_filament_m(support[:, 1])
+
+        filament_pred, time_pred = recommender.predict_batch(
+            stl_vector, orientation_features, orientations=matrix_to_euler(rotations))
+        return combined_score(filament_pred[0], time_pred[0], objectives, objective_weights)
+
+    return score_fn
@@ -0,0 +1,55 @@
+"""
+pareto.py - Недоминируемые кандидаты для многокритериального выбора
+
+Все цели минимизируются (максимизируемые цели передаются со знаком минус).
+Кандидат доминирует другого, если не хуже по всем целям и лучше хотя бы
+по одной.
+"""
+
+import numpy as np
+
+
+def pareto_mask(values):
+    """
+    Маска кандидатов Парето-фронта для матрицы целей (n, m).
+    Кандидаты просматриваются в лексикографическом порядке: первый
+    оставшийся всегда недоминируем и сразу отсеивает всех, кого доминирует,
+    поэтому работа - O(n * размер фронта * m) векторных операций.
+    Для двух целей достаточно одного прохода с накопленным минимумом.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if values.ndim == 1:
+        values = values[:, None]
+    if n == 0:
+        return np.zeros(0, dtype=bool)
+    order = np.lexsort(values.T[::-1])
+    sorted_values = values[order]
+
+    if values.shape[1] == 2:
+        # По первой цели уже отсортировано: фронт - строгие рекорды по второй;
+        # точные копии кандидата с фронта (идут подряд) тоже недоминируемы
+        second = sorted_values[:, 1]
+        best_before = np.concatenate([[np.inf], np.minimum.accumulate(second)[:-1]])
+        new_row = np.ones(n, dtype=bool)
+        new_row[1:] = (sorted_values[1:] != sorted_values[:-1]).any(axis=1)
+        run = np.cumsum(new_row) - 1
+        first_of_run = np.flatnonzero(new_row)
+        keep_sorted = (second < best_before)[first_of_run][run]
+    else:
+        keep_sorted = np.zeros(n, dtype=bool)
+        alive = np.ones(n, dtype=bool)
+        for i in range(n):
+            if not alive[i]:
+                continue
+            keep_sorted[i] = True
+            rest = np.flatnonzero(alive[i + 1:]) + i + 1
+            candidate = sorted_values[i]
+            dominated = (sorted_values[rest] >= candidate).all(axis=1) & \
+                (sorted_values[rest] > candidate).any(axis=1)
+            alive[rest[dominated]] = False
+
+    mask = np.zeros(n, dtype=bool)
+    mask[order] = keep_sorted
+    return mask
+
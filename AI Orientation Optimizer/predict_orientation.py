@@ -3,63 +3,28 @@ import json
 import os
 import sys
 from pathlib import Path
-import joblib
+
+from model_bundle import DEFAULT_BUNDLE_DIR, BundleSchemaError, load_bundle
+from orientation_geometry import support_filament_m
+from orientation_recommender import (
+    FILAMENT_OBJECTIVE, FILAMENT_WEIGHT, TIME_OBJECTIVE, TIME_WEIGHT, OrientationRecommender
+)
+from orientation_optimizer import DEFAULT_MAX_EVALUATIONS, optimize_orientation
+from orientation_search import recommender_score_fn, search_orientations
+from print_settings import load_cura_settings
+from stable_poses import stable_pose_candidates
+from stl_reader import read_stl_triangles
+
+# Pickle-модели старого формата, если пакета моделей еще нет
+LEGACY_MODELS_DIR = 'models_fixed'
+
+# Бюджет плотного поиска ориентации по умолчанию (секунды)
+DEFAULT_SEARCH_BUDGET_S = 5.0
 
 print("="*70)
 print("🎯 РЕКОМЕНДАЦИЯ ОПТИМАЛЬНОЙ ОРИЕНТАЦИИ ДЛЯ STL-МОДЕЛИ")
 print("="*70)
 
-# ============================================================================
-# КЛАСС РЕКОМЕНДАТЕЛЯ (ДОБАВЛЯЕМ ПРЯМО СЮДА)
-# ============================================================================
-
-class OrientationRecommender:
-    def __init__(self, model_filament, model_time, scaler_X):
-        self.model_filament = model_filament
-        self.model_time = model_time
-        self.scaler_X = scaler_X
-        self.test_orientations = [
-            [0, 0, 0],    # default
-            [90, 0, 0],   # на боку
-            [0, 90, 0],
-            [0, 0, 90],
-            [45, 0, 0],
-            [0, 45, 0],
-            [0, 0, 45],
-            [45, 45, 0],
-            [45, 0, 45],
-            [0, 45, 45],
-            [45, 45, 45],
-            [30, 60, 0],
-            [60, 30, 0]
-        ]
-    
-    def recommend(self, stl_vector, top_k=5):
-        """Рекомендует top_k лучших ориентаций для данного STL-вектора"""
-        predictions = []
-        for angles in self.test_orientations:
-            # Конвертируем углы в радианы
-            angles_rad = [np.radians(a) for a in angles]
-            features = list(stl_vector) + angles_rad
-            
-            # Добавляем нули для дополнительных признаков если нужно
-            expected_len = self.scaler_X.n_features_in_
-            if len(features) < expected_len:
-                features = features + [0] * (expected_len - len(features))
-            
-            features_scaled = self.scaler_X.transform([features])
-            filament_pred = self.model_filament.predict(features_scaled)[0]
-            time_pred = self.model_time.predict(features_scaled)[0]
-            score = 0.7 * filament_pred + 0.3 * time_pred
-            predictions.append({
-                'angles': angles,  # возвращаем углы в градусах для вывода
-                'filament_pred': filament_pred,
-                'time_pred': time_pred,
-                'score': score
-            })
-        
-        predictions.sort(key=lambda x: x['score'])
-        return predictions[:top_k]
 # ============================================================================
 # ОСНОВНАЯ ФУНКЦИЯ
 # ============================================================================
@@ -77,9 +42,10 @@ def main():
     
     # 2. Векторизация STL
     try:
-        from stl_vectorizer_fixed import SimpleSTLVectorizer
+        from stl_vectorizer_fixed import VECTORIZER_VERSION, SimpleSTLVectorizer
+        from feature_cache import extract_features_cached
         vectorizer = SimpleSTLVectorizer()
-        result = vectorizer.extract_basic_features(stl_file)
+        result = extract_features_cached(stl_file, vectorizer=vectorizer)
         stl_vector = result['vector']
         print(f"✅ STL-модель векторизована ({len(stl_vector)} признаков)")
     except ImportError:
@@ -90,54 +56,91 @@ def main():
         print(f"❌ Ошибка при векторизации: {e}")
         return
     
-    # 3. Загрузка обученных моделей
-    models_dir = 'models_improved'
-    if not os.path.exists(models_dir):
-        print(f"❌ Папка '{models_dir}' не найдена!")
-        print("   Сначала обучите модель, запустив: python ai_orientation_predictor.py")
-        return
-    
+    # 3. Загрузка пакета моделей: схема признаков проверяется при загрузке
     try:
-        model_filament = joblib.load(f'{models_dir}/model_filament.pkl')
-        model_time = joblib.load(f'{models_dir}/model_time.pkl')
-        scaler_X = joblib.load(f'{models_dir}/scaler_X.pkl')
-        print("✅ Базовые модели загружены")
-        
-        # Создаем рекомендателя на месте
-        recommender = OrientationRecommender(model_filament, model_time, scaler_X)
-        
-    except Exception as e:
-        print(f"❌ Ошибка загрузки моделей: {e}")
-        
-        # Проверяем, какие файлы есть в папке
-        print("\n📁 Содержимое папки models_fixed:")
-        for file in os.listdir(models_dir):
-            print(f"   • {file}")
-        
-        # Если нет файла recommender.pkl, но есть другие модели
-        if os.path.exists(f'{models_dir}/model_filament.pkl'):
-            print("\n⚠️  Файл recommender.pkl не найден, создаю рекомендателя...")
-            try:
-                model_filament = joblib.load(f'{models_dir}/model_filament.pkl')
-                model_time = joblib.load(f'{models_dir}/model_time.pkl')
-                scaler_X = joblib.load(f'{models_dir}/scaler_X.pkl')
-                recommender = OrientationRecommender(model_filament, model_time, scaler_X)
-                print("✅ Рекомендатель создан")
-            except Exception as e2:
-                print(f"❌ Не удалось создать рекомендателя: {e2}")
-                return
-        else:
+        bundle = load_bundle(DEFAULT_BUNDLE_DIR, vectorizer_version=VECTORIZER_VERSION)
+        recommender = bundle.recommender()
+        if bundle.feature_names[:len(vectorizer.feature_names)] != vectorizer.feature_names:
+            raise BundleSchemaError(f"STL-признаки пакета {bundle.feature_names[:len(vectorizer.feature_names)]} "
+                                    f"не совпадают с векторизатором {vectorizer.feature_names}")
+        print(f"✅ Пакет моделей загружен: {DEFAULT_BUNDLE_DIR} ({len(bundle.feature_names)} признаков)")
+    except BundleSchemaError as e:
+        print(f"❌ Пакет моделей не подходит: {e}")
+        print("   Переобучите модель: python ai_orientation_predictor.py")
+        return
+    except FileNotFoundError:
+        # Старый формат: отдельные pickle-файлы ai_orientation_predictor.py
+        if not os.path.exists(f'{LEGACY_MODELS_DIR}/model_filament.pkl'):
+            print(f"❌ Пакет моделей '{DEFAULT_BUNDLE_DIR}' не найден!")
+            print("   Сначала обучите модель, запустив: python ai_orientation_predictor.py")
+            return
+        try:
+            import joblib
+            # Модели обучены на исходных признаках (углы в градусах), без скейлера
+            recommender = OrientationRecommender(joblib.load(f'{LEGACY_MODELS_DIR}/model_filament.pkl'),
+                                                 joblib.load(f'{LEGACY_MODELS_DIR}/model_time.pkl'), None)
+            print(f"⚠️  Пакет моделей не найден, загружены модели из '{LEGACY_MODELS_DIR}' (схема не проверена)")
+            print(f"   Создать пакет: python model_bundle.py {LEGACY_MODELS_DIR} {DEFAULT_BUNDLE_DIR}")
+        except Exception as e:
+            print(f"❌ Ошибка загрузки моделей из '{LEGACY_MODELS_DIR}': {e}")
             return
     
     # 4. Получение рекомендаций
     print("🧠 Поиск оптимальной ориентации...")
     
-    # Убедимся, что stl_vector имеет длину 10
-    if len(stl_vector) != 10:
-        stl_vector = list(stl_vector[:10]) + [0] * max(0, 10 - len(stl_vector))
-        print(f"⚠️  STL-вектор приведён к длине 10 (было {len(result['vector'])})")
+    # Кандидаты: фиксированный список или устойчивые положения модели на столе
+    # (python predict_orientation.py --stable-poses [--with-fixed])
+    candidates = recommender.test_orientations
+    pose_probabilities = None
+    if '--stable-poses' in sys.argv:
+        try:
+            fixed = recommender.test_orientations if '--with-fixed' in sys.argv else None
+            candidates, pose_probabilities = stable_pose_candidates(read_stl_triangles(stl_file), fixed)
+            num_poses = sum(1 for p in pose_probabilities if p > 0)
+            print(f"✅ Устойчивых положений: {num_poses}, всего кандидатов: {len(candidates)}")
+        except Exception as e:
+            print(f"⚠️  Устойчивые положения не найдены: {e}")
+    
+    # Геометрия и поддержки всех кандидатов за одно чтение STL
+    orientation_features = None
+    extra_objectives = {}
+    objective_weights = {}
+    try:
+        support_settings = load_cura_settings()['support_settings']
+        geometry = vectorizer.extract_orientation_features(
+            stl_file, candidates,
+            overhang_angle=support_settings['overhang_angle']
+        )
+        orientation_features = geometry[:, :len(vectorizer.orientation_feature_names)]
+        support = dict(zip(vectorizer.support_feature_names,
+                           geometry[:, len(vectorizer.orientation_feature_names):].T))
+        extra_objectives = {
+            'overhang_area_mm2': support['overhang_area'],
+            'support_filament_m': support_filament_m(support['support_volume']),
+            'bed_contact_area_mm2': support['bed_contact_area']
+        }
+        # Поддержки учитываются в оценке, только если они включены в профиле Cura
+        if support_settings.get('support_enabled'):
+            objective_weights['support_filament_m'] = 0.7
+        print(f"✅ Геометрия {len(geometry)} ориентаций рассчитана")
+    except Exception as e:
+        print(f"⚠️  Геометрия ориентаций не рассчитана: {e}")
+    if pose_probabilities is not None:
+        extra_objectives['pose_probability'] = pose_probabilities
+    
+    # Веса оператора поверх профиля: --weights filament_m=0.5,time_min=0.5,support_filament_m=1
+    if '--weights' in sys.argv and sys.argv.index('--weights') + 1 < len(sys.argv):
+        for item in sys.argv[sys.argv.index('--weights') + 1].split(','):
+            name, _, value = item.partition('=')
+            objective_weights[name.strip()] = float(value)
     
-    recommendations = recommender.recommend(stl_vector, top_k=5)
+    # Сырые цели всех кандидатов сохраняются: рейтинг и Парето-фронт без повторных предсказаний
+    candidate_set = recommender.evaluate(
+        stl_vector, orientation_features=orientation_features,
+        extra_objectives=extra_objectives, orientations=candidates
+    )
+    recommendations = candidate_set.rank(objective_weights, top_k=5)
+    pareto_front = candidate_set.pareto_front(objective_weights=objective_weights)
     
     # 5. Вывод результатов
     print("\n" + "="*70)
@@ -150,7 +153,12 @@ def main():
         print(f"Размеры: {feats.get('width', 0):.1f}×{feats.get('depth', 0):.1f}×{feats.get('height', 0):.1f} мм")
         print(f"Объём: {feats.get('volume', 0):.1f} мм³")
     
-    print("\nКритерий: минимизация филамента (70%) и времени печати (30%)\n")
+    filament_weight = objective_weights.get(FILAMENT_OBJECTIVE, FILAMENT_WEIGHT)
+    time_weight = objective_weights.get(TIME_OBJECTIVE, TIME_WEIGHT)
+    extra_weights = ", ".join(f"{name}={weight:g}" for name, weight in objective_weights.items()
+                              if name not in (FILAMENT_OBJECTIVE, TIME_OBJECTIVE))
+    print(f"\nКритерий: минимизация филамента (вес {filament_weight:g}) и времени печати (вес {time_weight:g})"
+          + (f"; доп. цели: {extra_weights}" if extra_weights else "") + "\n")
     
     # Лучшая рекомендация
     best = recommendations[0]
@@ -159,6 +167,14 @@ def main():
     print(f"   Предсказанный расход филамента: {best['filament_pred']:.2f} м")
     print(f"   Предсказанное время печати: {best['time_pred']:.1f} мин")
     print(f"   Общая оценка: {best['score']:.2f}")
+    if best['equivalent']:
+        print(f"   Эквивалентны (поворот вокруг вертикали / симметрия): "
+              f"{', '.join(str(a) for a in best['equivalent'])}")
+    if 'support_filament_m' in best['objectives']:
+        print(f"   Поддержки (оценка): {best['objectives']['support_filament_m']:.2f} м, "
+              f"контакт со столом: {best['objectives']['bed_contact_area_mm2']:.0f} мм²")
+    if best['objectives'].get('pose_probability'):
+        print(f"   Вероятность устойчивого положения: {best['objectives']['pose_probability']:.0%}")
     
     # Альтернативные варианты
     print(f"\n📊 АЛЬТЕРНАТИВНЫЕ ВАРИАНТЫ:")
@@ -167,6 +183,14 @@ def main():
         print(f"      Филамент: {rec['filament_pred']:.2f} м")
         print(f"      Время: {rec['time_pred']:.1f} мин")
         print(f"      Оценка: {rec['score']:.2f}")
+        if rec['equivalent']:
+            print(f"      Эквивалентны: {', '.join(str(a) for a in rec['equivalent'])}")
+    
+    # Парето-фронт: ни одна другая ориентация не лучше сразу по всем целям
+    print(f"\n⚖️  ПАРЕТО-ФРОНТ ({len(pareto_front)} из {int(candidate_set.is_owner.sum())} различных):")
+    for rec in pareto_front[:10]:
+        print(f"   Углы: {rec['angles']}  филамент {rec['filament_pred']:.2f} м, "
+              f"время {rec['time_pred']:.1f} мин, оценка {rec['score']:.2f}")
     
     # 6. Сравнение с ориентацией по умолчанию (0,0,0)
     default_rec = None
@@ -188,6 +212,42 @@ def main():
                 percent = (time_saving / default_rec['time_pred']) * 100
                 print(f"   Время: экономия {time_saving:.1f} мин ({percent:.1f}%)")
     
+    # 6.1. Плотный поиск по SO(3) (python predict_orientation.py --search [--budget секунды])
+    #      или оптимизация CMA-ES (python predict_orientation.py --optimize [--evaluations N])
+    search_result = None
+    if '--search' in sys.argv or '--optimize' in sys.argv:
+        budget = DEFAULT_SEARCH_BUDGET_S
+        if '--budget' in sys.argv and sys.argv.index('--budget') + 1 < len(sys.argv):
+            budget = float(sys.argv[sys.argv.index('--budget') + 1])
+        max_evaluations = DEFAULT_MAX_EVALUATIONS
+        if '--evaluations' in sys.argv and sys.argv.index('--evaluations') + 1 < len(sys.argv):
+            max_evaluations = int(sys.argv[sys.argv.index('--evaluations') + 1])
+        if '--optimize' in sys.argv:
+            print(f"\n🧬 ОПТИМИЗАЦИЯ ОРИЕНТАЦИИ CMA-ES (до {max_evaluations} оценок)...")
+        else:
+            print(f"\n🔎 ПЛОТНЫЙ ПОИСК ОРИЕНТАЦИИ (бюджет {budget:.1f} с)...")
+        try:
+            triangles = read_stl_triangles(stl_file)
+            score_fn = recommender_score_fn(
+                recommender, stl_vector, triangles,
+                overhang_angle=load_cura_settings()['support_settings']['overhang_angle'],
+                objective_weights=objective_weights
+            )
+            if '--optimize' in sys.argv:
+                search_result = optimize_orientation(score_fn, max_evaluations=max_evaluations)
+                search_result['method'] = 'cma-es'
+            else:
+                search_result = search_orientations(score_fn, time_budget=budget)
+                search_result['method'] = 'grid'
+            x, y, z = search_result['angles']
+            print(f"   Углы: X={x:.1f}°, Y={y:.1f}°, Z={z:.1f}°")
+            print(f"   Оценка: {search_result['score']:.2f} "
+                  f"(лучшая из фиксированных: {best['score']:.2f})")
+            print(f"   Проверено поворотов: {search_result['evaluations']} "
+                  f"за {search_result['elapsed']:.2f} с")
+        except Exception as e:
+            print(f"⚠️  Поиск ориентации не выполнен: {e}")
+    
     # 7. Сохранение рекомендаций в JSON-файл
     output_data = {
         "stl_file": stl_file,
@@ -202,10 +262,22 @@ def main():
                 },
                 "predicted_filament_m": round(rec['filament_pred'], 2),
                 "predicted_time_min": round(rec['time_pred'], 1),
-                "score": round(rec['score'], 2)
+                "score": round(rec['score'], 2),
+                "objectives": {k: round(v, 2) for k, v in rec['objectives'].items()},
+                "equivalent_angles": rec['equivalent']
             }
             for i, rec in enumerate(recommendations)
         ],
+        "objective_weights": objective_weights,
+        "pareto_front": [
+            {
+                "angles": dict(zip("xyz", rec['angles'])),
+                "predicted_filament_m": round(rec['filament_pred'], 2),
+                "predicted_time_min": round(rec['time_pred'], 1),
+                "objectives": {k: round(v, 2) for k, v in rec['objectives'].items()}
+            }
+            for rec in pareto_front
+        ],
         "best_orientation": {
             "angles": {
                 "x": best['angles'][0],
@@ -216,6 +288,15 @@ def main():
             "predicted_time_min": round(best['time_pred'], 1)
         }
     }
+    if search_result is not None:
+        output_data["search_best"] = {
+            "angles": dict(zip("xyz", (round(float(v), 2) for v in search_result['angles']))),
+            "rotation_matrix": np.round(search_result['matrix'], 6).tolist(),
+            "score": round(search_result['score'], 2),
+            "method": search_result['method'],
+            "evaluations": search_result['evaluations'],
+            "elapsed_s": round(search_result['elapsed'], 3)
+        }
     
     output_filename = f"orientation_recommendation_{Path(stl_file).stem}.json"
     with open(output_filename, 'w', encoding='utf-8') as f:
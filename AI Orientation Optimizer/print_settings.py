@@ -0,0 +1,47 @@
+"""
+print_settings.py - Загрузка профиля печати из dataset/cura_settings.json
+"""
+
+import json
+from pathlib import Path
+
+DEFAULT_CURA_SETTINGS_PATH = Path(__file__).resolve().parent.parent / "dataset" / "cura_settings.json"
+
+# Значения профиля "Standard Quality 0.2mm" на случай отсутствия файла
+DEFAULT_CURA_SETTINGS = {
+    "quality_settings": {
+        "layer_height": 0.2,
+        "line_width": 0.4,
+        "wall_thickness": 0.8,
+        "top_bottom_thickness": 0.8
+    },
+    "infill_settings": {
+        "infill_density": 20,
+        "infill_pattern": "grid"
+    },
+    "material_settings": {
+        "material": "PLA",
+        "print_speed": 50
+    },
+    "support_settings": {
+        "support_enabled": False,
+        "overhang_angle": 45
+    }
+}
+
+
+def load_cura_settings(path=DEFAULT_CURA_SETTINGS_PATH):
+    """Профиль Cura; отсутствующие разделы и ключи берутся из DEFAULT_CURA_SETTINGS"""
+    settings = {section: dict(values) for section, values in DEFAULT_CURA_SETTINGS.items()}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            loaded = json.load(f)
+    except (OSError, ValueError):
+        return settings
+
+    for section, values in loaded.items():
+        if isinstance(values, dict):
+            settings.setdefault(section, {}).update(values)
+        else:
+            settings[section] = values
+    return settings
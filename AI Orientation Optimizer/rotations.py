@@ -0,0 +1,139 @@
+"""
+rotations.py - Матрицы поворота для ориентаций модели
+
+Углы задаются в градусах как [x, y, z]. Поворот выполняется сначала
+вокруг оси X, затем Y, затем Z (внешние оси): R = Rz @ Ry @ Rx.
+"""
+
+import numpy as np
+
+
+def euler_to_matrix(angles_deg):
+    """
+    Переводит углы Эйлера (градусы) в матрицы поворота.
+    angles_deg: [x, y, z] или массив (K, 3) -> (3, 3) или (K, 3, 3)
+    """
+    angles = np.radians(np.asarray(angles_deg, dtype=np.float64))
+    single = angles.ndim == 1
+    angles = np.atleast_2d(angles)
+
+    cx, cy, cz = np.cos(angles).T
+    sx, sy, sz = np.sin(angles).T
+
+    matrices = np.empty((len(angles), 3, 3))
+    matrices[:, 0, 0] = cy * cz
+    matrices[:, 0, 1] = sx * sy * cz - cx * sz
+    matrices[:, 0, 2] = cx * sy * cz + sx * sz
+    matrices[:, 1, 0] = cy * sz
+    matrices[:, 1, 1] = sx * sy * sz + cx * cz
+    matrices[:, 1, 2] = cx * sy * sz - sx * cz
+    matrices[:, 2, 0] = -sy
+    matrices[:, 2, 1] = sx * cy
+    matrices[:, 2, 2] = cx * cy
+
+    return matrices[0] if single else matrices
+
+
+def matrix_to_euler(matrices):
+    """
+    Обратное к euler_to_matrix: матрицы (3, 3) или (K, 3, 3) -> углы в градусах.
+    x и z в (-180, 180], y в [-90, 90]; при y = ±90° (шарнирный замок) z = 0.
+    """
+    matrices = np.asarray(matrices, dtype=np.float64)
+    single = matrices.ndim == 2
+    matrices = matrices.reshape(-1, 3, 3)
+
+    sy = np.clip(-matrices[:, 2, 0], -1.0, 1.0)
+    y = np.arcsin(sy)
+    x = np.arctan2(matrices[:, 2, 1], matrices[:, 2, 2])
+    z = np.arctan2(matrices[:, 1, 0], matrices[:, 0, 0])
+
+    locked = np.abs(sy) > 1 - 1e-9
+    x[locked] = np.arctan2(-matrices[locked, 1, 2], matrices[locked, 1, 1])
+    z[locked] = 0.0
+
+    angles = np.degrees(np.column_stack([x, y, z]))
+    return angles[0] if single else angles
+
+
+def quaternion_to_matrix(quaternions):
+    """Кватернионы [w, x, y, z] (4,) или (K, 4) -> матрицы поворота (нормируются)"""
+    q = np.asarray(quaternions, dtype=np.float64)
+    single = q.ndim == 1
+    q = np.atleast_2d(q)
+    w, x, y, z = (q / np.linalg.norm(q, axis=1, keepdims=True)).T
+
+    matrices = np.empty((len(q), 3, 3))
+    matrices[:, 0, 0] = 1 - 2 * (y * y + z * z)
+    matrices[:, 0, 1] = 2 * (x * y - w * z)
+    matrices[:, 0, 2] = 2 * (x * z + w * y)
+    matrices[:, 1, 0] = 2 * (x * y + w * z)
+    matrices[:, 1, 1] = 1 - 2 * (x * x + z * z)
+    matrices[:, 1, 2] = 2 * (y * z - w * x)
+    matrices[:, 2, 0] = 2 * (x * z - w * y)
+    matrices[:, 2, 1] = 2 * (y * z + w * x)
+    matrices[:, 2, 2] = 1 - 2 * (x * x + y * y)
+
+    return matrices[0] if single else matrices
+
+
+def axis_angle_to_matrix(rotation_vectors):
+    """Векторы поворота (K, 3): направление - ось, длина - угол в радианах (формула Родрига)"""
+    v = np.atleast_2d(np.asarray(rotation_vectors, dtype=np.float64))
+    angle = np.linalg.norm(v, axis=1)
+    half = angle / 2
+    # sin(a/2)/a -> 1/2 при a -> 0
+    scale = np.where(angle > 1e-12, np.sin(half) / np.where(angle > 1e-12, angle, 1.0), 0.5)
+    return quaternion_to_matrix(np.column_stack([np.cos(half), v * scale[:, None]]))
+
+
+def fibonacci_sphere(n):
+    """n почти равномерных единичных векторов на сфере (спираль Фибоначчи)"""
+    i = np.arange(n) + 0.5
+    z = 1 - 2 * i / n
+    r = np.sqrt(1 - z * z)
+    phi = np.pi * (3 - np.sqrt(5)) * i
+    return np.column_stack([r * np.cos(phi), r * np.sin(phi), z])
+
+
+# Константы спирали super-Fibonacci (Alexa, 2022)
+_SUPER_FIB_PHI = np.sqrt(2.0)
+_SUPER_FIB_PSI = 1.533751168755204288118041
+
+
+def uniform_quaternions(n):
+    """
+    n почти равномерно распределенных единичных кватернионов [w, x, y, z].
+    Спираль super-Fibonacci: детерминирована, без случайности
+    и хорошо покрывает пространство при любом n.
+    """
+    s = np.arange(n) + 0.5
+    r = np.sqrt(s / n)
+    big_r = np.sqrt(1 - s / n)
+    alpha = 2 * np.pi * s / _SUPER_FIB_PHI
+    beta = 2 * np.pi * s / _SUPER_FIB_PSI
+    return np.column_stack([
+        r * np.sin(alpha), r * np.cos(alpha), big_r * np.sin(beta), big_r * np.cos(beta)
+    ])
+
+
+def uniform_rotations(n):
+    """n почти равномерно распределенных поворотов SO(3) -> (n, 3, 3)"""
+    return quaternion_to_matrix(uniform_quaternions(n))
+
+
+def grid_spacing_deg(n):
+    """Характерный шаг (градусы) равномерной сетки из n поворотов"""
+    # Объем SO(3) в мере угла поворота - pi², на точку приходится pi²/n
+    return float(np.degrees((np.pi ** 2 / n) ** (1 / 3)))
+
+
+def local_rotations(n, max_angle_deg):
+    """
+    n малых поворотов вокруг единичной матрицы с углом до max_angle_deg
+    (оси - спираль Фибоначчи, углы равномерно по объему шара) -> (n, 3, 3).
+    Для уточнения вокруг R: local_rotations(...) @ R.
+    """
+    axes = fibonacci_sphere(n)
+    angles = np.radians(max_angle_deg) * np.cbrt((np.arange(n) + 0.5) / n)
+    return axis_angle_to_matrix(axes * angles[:, None])
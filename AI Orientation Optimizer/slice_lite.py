@@ -0,0 +1,346 @@
+"""
+slice_lite.py - Быстрая оценка филамента и времени печати без слайсера
+
+Сетка пересекается со всеми плоскостями слоев (середина каждого слоя)
+векторно: для каждой пары (треугольник, слой) сразу считается отрезок
+контура. По отрезкам получаются периметр и площадь сечения каждого слоя,
+а из них по профилю Cura (dataset/cura_settings.json) - длина стенок,
+сплошных верхних/нижних слоев и заполнения, расход филамента и время.
+Оценка зависит от ориентации и занимает миллисекунды на модель.
+
+Используется как запасной вариант в unified_analyzer.py (когда нет G-code)
+и как генератор меток для обучения:
+    python slice_lite.py [папка_с_stl] [файл_вывода]
+"""
+
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from orientation_geometry import FILAMENT_DIAMETER_MM, face_normals
+from print_settings import load_cura_settings
+from stl_reader import DEFAULT_CHUNK_SIZE, STLReadError, read_stl_triangles
+
+# Плотность PLA, г/см³
+MATERIAL_DENSITY = {'PLA': 1.24, 'PETG': 1.27, 'ABS': 1.04}
+# Эмпирические поправки, подобранные fit_calibration по парам json_files с
+# оценками из G-code (source "gcode_analysis"): 129 ориентаций 44 моделей.
+# Юбка/кайма и поддержки в профиле выключены (adhesion_settings, support_enabled),
+# поэтому поправки их не заменяют; они покрывают то, чего нет в модели слоев
+# и что по меткам не разделить: перекрытия линий, заполнение сложнее сетки,
+# лишние стенки вокруг отверстий. Подобраны на тех же парах, по которым
+# считается ошибка, поэтому main() выводит и ошибку без модели при подборе
+# (leave-one-model-out): медианная 10.0% по филаменту и 7.5% по времени
+# против 9.8% и 7.8% на тех же парах.
+# Длина экструзии: медиана отношения филамента G-code к оценке без поправок
+EXTRUSION_CALIBRATION = 1.75
+# Стенки в Cura печатаются на половине скорости печати (профиль Standard Quality)
+WALL_SPEED_FACTOR = 0.5
+# Доля времени на холостые перемещения, разгоны и торможения: медиана
+# отношения времени G-code (без смен слоев) к времени экструзии, минус 1
+TRAVEL_TIME_FACTOR = 0.55
+# Смена слоя (подъем оси Z, ретракт), секунды: оценка, не подбиралась
+LAYER_CHANGE_S = 1.0
+# Пар (треугольник, слой) в одном блоке векторного расчета
+MAX_BLOCK_PAIRS = 1 << 20
+
+LABEL_SOURCE = "slice_lite_estimation"
+
+
+def _layer_sections(tri, normals, base, layer_height, num_layers):
+    """
+    Периметр и площадь сечения каждого слоя для блока треугольников.
+    Возвращает (периметры (L,), площади (L,)).
+    """
+    z = tri[:, :, 2]
+    z_min, z_max = z.min(axis=1), z.max(axis=1)
+    # Слои k с плоскостью base + (k + 0.5) * h внутри [z_min, z_max]
+    k_lo = np.ceil((z_min - base) / layer_height - 0.5).astype(np.int64)
+    k_hi = np.floor((z_max - base) / layer_height - 0.5).astype(np.int64)
+    k_lo, k_hi = np.maximum(k_lo, 0), np.minimum(k_hi, num_layers - 1)
+    counts = np.where(z_max > z_min, np.maximum(k_hi - k_lo + 1, 0), 0)
+
+    face = np.repeat(np.arange(len(tri)), counts)
+    offsets = np.cumsum(counts) - counts
+    layer = k_lo[face] + np.arange(len(face)) - offsets[face]
+    plane = base + (layer + 0.5) * layer_height
+
+    # Вершины каждого треугольника по возрастанию z: длинное ребро v0-v2
+    # пересекается всегда, второе - v0-v1 или v1-v2
+    order = np.argsort(z, axis=1)
+    v = np.take_along_axis(tri, order[:, :, None], axis=1)[face]
+    v0, v1, v2 = v[:, 0], v[:, 1], v[:, 2]
+
+    def cross_point(a, b):
+        dz = b[:, 2] - a[:, 2]
+        t = np.divide(plane - a[:, 2], dz, out=np.zeros_like(dz), where=dz > 0)
+        return a[:, :2] + t[:, None] * (b[:, :2] - a[:, :2])
+
+    p = cross_point(v0, v2)
+    lower = (plane < v1[:, 2])[:, None]
+    q = np.where(lower, cross_point(v0, v1), cross_point(v1, v2))
+
+    # Направление отрезка: внешняя нормаль справа (внешний контур - против часовой)
+    d = q - p
+    n = normals[face]
+    flip = (n[:, 0] * d[:, 1] - n[:, 1] * d[:, 0]) < 0
+    p, q = np.where(flip[:, None], q, p), np.where(flip[:, None], p, q)
+
+    perimeter = np.bincount(layer, weights=np.linalg.norm(d, axis=1), minlength=num_layers)
+    area = np.bincount(layer, weights=0.5 * (p[:, 0] * q[:, 1] - q[:, 0] * p[:, 1]),
+                       minlength=num_layers)
+    return perimeter, area
+
+
+def slice_layers(triangles, layer_height=0.2, rotation=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Периметр контуров (мм) и площадь сечения (мм²) каждого слоя.
+    rotation - матрица (3, 3), применяемая к модели перед нарезкой.
+    Модель ставится на стол: первый слой начинается на минимальной z.
+    """
+    rotation = None if rotation is None else np.asarray(rotation, dtype=np.float64)
+
+    def block_at(start, size):
+        tri = np.asarray(triangles[start:start + size], dtype=np.float64)
+        return tri if rotation is None else tri @ rotation.T
+
+    z_min, z_max, span = np.inf, -np.inf, 0.0
+    for start in range(0, len(triangles), chunk_size):
+        z = block_at(start, chunk_size)[:, :, 2]
+        z_min, z_max = min(z_min, z.min()), max(z_max, z.max())
+        span += float(np.sum(z.max(axis=1) - z.min(axis=1)))
+
+    num_layers = max(int(np.ceil((z_max - z_min) / layer_height - 1e-9)), 1)
+    perimeter = np.zeros(num_layers)
+    area = np.zeros(num_layers)
+    # Блоки меньше chunk_size, если треугольники в среднем пересекают много слоев
+    layers_per_face = span / layer_height / max(len(triangles), 1) + 1
+    size = int(max(256, min(chunk_size, MAX_BLOCK_PAIRS / layers_per_face)))
+    for start in range(0, len(triangles), size):
+        tri = block_at(start, size)
+        block_perimeter, block_area = _layer_sections(tri, face_normals(tri), z_min,
+                                                      layer_height, num_layers)
+        perimeter += block_perimeter
+        area += block_area
+    return perimeter, area
+
+
+def _exposed_area(area, solid_layers):
+    """
+    Площадь слоя, открытая сверху или снизу в пределах solid_layers слоев:
+    сплошные верхние/нижние слои (в том числе на уступах модели).
+    """
+    padded = np.concatenate([np.zeros(solid_layers), area, np.zeros(solid_layers)])
+    windows = np.lib.stride_tricks.sliding_window_view(padded, 2 * solid_layers + 1)
+    return np.clip(area - windows.min(axis=1), 0, None)
+
+
+def estimate_print(triangles, settings=None, rotation=None, extrusion_calibration=EXTRUSION_CALIBRATION,
+                   travel_time_factor=TRAVEL_TIME_FACTOR):
+    """
+    Оценка печати модели в заданной ориентации по профилю Cura.
+    Возвращает словарь: layer_count, filament_length_m, material_g,
+    time_minutes и разбивку длины экструзии по типам линий (мм).
+    extrusion_calibration=1 и travel_time_factor=0 - оценка без поправок.
+    """
+    settings = settings or load_cura_settings()
+    quality = settings['quality_settings']
+    layer_height = float(quality['layer_height'])
+    line_width = float(quality['line_width'])
+    wall_thickness = float(quality['wall_thickness'])
+    solid_layers = max(int(round(float(quality['top_bottom_thickness']) / layer_height)), 1)
+    infill_density = float(settings['infill_settings']['infill_density']) / 100.0
+    speed = float(settings['material_settings']['print_speed'])
+    material = settings['material_settings'].get('material', 'PLA')
+
+    perimeter, area = slice_layers(triangles, layer_height, rotation)
+    area = np.clip(area, 0, None)
+
+    wall_lines = max(int(round(wall_thickness / line_width)), 1)
+    wall_area = np.minimum(area, perimeter * wall_thickness)
+    solid_area = np.minimum(_exposed_area(area, solid_layers), area - wall_area)
+    infill_area = np.clip(area - wall_area - solid_area, 0, None)
+
+    wall_length = float(np.sum(perimeter) * wall_lines) * extrusion_calibration
+    solid_length = float(np.sum(solid_area) / line_width) * extrusion_calibration
+    infill_length = float(np.sum(infill_area) * infill_density / line_width) * extrusion_calibration
+
+    # Сечение экструзии - ширина линии на высоту слоя
+    extruded_mm3 = (wall_length + solid_length + infill_length) * line_width * layer_height
+    filament_area = np.pi * (FILAMENT_DIAMETER_MM / 2) ** 2
+    density = MATERIAL_DENSITY.get(material, MATERIAL_DENSITY['PLA'])
+
+    print_s = wall_length / (speed * WALL_SPEED_FACTOR) + (solid_length + infill_length) / speed
+    time_s = print_s * (1 + travel_time_factor) + len(area) * LAYER_CHANGE_S
+
+    return {
+        'layer_count': len(area),
+        'filament_length_m': extruded_mm3 / filament_area / 1000.0,
+        'material_g': extruded_mm3 / 1000.0 * density,
+        'time_minutes': time_s / 60.0,
+        'wall_length_mm': wall_length,
+        'solid_length_mm': solid_length,
+        'infill_length_mm': infill_length,
+    }
+
+
+def estimate_prints(triangles, rotations, settings=None):
+    """estimate_print для K ориентаций (K, 3, 3) -> список словарей"""
+    settings = settings or load_cura_settings()
+    return [estimate_print(triangles, settings, rotation) for rotation in rotations]
+
+
+def calibration_pairs(base_dir="json_files", settings=None):
+    """
+    Пары (ориентация с оценкой из G-code, оценка без поправок) для подбора
+    EXTRUSION_CALIBRATION и TRAVEL_TIME_FACTOR. Возвращает словарь массивов:
+    model (группа для кросс-валидации), gcode_filament_m, gcode_time_min,
+    filament_m, print_s (время экструзии без холостых), layer_count.
+    """
+    settings = settings or load_cura_settings()
+    pairs = {key: [] for key in ('model', 'gcode_filament_m', 'gcode_time_min',
+                                 'filament_m', 'print_s', 'layer_count')}
+    for info_path in sorted(Path(base_dir).rglob("print_info.json")):
+        try:
+            with open(info_path, 'r', encoding='utf-8') as f:
+                info = json.load(f)
+        except (OSError, ValueError):
+            continue
+        estimated = info.get('estimated_values', {})
+        if estimated.get('source') != 'gcode_analysis' or not estimated.get('filament_length_m') \
+                or not estimated.get('time_minutes'):
+            continue
+        stl_files = sorted(info_path.parent.glob("*.stl"))
+        if not stl_files:
+            continue
+        try:
+            triangles = read_stl_triangles(stl_files[0])
+        except STLReadError:
+            continue
+
+        raw = estimate_print(triangles, settings, extrusion_calibration=1.0, travel_time_factor=0.0)
+        pairs['model'].append(info.get('model_name') or info_path.parent.parent.name)
+        pairs['gcode_filament_m'].append(float(estimated['filament_length_m']))
+        pairs['gcode_time_min'].append(float(estimated['time_minutes']))
+        pairs['filament_m'].append(raw['filament_length_m'])
+        pairs['print_s'].append(raw['time_minutes'] * 60 - raw['layer_count'] * LAYER_CHANGE_S)
+        pairs['layer_count'].append(raw['layer_count'])
+    return {key: np.asarray(values) for key, values in pairs.items()}
+
+
+def fit_calibration(pairs, rows=slice(None)):
+    """(EXTRUSION_CALIBRATION, TRAVEL_TIME_FACTOR) по строкам rows пар calibration_pairs"""
+    extrusion = float(np.median(pairs['gcode_filament_m'][rows] / pairs['filament_m'][rows]))
+    travel_s = pairs['gcode_time_min'][rows] * 60 - pairs['layer_count'][rows] * LAYER_CHANGE_S
+    travel = float(np.median(travel_s / (extrusion * pairs['print_s'][rows]))) - 1
+    return extrusion, travel
+
+
+def _calibrated(pairs, extrusion, travel, rows=slice(None)):
+    filament = extrusion * pairs['filament_m'][rows]
+    time_min = (extrusion * pairs['print_s'][rows] * (1 + travel)
+                + pairs['layer_count'][rows] * LAYER_CHANGE_S) / 60
+    return filament, time_min
+
+
+def calibration_errors(pairs, extrusion=EXTRUSION_CALIBRATION, travel=TRAVEL_TIME_FACTOR):
+    """
+    Медианная относительная ошибка филамента и времени: с заданными
+    поправками на всех парах ('in_sample', поправки подобраны на них же)
+    и без модели при подборе ('held_out': поправки для пар каждой модели
+    подбираются по остальным моделям - все ориентации модели вне подбора).
+    """
+    def median_errors(filament, time_min):
+        return (float(np.median(np.abs(filament / pairs['gcode_filament_m'] - 1))),
+                float(np.median(np.abs(time_min / pairs['gcode_time_min'] - 1))))
+
+    held_out = [np.empty(len(pairs['model'])) for _ in range(2)]
+    for model in np.unique(pairs['model']):
+        test = pairs['model'] == model
+        held_out[0][test], held_out[1][test] = _calibrated(pairs, *fit_calibration(pairs, ~test), test)
+    return {'in_sample': median_errors(*_calibrated(pairs, extrusion, travel)),
+            'held_out': median_errors(*held_out)}
+
+
+def generate_labels(base_dir="json_files", settings=None):
+    """
+    Метки filament_length_m / time_minutes для всех STL в base_dir.
+    Если рядом лежит print_info.json с оценкой из G-code, она добавляется
+    для сравнения (поля gcode_*).
+    """
+    settings = settings or load_cura_settings()
+    labels = []
+    for stl_path in sorted(Path(base_dir).rglob("*.stl")):
+        try:
+            triangles = read_stl_triangles(stl_path)
+        except STLReadError:
+            continue
+
+        start = time.perf_counter()
+        estimate = estimate_print(triangles, settings)
+        label = {
+            'stl_path': stl_path.as_posix(),
+            'filament_length_m': round(estimate['filament_length_m'], 2),
+            'material_g': round(estimate['material_g'], 2),
+            'time_minutes': round(estimate['time_minutes'], 1),
+            'layer_count': estimate['layer_count'],
+            'elapsed_ms': round((time.perf_counter() - start) * 1000, 2),
+            'source': LABEL_SOURCE,
+        }
+
+        info_path = stl_path.parent / "print_info.json"
+        if info_path.exists():
+            try:
+                with open(info_path, 'r', encoding='utf-8') as f:
+                    estimated = json.load(f).get('estimated_values', {})
+                if estimated.get('source') == 'gcode_analysis':
+                    label['gcode_filament_length_m'] = estimated.get('filament_length_m')
+                    label['gcode_time_minutes'] = estimated.get('time_minutes')
+            except (OSError, ValueError):
+                pass
+        labels.append(label)
+    return labels
+
+
+def main():
+    base_dir = sys.argv[1] if len(sys.argv) > 1 else "json_files"
+    output_path = sys.argv[2] if len(sys.argv) > 2 else "slice_lite_labels.json"
+
+    print("=" * 70)
+    print("🔪 SLICE-LITE: ОЦЕНКА ФИЛАМЕНТА И ВРЕМЕНИ БЕЗ СЛАЙСЕРА")
+    print("=" * 70)
+
+    if not Path(base_dir).exists():
+        print(f"❌ Папка {base_dir} не найдена!")
+        return
+
+    labels = generate_labels(base_dir)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(labels, f, indent=2, ensure_ascii=False)
+
+    print(f"✅ Меток: {len(labels)}, среднее время оценки "
+          f"{np.mean([l['elapsed_ms'] for l in labels]) if labels else 0:.1f} мс")
+    compared = [l for l in labels if l.get('gcode_filament_length_m') and l.get('gcode_time_minutes')]
+    if compared:
+        fil_err = [l['filament_length_m'] / l['gcode_filament_length_m'] - 1 for l in compared]
+        time_err = [l['time_minutes'] / l['gcode_time_minutes'] - 1 for l in compared]
+        print(f"📊 Сравнение с G-code ({len(compared)} ориентаций): медианная ошибка "
+              f"филамента {np.median(np.abs(fil_err)):.0%}, времени {np.median(np.abs(time_err)):.0%}")
+        # Поправки подобраны на этих же парах: ошибка без модели при подборе честнее
+        pairs = calibration_pairs(base_dir)
+        if len(np.unique(pairs['model'])) > 1:
+            errors = calibration_errors(pairs)
+            extrusion, travel = fit_calibration(pairs)
+            print(f"   Без модели при подборе поправок ({len(np.unique(pairs['model']))} моделей): "
+                  f"филамент {errors['held_out'][0]:.0%}, время {errors['held_out'][1]:.0%}")
+            print(f"   Поправки по всем парам: экструзия {extrusion:.2f} "
+                  f"(EXTRUSION_CALIBRATION={EXTRUSION_CALIBRATION}), холостые {travel:.2f} "
+                  f"(TRAVEL_TIME_FACTOR={TRAVEL_TIME_FACTOR})")
+    print(f"💾 {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+stable_poses.py - Устойчивые положения модели на столе
+
+Модель лежит на столе гранью своей выпуклой оболочки. Грань устойчива,
+если проекция центра масс на ее плоскость попадает внутрь грани.
+Вероятность положения - доля телесного угла (от центра масс), которую
+занимает грань; неустойчивые грани скатываются в соседние, поэтому
+вероятности нормируются по устойчивым граням. Копланарные треугольники
+оболочки и почти совпадающие положения объединяются.
+
+Выпуклая оболочка строится по уникальным вершинам и кэшируется,
+так что повторные вызовы для той же сетки ее не пересчитывают.
+"""
+
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+from orientation_geometry import center_of_mass
+from rotations import axis_angle_to_matrix, matrix_to_euler
+from stl_reader import unique_vertices
+
+# Положения с нормалями ближе этого угла считаются одним (градусы)
+POSE_MERGE_ANGLE_DEG = 1.0
+# Допуск попадания проекции центра масс в грань (в барицентрических координатах)
+INSIDE_TOLERANCE = 1e-9
+HULL_CACHE_SIZE = 16
+
+_hull_cache = OrderedDict()
+
+
+def _array_key(array):
+    array = np.ascontiguousarray(array)
+    return hashlib.sha1(array.tobytes()).hexdigest() + str(array.shape) + str(array.dtype)
+
+
+def convex_hull(triangles):
+    """
+    Выпуклая оболочка сетки (scipy ConvexHull по уникальным вершинам).
+    Результат кэшируется по содержимому массива треугольников.
+    """
+    from scipy.spatial import ConvexHull
+
+    key = _array_key(triangles)
+    if key in _hull_cache:
+        _hull_cache.move_to_end(key)
+        return _hull_cache[key]
+
+    hull = ConvexHull(unique_vertices(triangles))
+    _hull_cache[key] = hull
+    if len(_hull_cache) > HULL_CACHE_SIZE:
+        _hull_cache.popitem(last=False)
+    return hull
+
+
+def _solid_angles(a, b, c):
+    """Телесные углы треугольников (n, 3) x 3, видимых из начала координат"""
+    la, lb, lc = (np.linalg.norm(v, axis=1) for v in (a, b, c))
+    numerator = np.abs(np.einsum('ij,ij->i', a, np.cross(b, c)))
+    denominator = (la * lb * lc + np.einsum('ij,ij->i', a, b) * lc
+                   + np.einsum('ij,ij->i', a, c) * lb + np.einsum('ij,ij->i', b, c) * la)
+    return 2 * np.arctan2(numerator, denominator)
+
+
+def _contains_projection(a, b, c, point):
+    """Лежит ли проекция point на плоскость треугольника внутри него (барицентрически)"""
+    v0, v1, v2 = b - a, c - a, point - a
+    d00 = np.einsum('ij,ij->i', v0, v0)
+    d01 = np.einsum('ij,ij->i', v0, v1)
+    d11 = np.einsum('ij,ij->i', v1, v1)
+    d20 = np.einsum('ij,ij->i', v2, v0)
+    d21 = np.einsum('ij,ij->i', v2, v1)
+    denom = d00 * d11 - d01 * d01
+    denom = np.where(np.abs(denom) > 0, denom, np.inf)
+    v = (d11 * d20 - d01 * d21) / denom
+    w = (d00 * d21 - d01 * d20) / denom
+    return (v >= -INSIDE_TOLERANCE) & (w >= -INSIDE_TOLERANCE) & (v + w <= 1 + INSIDE_TOLERANCE)
+
+
+def _merge_normals(normals, weights, merge_angle_deg):
+    """
+    Жадное объединение близких нормалей: самая "тяжелая" нормаль забирает
+    все еще не занятые в радиусе merge_angle_deg (без цепочек, поэтому
+    гладкая кривая поверхность не сливается в одно положение).
+    Возвращает номер группы-представителя для каждой нормали.
+    """
+    from scipy.spatial import cKDTree
+
+    tree = cKDTree(normals)
+    radius = 2 * np.sin(np.radians(merge_angle_deg) / 2)
+    owner = np.full(len(normals), -1)
+    for i in np.argsort(-weights, kind='stable'):
+        if owner[i] >= 0:
+            continue
+        members = np.asarray(tree.query_ball_point(normals[i], radius), dtype=np.intp)
+        owner[members[owner[members] < 0]] = i
+    return owner
+
+
+def rotation_to_bed(normals):
+    """Повороты (K, 3, 3), переводящие внешние нормали граней (K, 3) в -Z (грань на стол)"""
+    normals = np.atleast_2d(np.asarray(normals, dtype=np.float64))
+    down = np.array([0.0, 0.0, -1.0])
+    axes = np.cross(normals, down)
+    sin_angle = np.linalg.norm(axes, axis=1)
+    angle = np.arctan2(sin_angle, normals @ down)
+    axes = np.where(sin_angle[:, None] > 1e-12, axes / np.maximum(sin_angle, 1e-12)[:, None],
+                    [1.0, 0.0, 0.0])
+    return axis_angle_to_matrix(axes * angle[:, None])
+
+
+def compute_stable_poses(triangles, merge_angle_deg=POSE_MERGE_ANGLE_DEG, max_poses=None):
+    """
+    Устойчивые положения сетки (N, 3, 3), по убыванию вероятности.
+    Возвращает словарь массивов:
+        rotations (P, 3, 3), angles (P, 3) в градусах,
+        probabilities (P,) - сумма 1, normals (P, 3) - внешние нормали граней.
+    """
+    triangles = np.asarray(triangles)
+    hull = convex_hull(triangles)
+    com = center_of_mass(triangles)
+
+    a, b, c = (hull.points[hull.simplices[:, i]] for i in range(3))
+    normals = hull.equations[:, :3]
+    weights = _solid_angles(a - com, b - com, c - com)
+    stable = _contains_projection(a, b, c, com)
+
+    # Копланарные треугольники оболочки (одинаковые нормали) - одна грань
+    _, face = np.unique(np.round(normals, 6) + 0.0, axis=0, return_inverse=True)
+    face = face.ravel()
+    face_normals = np.zeros((face.max() + 1, 3))
+    face_normals[face] = normals
+    face_weights = np.bincount(face, weights=weights)
+    face_stable = np.bincount(face, weights=stable) > 0
+
+    # Почти совпадающие грани - одно положение
+    owner = _merge_normals(face_normals, face_weights, merge_angle_deg)
+    pose_ids, pose = np.unique(owner, return_inverse=True)
+    pose_weights = np.bincount(pose, weights=face_weights)
+    pose_stable = np.bincount(pose, weights=face_stable) > 0
+    pose_normals = face_normals[pose_ids]
+
+    pose_normals, pose_weights = pose_normals[pose_stable], pose_weights[pose_stable]
+    order = np.argsort(-pose_weights, kind='stable')[:max_poses]
+    pose_normals, pose_weights = pose_normals[order], pose_weights[order]
+
+    rotations = rotation_to_bed(pose_normals)
+    return {
+        'rotations': rotations,
+        'angles': matrix_to_euler(rotations),
+        'probabilities': pose_weights / max(pose_weights.sum(), 1e-12),
+        'normals': pose_normals,
+    }
+
+
+def stable_pose_candidates(triangles, fixed_orientations=None, max_poses=None, decimals=2):
+    """
+    Кандидаты для OrientationRecommender.recommend(orientations=...):
+    углы устойчивых положений (округленные до decimals), при необходимости
+    дополненные фиксированным списком без повторов.
+    Возвращает (список углов [x, y, z], вероятности - 0.0 для фиксированных).
+    """
+    poses = compute_stable_poses(triangles, max_poses=max_poses)
+    candidates = [[round(float(v), decimals) + 0.0 for v in angles] for angles in poses['angles']]
+    probabilities = poses['probabilities'].tolist()
+
+    seen = {tuple(angles) for angles in candidates}
+    for angles in fixed_orientations or []:
+        key = tuple(float(v) for v in angles)
+        if key not in seen:
+            seen.add(key)
+            candidates.append(list(angles))
+            probabilities.append(0.0)
+    return candidates, probabilities
@@ -0,0 +1,265 @@
+"""
+stl_reader.py - Быстрое чтение STL без trimesh
+
+Читает треугольники бинарного STL напрямую в массив (N, 3, 3) float32
+через np.memmap (без копирования), ASCII STL разбирается через numpy.
+Статистика (границы, объем, площадь) считается блоками в float64,
+поэтому временная память ограничена размером блока.
+"""
+
+import os
+import numpy as np
+
+# Запись треугольника в бинарном STL: нормаль, 3 вершины, атрибут (50 байт)
+STL_RECORD_DTYPE = np.dtype([
+    ('normal', '<f4', (3,)),
+    ('vertices', '<f4', (3, 3)),
+    ('attr', '<u2'),
+])
+
+STL_HEADER_SIZE = 84
+DEFAULT_CHUNK_SIZE = 65536
+# Точность слияния вершин, как tol.merge = 1e-8 в trimesh
+MERGE_DIGITS = 8
+
+
+class STLReadError(ValueError):
+    """Файл не является корректным STL"""
+
+
+def is_binary_stl(stl_path):
+    """Определяет формат STL по размеру файла и числу треугольников в заголовке"""
+    file_size = os.path.getsize(stl_path)
+    if file_size < STL_HEADER_SIZE:
+        return False
+
+    with open(stl_path, 'rb') as f:
+        header = f.read(STL_HEADER_SIZE)
+
+    num_faces = int(np.frombuffer(header, dtype='<u4', count=1, offset=80)[0])
+    if file_size == STL_HEADER_SIZE + num_faces * STL_RECORD_DTYPE.itemsize:
+        return True
+
+    # ASCII файлы начинаются с "solid", но некоторые бинарные тоже
+    return not header.lstrip().startswith(b'solid')
+
+
+def _read_binary_records(stl_path):
+    """Отображает записи бинарного STL в память (np.memmap, без копирования)"""
+    file_size = os.path.getsize(stl_path)
+    with open(stl_path, 'rb') as f:
+        f.seek(80)
+        num_faces = int(np.frombuffer(f.read(4), dtype='<u4')[0])
+
+    expected = STL_HEADER_SIZE + num_faces * STL_RECORD_DTYPE.itemsize
+    if file_size < expected:
+        raise STLReadError(
+            f"Обрезанный бинарный STL: ожидалось {expected} байт, получено {file_size}"
+        )
+
+    if num_faces == 0:
+        return np.zeros(0, dtype=STL_RECORD_DTYPE)
+
+    return np.memmap(stl_path, dtype=STL_RECORD_DTYPE, mode='r',
+                     offset=STL_HEADER_SIZE, shape=(num_faces,))
+
+
+def _read_ascii_triangles(stl_path):
+    """Разбирает ASCII STL: все координаты после ключевого слова 'vertex'"""
+    with open(stl_path, 'rb') as f:
+        tokens = np.array(f.read().split())
+
+    vertex_idx = np.flatnonzero(tokens == b'vertex')
+    if len(vertex_idx) == 0 or len(vertex_idx) % 3 != 0:
+        raise STLReadError(f"ASCII STL без корректных вершин: {len(vertex_idx)} шт.")
+
+    coords = tokens[vertex_idx[:, None] + np.arange(1, 4)]
+    return coords.astype(np.float32).reshape(-1, 3, 3)
+
+
+def read_stl_triangles(stl_path):
+    """
+    Читает STL и возвращает массив треугольников формы (N, 3, 3) float32.
+    Для бинарного STL это представление поверх np.memmap (без копии данных).
+    """
+    stl_path = str(stl_path)
+    if is_binary_stl(stl_path):
+        return _read_binary_records(stl_path)['vertices']
+    return _read_ascii_triangles(stl_path)
+
+
+def _chunk_sums(chunk):
+    """Суммы для одного блока треугольников (в float64)"""
+    tri = np.asarray(chunk, dtype=np.float64)
+    v0, v1, v2 = tri[:, 0], tri[:, 1], tri[:, 2]
+
+    cross = np.cross(v1 - v0, v2 - v0)
+    area = 0.5 * np.sqrt(np.einsum('ij,ij->i', cross, cross)).sum()
+    # Знаковый объем тетраэдров (начало координат, v0, v1, v2)
+    volume = np.einsum('ij,ij->i', v0, np.cross(v1, v2)).sum() / 6.0
+
+    return tri.min(axis=(0, 1)), tri.max(axis=(0, 1)), volume, area
+
+
+def compute_mesh_stats(triangles, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Считает границы, знаковый объем, площадь и число граней.
+    triangles - массив (N, 3, 3), в том числе np.memmap.
+    """
+    num_faces = len(triangles)
+    if num_faces == 0:
+        raise STLReadError("STL не содержит треугольников")
+
+    bounds_min = np.full(3, np.inf)
+    bounds_max = np.full(3, -np.inf)
+    volume = 0.0
+    area = 0.0
+
+    for start in range(0, num_faces, chunk_size):
+        c_min, c_max, c_volume, c_area = _chunk_sums(triangles[start:start + chunk_size])
+        bounds_min = np.minimum(bounds_min, c_min)
+        bounds_max = np.maximum(bounds_max, c_max)
+        volume += c_volume
+        area += c_area
+
+    return {
+        'bounds': np.array([bounds_min, bounds_max]),
+        'volume': float(volume),
+        'area': float(area),
+        'num_faces': num_faces,
+    }
+
+
+def unique_vertices(triangles, digits=MERGE_DIGITS):
+    """Уникальные вершины (V, 3) float64, как после слияния вершин в trimesh"""
+    vertices = np.round(np.asarray(triangles, dtype=np.float64).reshape(-1, 3), digits)
+    # + 0.0 превращает -0.0 в 0.0, иначе байтовое сравнение их различает
+    vertices += 0.0
+    unique = np.unique(np.ascontiguousarray(vertices).view(np.dtype((np.void, 24))))
+    return unique.view(np.float64).reshape(-1, 3)
+
+
+def count_unique_vertices(triangles, digits=MERGE_DIGITS):
+    """Число уникальных вершин (как после слияния вершин в trimesh)"""
+    return len(unique_vertices(triangles, digits))
+
+
+def read_stl_stats(stl_path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Читает STL и возвращает статистику сетки вместе с числом вершин"""
+    triangles = read_stl_triangles(stl_path)
+    stats = compute_mesh_stats(triangles, chunk_size=chunk_size)
+    stats['num_vertices'] = count_unique_vertices(triangles)
+    return stats
+
+
+def iter_stl_chunks(stl_path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Потоковое чтение STL блоками по chunk_size треугольников (n, 3, 3) float32.
+    В памяти одновременно находится только один блок.
+    """
+    stl_path = str(stl_path)
+    if not is_binary_stl(stl_path):
+        yield from _iter_ascii_chunks(stl_path, chunk_size)
+        return
+
+    file_size = os.path.getsize(stl_path)
+    with open(stl_path, 'rb') as f:
+        header = f.read(STL_HEADER_SIZE)
+        num_faces = int(np.frombuffer(header, dtype='<u4', count=1, offset=80)[0])
+        if file_size < STL_HEADER_SIZE + num_faces * STL_RECORD_DTYPE.itemsize:
+            raise STLReadError(f"Обрезанный бинарный STL: {num_faces} треугольников в заголовке")
+
+        remaining = num_faces
+        while remaining > 0:
+            count = min(chunk_size, remaining)
+            data = f.read(count * STL_RECORD_DTYPE.itemsize)
+            yield np.frombuffer(data, dtype=STL_RECORD_DTYPE)['vertices']
+            remaining -= count
+
+
+def _iter_ascii_chunks(stl_path, chunk_size):
+    """Построчный разбор ASCII STL с выдачей блоков треугольников"""
+    coords = []
+    with open(stl_path, 'rb') as f:
+        for line in f:
+            parts = line.split()
+            if parts and parts[0] == b'vertex':
+                coords.append(parts[1:4])
+                if len(coords) == 3 * chunk_size:
+                    yield np.array(coords, dtype=np.float32).reshape(-1, 3, 3)
+                    coords = []
+
+    if len(coords) % 3 != 0:
+        raise STLReadError(f"ASCII STL: число вершин не кратно 3")
+    if coords:
+        yield np.array(coords, dtype=np.float32).reshape(-1, 3, 3)
+
+
+class StreamingMeshStats:
+    """
+    Накопитель статистики сетки по блокам треугольников: границы, знаковый
+    объем, площадь, центр масс, статистика нормалей и число граней.
+    Память не зависит от размера файла.
+    """
+
+    def __init__(self, down_normal_z=-0.7):
+        self.down_normal_z = down_normal_z
+        self.bounds_min = np.full(3, np.inf)
+        self.bounds_max = np.full(3, -np.inf)
+        self.volume = 0.0
+        self.area = 0.0
+        self.moment = np.zeros(3)
+        self.normal_sum = np.zeros(3)
+        self.normal_sq_sum = np.zeros(3)
+        self.down_faces = 0
+        self.num_faces = 0
+
+    def update(self, chunk):
+        tri = np.asarray(chunk, dtype=np.float64)
+        v0, v1, v2 = tri[:, 0], tri[:, 1], tri[:, 2]
+
+        cross = np.cross(v1 - v0, v2 - v0)
+        lengths = np.sqrt(np.einsum('ij,ij->i', cross, cross))
+        normals = np.divide(cross, lengths[:, None], out=np.zeros_like(cross),
+                            where=lengths[:, None] > 0)
+        tet_volume = np.einsum('ij,ij->i', v0, np.cross(v1, v2)) / 6.0
+
+        self.bounds_min = np.minimum(self.bounds_min, tri.min(axis=(0, 1)))
+        self.bounds_max = np.maximum(self.bounds_max, tri.max(axis=(0, 1)))
+        self.volume += tet_volume.sum()
+        self.area += 0.5 * lengths.sum()
+        self.moment += tet_volume @ tri.sum(axis=1) / 4.0
+        self.normal_sum += normals.sum(axis=0)
+        self.normal_sq_sum += (normals ** 2).sum(axis=0)
+        self.down_faces += int((normals[:, 2] < self.down_normal_z).sum())
+        self.num_faces += len(tri)
+
+    def result(self):
+        if self.num_faces == 0:
+            raise STLReadError("STL не содержит треугольников")
+
+        normals_mean = self.normal_sum / self.num_faces
+        normals_var = np.maximum(self.normal_sq_sum / self.num_faces - normals_mean ** 2, 0.0)
+        center_mass = (self.moment / self.volume if abs(self.volume) > 1e-12
+                       else (self.bounds_min + self.bounds_max) / 2)
+
+        return {
+            'bounds': np.array([self.bounds_min, self.bounds_max]),
+            'volume': float(self.volume),
+            'area': float(self.area),
+            'num_faces': self.num_faces,
+            # Для замкнутой сетки рода 0 по формуле Эйлера: V = F / 2 + 2
+            'num_vertices_estimate': self.num_faces // 2 + 2,
+            'center_mass': center_mass,
+            'normals_mean': normals_mean,
+            'normals_std': np.sqrt(normals_var),
+            'down_faces_ratio': self.down_faces / self.num_faces,
+        }
+
+
+def read_stl_stats_streaming(stl_path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Статистика STL за один проход блоками фиксированного размера"""
+    stats = StreamingMeshStats()
+    for chunk in iter_stl_chunks(stl_path, chunk_size):
+        stats.update(chunk)
+    return stats.result()
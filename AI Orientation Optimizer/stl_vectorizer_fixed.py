@@ -3,6 +3,20 @@ import json
 import os
 from pathlib import Path
 
+from orientation_geometry import (
+    ORIENTATION_FEATURE_NAMES, SUPPORT_FEATURE_NAMES,
+    compute_orientation_features, compute_support_features,
+)
+from rotations import euler_to_matrix
+from stl_reader import STLReadError, read_stl_stats, read_stl_stats_streaming, read_stl_triangles
+
+# Версия признаков: меняется при любом изменении расчета признаков,
+# чтобы кэш (feature_cache.py) не отдавал устаревшие значения
+VECTORIZER_VERSION = 2
+
+# В режиме streaming='auto' потоково читаются файлы больше этого размера
+STREAMING_AUTO_BYTES = 64 * 1024 * 1024
+
 print("="*60)
 print("🔧 STL ВЕКТОРИЗАТОР ДЛЯ РЕКОМЕНДАТЕЛЬНОЙ СИСТЕМЫ")
 print("="*60)
@@ -10,40 +24,34 @@ print("="*60)
 class SimpleSTLVectorizer:
     """Упрощенный векторизатор STL файлов"""
     
-    def __init__(self):
+    def __init__(self, streaming=False):
+        """
+        streaming: False - сетка читается целиком (np.memmap),
+        True - блоками фиксированного размера с постоянным потреблением памяти,
+        'auto' - потоково только файлы больше STREAMING_AUTO_BYTES.
+        """
+        self.streaming = streaming
         self.feature_names = [
             'width', 'depth', 'height', 'volume', 'area',
             'num_vertices', 'num_faces', 'center_x', 'center_y', 'center_z'
         ]
+        self.orientation_feature_names = list(ORIENTATION_FEATURE_NAMES)
+        self.support_feature_names = list(SUPPORT_FEATURE_NAMES)
     
-    def extract_basic_features(self, stl_path):
+    def extract_basic_features(self, stl_path, strict=False):
         """
         Извлекает базовые признаки из STL файла.
         Возвращает словарь с ключами 'vector' (основной) и 'features'.
+        strict=True: вместо вектора-заглушки выбрасывается исключение,
+        а сетка без граней (например, placeholder) считается ошибкой.
         """
         try:
-            # Пытаемся использовать trimesh для точного анализа
-            import trimesh
-            mesh = trimesh.load(stl_path)
-            features = {}
-            
-            # 1. Размеры модели
-            if hasattr(mesh, 'bounding_box'):
-                bbox = mesh.bounding_box.extents
-                features['width'] = float(bbox[0])
-                features['depth'] = float(bbox[1])
-                features['height'] = float(bbox[2])
-            else:
-                # Запасной вариант
-                features['width'] = features['depth'] = features['height'] = 1.0
-            
-            # 2. Объем и площадь (примерные, если не доступны)
-            features['volume'] = float(mesh.volume) if hasattr(mesh, 'volume') else 1.0
-            features['area'] = float(mesh.area) if hasattr(mesh, 'area') else 1.0
-            
-            # 3. Информация о сетке
-            features['num_vertices'] = len(mesh.vertices) if hasattr(mesh, 'vertices') else 100
-            features['num_faces'] = len(mesh.faces) if hasattr(mesh, 'faces') else 200
+            # Сначала встроенный быстрый читатель, trimesh - запасной вариант
+            try:
+                features = self._features_from_native_reader(stl_path)
+            except STLReadError as read_error:
+                print(f"  ⚠️  Встроенный читатель STL: {str(read_error)[:50]}, пробуем trimesh")
+                features = self._features_from_trimesh(stl_path, strict=strict)
             
             # 4. Центр масс (примерный)
             features['center_x'] = features['center_y'] = features['center_z'] = 0.5
@@ -62,13 +70,92 @@ class SimpleSTLVectorizer:
             }
             
         except ImportError:
+            if strict:
+                raise
             # Если trimesh не установлен, используем упрощенный режим
             print(f"  ⚠️  trimesh не установлен. Упрощенный анализ: {os.path.basename(stl_path)}")
             return self._create_dummy_vector(stl_path)
         except Exception as e:
+            if strict:
+                raise
             print(f"  ⚠️  Ошибка анализа {stl_path}: {str(e)[:50]}...")
             return self._create_dummy_vector(stl_path)
     
+    def extract_orientation_features(self, stl_path, rotations, overhang_angle=None):
+        """
+        Признаки, зависящие от ориентации, сразу для K поворотов.
+        STL читается один раз; rotations - матрицы (K, 3, 3)
+        или углы Эйлера в градусах (K, 3).
+        Возвращает матрицу (K, len(self.orientation_feature_names)).
+        Если задан overhang_angle, справа добавляются столбцы
+        self.support_feature_names (нависания, поддержки, контакт со столом).
+        """
+        rotations = np.asarray(rotations, dtype=np.float64)
+        if rotations.shape[-2:] != (3, 3):
+            rotations = euler_to_matrix(rotations.reshape(-1, 3))
+        
+        triangles = read_stl_triangles(stl_path)
+        features = compute_orientation_features(triangles, rotations)
+        if overhang_angle is None:
+            return features
+        
+        support = compute_support_features(triangles, rotations, overhang_angle)
+        return np.hstack([features, support])
+    
+    def uses_streaming(self, stl_path):
+        """Будет ли файл прочитан потоково"""
+        if self.streaming == 'auto':
+            return os.path.getsize(stl_path) > STREAMING_AUTO_BYTES
+        return bool(self.streaming)
+    
+    def _features_from_native_reader(self, stl_path):
+        """Признаки через stl_reader: треугольники читаются без построения сцены"""
+        if self.uses_streaming(stl_path):
+            stats = read_stl_stats_streaming(stl_path)
+            # Слияние вершин требует всей сетки, поэтому число вершин оценивается
+            stats['num_vertices'] = stats['num_vertices_estimate']
+        else:
+            stats = read_stl_stats(stl_path)
+        bbox = stats['bounds'][1] - stats['bounds'][0]
+        
+        return {
+            'width': float(bbox[0]),
+            'depth': float(bbox[1]),
+            'height': float(bbox[2]),
+            'volume': stats['volume'],
+            'area': stats['area'],
+            'num_vertices': stats['num_vertices'],
+            'num_faces': stats['num_faces'],
+        }
+    
+    def _features_from_trimesh(self, stl_path, strict=False):
+        """Признаки через trimesh (для файлов, которые не читает stl_reader)"""
+        import trimesh
+        mesh = trimesh.load(stl_path)
+        if strict and len(getattr(mesh, 'faces', [])) == 0:
+            raise STLReadError(f"trimesh не нашел граней ({type(mesh).__name__})")
+        features = {}
+        
+        # 1. Размеры модели
+        if hasattr(mesh, 'bounding_box'):
+            bbox = mesh.bounding_box.extents
+            features['width'] = float(bbox[0])
+            features['depth'] = float(bbox[1])
+            features['height'] = float(bbox[2])
+        else:
+            # Запасной вариант
+            features['width'] = features['depth'] = features['height'] = 1.0
+        
+        # 2. Объем и площадь (примерные, если не доступны)
+        features['volume'] = float(mesh.volume) if hasattr(mesh, 'volume') else 1.0
+        features['area'] = float(mesh.area) if hasattr(mesh, 'area') else 1.0
+        
+        # 3. Информация о сетке
+        features['num_vertices'] = len(mesh.vertices) if hasattr(mesh, 'vertices') else 100
+        features['num_faces'] = len(mesh.faces) if hasattr(mesh, 'faces') else 200
+        
+        return features
+    
     def _create_dummy_vector(self, stl_path):
         """Создает вектор на основе имени файла, если анализ не удался"""
         file_hash = hash(os.path.basename(stl_path)) % 10000
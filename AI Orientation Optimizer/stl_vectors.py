@@ -0,0 +1,259 @@
+"""
+stl_vectors.py - Матрица признаков STL с типизированными столбцами метаданных
+
+Формат папки stl_vectors/ (prefix по умолчанию "stl_vectors"):
+    <prefix>_features.npy  (M, F) float32 - признаки, открываются через mmap
+    <prefix>_index.npy     (M,) структурный массив фиксированной ширины:
+                           vector_index, stl_path, model_folder,
+                           orientation_folder, filename (тоже mmap)
+    <prefix>_schema.json   версия, имена признаков, форма, порядок строк
+
+Строки отсортированы по (model_folder, orientation_folder, stl_path),
+поэтому все ориентации модели - непрерывный диапазон: model_rows()
+находит его двоичным поиском, а select(model=...) возвращает срез
+матрицы без копирования. Фильтры по нескольким моделям или ориентациям -
+векторные маски по столбцам индекса, без разбора строк.
+
+Старые метаданные (stl_vectors_metadata.csv со столбцом features в виде
+repr словаря с np.float64(...), или stl_vectors_metadata.json) переносятся
+без eval:
+    python stl_vectors.py [папка] [prefix]
+"""
+
+import ast
+import csv
+import json
+import os
+import re
+import sys
+from pathlib import Path
+
+import numpy as np
+
+STL_VECTORS_FORMAT_VERSION = 1
+DEFAULT_VECTORS_DIR = "stl_vectors"
+DEFAULT_PREFIX = "stl_vectors"
+INDEX_COLUMNS = ['stl_path', 'model_folder', 'orientation_folder', 'filename']
+SORT_COLUMNS = ['model_folder', 'orientation_folder', 'stl_path']
+
+# np.float64(0.5) в repr словаря -> 0.5 (литерал для ast.literal_eval)
+_NUMPY_SCALAR_RE = re.compile(r"np\.(?:float|int)\d*\(([^()]*)\)")
+
+
+class STLVectorsFormatError(ValueError):
+    """Файлы матрицы признаков не согласованы со схемой"""
+
+
+def vector_paths(directory=DEFAULT_VECTORS_DIR, prefix=DEFAULT_PREFIX):
+    """(признаки .npy, индекс .npy, схема .json)"""
+    directory = Path(directory)
+    return (directory / f"{prefix}_features.npy", directory / f"{prefix}_index.npy",
+            directory / f"{prefix}_schema.json")
+
+
+def index_dtype(rows):
+    """Структурный тип индекса: ширина строковых полей - по самой длинной строке"""
+    widths = {name: max([len(str(row.get(name, ''))) for row in rows] + [1]) for name in INDEX_COLUMNS}
+    return np.dtype([('vector_index', '<i4')] + [(name, f'<U{widths[name]}') for name in INDEX_COLUMNS])
+
+
+class STLVectors:
+    """
+    Открытая матрица признаков: features (M, F), index (M,) со столбцами
+    метаданных, feature_names. Выборки по модели - срезы без копирования.
+    """
+
+    def __init__(self, features, index, schema):
+        self.features = features
+        self.index = index
+        self.schema = schema
+        self.feature_names = list(schema['feature_names'])
+        self._feature_columns = {name: i for i, name in enumerate(self.feature_names)}
+
+    def __len__(self):
+        return len(self.features)
+
+    def column(self, name):
+        """Столбец индекса (model_folder, orientation_folder, stl_path, ...)"""
+        return self.index[name]
+
+    def feature(self, name):
+        """Столбец признака (M,) - представление без копирования"""
+        return self.features[:, self._feature_columns[name]]
+
+    def model_rows(self, model):
+        """Диапазон строк модели (slice): строки отсортированы по model_folder"""
+        models = self.index['model_folder']
+        return slice(int(np.searchsorted(models, model, side='left')),
+                     int(np.searchsorted(models, model, side='right')))
+
+    def mask(self, models=None, orientations=None):
+        """Маска строк выбранных моделей и/или ориентаций (строка или список)"""
+        mask = np.ones(len(self), dtype=bool)
+        for name, values in (('model_folder', models), ('orientation_folder', orientations)):
+            if values is not None:
+                values = [values] if isinstance(values, str) else list(values)
+                mask &= np.isin(self.index[name], values)
+        return mask
+
+    def select(self, models=None, orientations=None):
+        """
+        (признаки, индекс) выбранных строк. Одна модель без фильтра
+        ориентаций - срез mmap без копирования, иначе - выборка по маске.
+        """
+        if isinstance(models, str) and orientations is None:
+            rows = self.model_rows(models)
+        else:
+            rows = np.flatnonzero(self.mask(models, orientations))
+        return self.features[rows], self.index[rows]
+
+    def nearest(self, query, k=5, mask=None):
+        """
+        k ближайших строк к вектору query по евклидову расстоянию
+        в признаках, нормированных на стандартное отклонение столбца.
+        Возвращает (номера строк, расстояния).
+        """
+        features = np.asarray(self.features, dtype=np.float64)
+        scale = features.std(axis=0)
+        scale[scale == 0] = 1.0
+        diff = (features - np.asarray(query, dtype=np.float64)) / scale
+        distances = np.sqrt(np.einsum('ij,ij->i', diff, diff))
+        candidates = np.arange(len(self)) if mask is None else np.flatnonzero(mask)
+        k = min(int(k), len(candidates))
+        if k == 0:
+            return candidates, distances[candidates]
+        best = candidates[np.argpartition(distances[candidates], k - 1)[:k]]
+        best = best[np.argsort(distances[best], kind='stable')]
+        return best, distances[best]
+
+
+def save_stl_vectors(features, rows, feature_names, directory=DEFAULT_VECTORS_DIR, prefix=DEFAULT_PREFIX):
+    """
+    Сохраняет матрицу (M, F) и метаданные строк (словари с INDEX_COLUMNS,
+    vector_index - номер строки в исходном порядке, если не задан).
+    Строки сортируются по SORT_COLUMNS; схема пишется последней.
+    Возвращает пути (признаки, индекс, схема).
+    """
+    features = np.asarray(features, dtype=np.float32).reshape(-1, len(feature_names))
+    if len(features) != len(rows):
+        raise ValueError(f"Строк метаданных {len(rows)}, векторов {len(features)}")
+    Path(directory).mkdir(parents=True, exist_ok=True)
+    features_path, index_path, schema_path = vector_paths(directory, prefix)
+
+    index = np.zeros(len(rows), dtype=index_dtype(rows))
+    index['vector_index'] = [row.get('vector_index', i) for i, row in enumerate(rows)]
+    for name in INDEX_COLUMNS:
+        index[name] = [str(row.get(name, '')) for row in rows]
+    order = np.lexsort([index[name] for name in reversed(SORT_COLUMNS)])
+
+    np.save(features_path, np.ascontiguousarray(features[order]))
+    np.save(index_path, index[order])
+    schema = {
+        'format_version': STL_VECTORS_FORMAT_VERSION,
+        'feature_names': list(feature_names),
+        'shape': list(features.shape),
+        'dtype': str(features.dtype),
+        'index_columns': ['vector_index'] + INDEX_COLUMNS,
+        'sorted_by': SORT_COLUMNS,
+    }
+    tmp_path = schema_path.with_name(schema_path.name + ".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(schema, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, schema_path)
+    return features_path, index_path, schema_path
+
+
+def load_stl_vectors(directory=DEFAULT_VECTORS_DIR, prefix=DEFAULT_PREFIX, mmap=True):
+    """Открывает матрицу признаков (mmap только для чтения) и проверяет схему"""
+    features_path, index_path, schema_path = vector_paths(directory, prefix)
+    with open(schema_path, 'r', encoding='utf-8') as f:
+        schema = json.load(f)
+    if schema.get('format_version') != STL_VECTORS_FORMAT_VERSION:
+        raise STLVectorsFormatError(f"Неподдерживаемая версия формата: {schema.get('format_version')}")
+    mmap_mode = 'r' if mmap else None
+    features = np.load(features_path, mmap_mode=mmap_mode)
+    index = np.load(index_path, mmap_mode=mmap_mode)
+    if list(features.shape) != schema['shape'] or len(index) != len(features):
+        raise STLVectorsFormatError(f"Форма {features.shape} и индекс {len(index)} не совпадают со схемой "
+                                    f"{schema['shape']}")
+    if features.shape[1] != len(schema['feature_names']):
+        raise STLVectorsFormatError("Число признаков не совпадает со списком имен")
+    return STLVectors(features, index, schema)
+
+
+def parse_features_repr(text):
+    """Словарь признаков из repr-строки старого CSV (без eval)"""
+    return ast.literal_eval(_NUMPY_SCALAR_RE.sub(r"\1", text))
+
+
+def read_legacy_metadata(directory=DEFAULT_VECTORS_DIR, prefix=DEFAULT_PREFIX):
+    """
+    Строки старого формата со словарями признаков: <prefix>_metadata.json
+    (список), иначе <prefix>_metadata.csv. Пути приводятся к виду с "/".
+    """
+    json_path = Path(directory) / f"{prefix}_metadata.json"
+    csv_path = Path(directory) / f"{prefix}_metadata.csv"
+    rows = None
+    if json_path.exists():
+        with open(json_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if isinstance(data, list):
+            rows = data
+    if rows is None:
+        with open(csv_path, 'r', encoding='utf-8', newline='') as f:
+            rows = list(csv.DictReader(f))
+        for row in rows:
+            row['features'] = parse_features_repr(row['features'])
+    for row in rows:
+        row['vector_index'] = int(row['vector_index'])
+        row['stl_path'] = str(row['stl_path']).replace('\\', '/')
+    return rows
+
+
+def convert_legacy(directory=DEFAULT_VECTORS_DIR, prefix=DEFAULT_PREFIX):
+    """Старые метаданные -> матрица 21 признака и типизированный индекс"""
+    from extended_vectorizer import EXTENDED_FEATURE_NAMES
+
+    rows = read_legacy_metadata(directory, prefix)
+    features = np.array([[float(row['features'][name]) for name in EXTENDED_FEATURE_NAMES] for row in rows],
+                        dtype=np.float64).reshape(-1, len(EXTENDED_FEATURE_NAMES))
+    save_stl_vectors(features, rows, EXTENDED_FEATURE_NAMES, directory, prefix)
+    return load_stl_vectors(directory, prefix)
+
+
+def main():
+    directory = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_VECTORS_DIR
+    prefix = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_PREFIX
+
+    print("=" * 70)
+    print("🧮 МАТРИЦА ПРИЗНАКОВ STL (MMAP + ТИПИЗИРОВАННЫЕ СТОЛБЦЫ)")
+    print("=" * 70)
+
+    if not Path(directory).exists():
+        print(f"❌ Папка {directory} не найдена!")
+        return
+
+    try:
+        vectors = load_stl_vectors(directory, prefix)
+        print(f"📁 Загружена матрица {directory}/{prefix}_features.npy")
+    except FileNotFoundError:
+        try:
+            vectors = convert_legacy(directory, prefix)
+        except (OSError, KeyError, ValueError, SyntaxError) as e:
+            print(f"❌ Не удалось перенести старые метаданные: {e}")
+            return
+        print(f"✅ Старые метаданные перенесены без eval")
+
+    models, counts = np.unique(vectors.column('model_folder'), return_counts=True)
+    print(f"📊 Векторов: {len(vectors)} x {len(vectors.feature_names)}, моделей: {len(models)}")
+    print(f"   Ориентации: {', '.join(np.unique(vectors.column('orientation_folder')))}")
+    if len(models):
+        block, _ = vectors.select(models[0])
+        print(f"   Пример: {models[0]} -> строки {vectors.model_rows(models[0])}, "
+              f"срез без копирования: {np.shares_memory(block, vectors.features)}")
+    for path in vector_paths(directory, prefix):
+        print(f"💾 {path}")
+
+
+if __name__ == "__main__":
+    main()
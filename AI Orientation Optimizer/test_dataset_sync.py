@@ -0,0 +1,103 @@
+"""
+Синхронизация json_files/ с хранилищем: перемещенная или переименованная
+папка модели, строки других источников и пара с STL в карантине не должны
+терять строки.
+
+Запуск:
+    python -m pytest test_dataset_sync.py
+"""
+
+import json
+import shutil
+
+import numpy as np
+
+import batch_vectorize
+from dataset_sync import load_sync_manifest, sync_dataset
+from feature_cache import hash_file
+from stl_reader import STL_RECORD_DTYPE
+from training_store import TrainingStore
+
+CUBE_CORNERS = np.array([[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0],
+                         [0, 0, 1], [1, 0, 1], [1, 1, 1], [0, 1, 1]], dtype=np.float32)
+CUBE_FACES = [(0, 2, 1), (0, 3, 2), (4, 5, 6), (4, 6, 7), (0, 1, 5), (0, 5, 4),
+              (1, 2, 6), (1, 6, 5), (2, 3, 7), (2, 7, 6), (3, 0, 4), (3, 4, 7)]
+
+
+def write_cube_stl(path, size):
+    records = np.zeros(len(CUBE_FACES), dtype=STL_RECORD_DTYPE)
+    records['vertices'] = CUBE_CORNERS[np.array(CUBE_FACES)] * size
+    with open(path, 'wb') as f:
+        f.write(b'test'.ljust(80, b' '))
+        f.write(np.uint32(len(records)).tobytes())
+        f.write(records.tobytes())
+
+
+def write_pair(folder, size, angle_x, time_minutes):
+    folder.mkdir(parents=True)
+    write_cube_stl(folder / "model.stl", size)
+    with open(folder / "print_info.json", 'w', encoding='utf-8') as f:
+        json.dump({'model_name': folder.parent.name,
+                   'rotation_info': {'angles_degrees': {'x': angle_x, 'y': 0, 'z': 0}},
+                   'estimated_values': {'filament_length_m': size / 10, 'time_minutes': time_minutes}}, f)
+
+
+def test_moved_model_keeps_rows(tmp_path, monkeypatch):
+    # Кэш признаков не пишется в папку проекта
+    monkeypatch.setattr(batch_vectorize, 'get_default_cache', lambda: False)
+    base = tmp_path / "json_files"
+    write_pair(base / "part_a" / "default", 10.0, 0, 30.0)
+    write_pair(base / "part_a" / "flat", 10.0, 90, 35.0)
+    write_pair(base / "part_b" / "default", 20.0, 0, 60.0)
+    store = TrainingStore.create(tmp_path / "training_store")
+
+    first = sync_dataset(base, store, workers=1)
+    assert first['added'] == 3 and first['rows'] == 3
+
+    shutil.move(base / "part_a", base / "part_a_moved")
+    moved = sync_dataset(base, store, workers=1)
+    assert moved['adopted'] == 2 and moved['deleted'] == 2
+    assert moved['rows'] == 3
+
+    live = store.live_mask()
+    pairs = load_sync_manifest(store.path)['pairs']
+    assert sorted(pairs) == ['part_a_moved/default', 'part_a_moved/flat', 'part_b/default']
+    assert all(live[row] for entry in pairs.values() for row in entry['rows'])
+
+    again = sync_dataset(base, store, workers=1)
+    assert again['unchanged'] == 3 and again['rows'] == 3
+
+
+def test_foreign_row_is_not_deleted(tmp_path, monkeypatch):
+    monkeypatch.setattr(batch_vectorize, 'get_default_cache', lambda: False)
+    base = tmp_path / "json_files"
+    write_pair(base / "part_a" / "default", 10.0, 0, 30.0)
+    store = TrainingStore.create(tmp_path / "training_store")
+    # Та же ориентация из другого источника (агрегированные логи CSV) с другими метками
+    store.append([{'model_name': 'part_a', 'stl_hash': hash_file(base / "part_a" / "default" / "model.stl"),
+                   'stl_vector': [1.0] * 10, 'angle_x': 0.0, 'angle_y': 0.0, 'angle_z': 0.0,
+                   'filament_length_m': 1.5, 'time_minutes': 31.0}], source='csv_ingest')
+
+    report = sync_dataset(base, store, workers=1)
+    assert report['added'] == 1 and report['adopted'] == 0
+    assert store.live_mask()[0] and report['rows'] == 2
+
+
+def test_quarantined_update_keeps_old_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(batch_vectorize, 'get_default_cache', lambda: False)
+    base = tmp_path / "json_files"
+    folder = base / "part_a" / "default"
+    write_pair(folder, 10.0, 0, 30.0)
+    store = TrainingStore.create(tmp_path / "training_store")
+    sync_dataset(base, store, workers=1)
+
+    # Обрезанный STL: векторизация падает, пара в карантине
+    (folder / "model.stl").write_bytes(b'broken'.ljust(80, b' ') + np.uint32(1000).tobytes())
+    broken = sync_dataset(base, store, workers=1)
+    assert broken['quarantine'] and broken['rows'] == 1
+    assert load_sync_manifest(store.path)['pairs']['part_a/default']['rows'] == [0]
+
+    write_cube_stl(folder / "model.stl", 12.0)
+    fixed = sync_dataset(base, store, workers=1)
+    assert fixed['updated'] == 1 and fixed['rows'] == 1
+    assert not store.live_mask()[0]
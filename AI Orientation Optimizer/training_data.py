@@ -0,0 +1,91 @@
+"""
+training_data.py - Обучающие записи как матрицы для обучения
+
+Записи читаются из столбцового хранилища (training_store.py) через mmap;
+если его еще нет - из training_dataset.json.
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+
+from model_bundle import TRAINING_FEATURE_NAMES, dataset_row_id
+from training_store import REQUIRED_FIELDS, STORE_DIR, group_key, open_store
+
+DATASET_PATH = "training_dataset.json"
+
+# Цели обучения; printing_rate - если он есть во всех записях
+TARGET_NAMES = ['filament_length_m', 'time_minutes']
+OPTIONAL_TARGET_NAMES = ['printing_rate']
+
+
+class TrainingTable:
+    """
+    Датасет в столбцах: X (n, 13) - STL-вектор и углы в градусах,
+    targets {цель: (n,)}, row_ids и groups (деталь) по строкам.
+    """
+
+    def __init__(self, X, targets, row_ids, groups, source):
+        self.X = X
+        self.targets = targets
+        self.row_ids = row_ids
+        self.groups = groups
+        self.source = source
+
+    def __len__(self):
+        return len(self.X)
+
+    def available_targets(self):
+        """Цели, которые есть во всех записях"""
+        return TARGET_NAMES + [name for name in OPTIONAL_TARGET_NAMES
+                               if name in self.targets and len(self) and not np.isnan(self.targets[name]).any()]
+
+    def matrices(self, target_names, rows=None):
+        """X (n, 13) и Y (n, число целей) для всех строк или строк rows"""
+        rows = slice(None) if rows is None else np.asarray(rows, dtype=np.intp)
+        X = np.asarray(self.X[rows], dtype=np.float64).reshape(-1, len(TRAINING_FEATURE_NAMES))
+        Y = np.column_stack([np.asarray(self.targets[name][rows], dtype=np.float64) for name in target_names])
+        return X, Y.reshape(len(X), len(target_names))
+
+
+def load_dataset(path=DATASET_PATH):
+    """Записи training_dataset.json, пригодные для обучения"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return [item for item in data
+            if all(key in item for key in REQUIRED_FIELDS) and len(item['stl_vector']) >= 10]
+
+
+def table_from_items(items, source=DATASET_PATH):
+    X = np.array([list(item['stl_vector'][:10]) + [item['angle_x'], item['angle_y'], item['angle_z']]
+                  for item in items], dtype=np.float64).reshape(-1, len(TRAINING_FEATURE_NAMES))
+    targets = {name: np.array([np.nan if item.get(name) is None else item[name] for item in items],
+                              dtype=np.float64)
+               for name in TARGET_NAMES + OPTIONAL_TARGET_NAMES}
+    return TrainingTable(X, targets, [dataset_row_id(item) for item in items],
+                         [group_key(item) for item in items], source)
+
+
+def table_from_store(store):
+    """
+    Неудаленные строки хранилища. Без удалений метки - столбцы mmap без
+    копирования; X (STL-вектор и углы) всегда собирается в новую матрицу.
+    """
+    live = store.live_mask()
+    rows = slice(None) if live.all() else np.flatnonzero(live)
+    X = np.hstack([store.column('stl_vector')[rows], store.column('angles')[rows]])
+    targets = {name: store.column(name)[rows] for name in TARGET_NAMES + OPTIONAL_TARGET_NAMES}
+    row_ids = np.array(store.row_ids(), dtype=object)[rows]
+    groups = np.array(store.group_names(), dtype=object)[rows]
+    return TrainingTable(X, targets, list(row_ids), list(groups), str(store.path))
+
+
+def load_table(store_dir=STORE_DIR, dataset_path=DATASET_PATH):
+    """Датасет из хранилища или из JSON; None, если нет ни того, ни другого"""
+    store = open_store(store_dir)
+    if store is not None:
+        return table_from_store(store)
+    if Path(dataset_path).exists():
+        return table_from_items(load_dataset(dataset_path), dataset_path)
+    return None
@@ -0,0 +1,322 @@
+"""
+training_pipeline.py - Групповая кросс-валидация и подбор гиперпараметров
+
+Записи датасета - несколько ориентаций одной детали, поэтому случайное
+разбиение кладет ориентации одной модели и в обучение, и в тест, и R²
+на тесте завышен. Здесь оценка идет по GroupKFold: все ориентации детали
+(model_name) попадают в один фолд.
+
+Матрицы фолдов один раз сохраняются в fold_cache/<хэш датасета>/ в .npy
+и открываются исполнителями через mmap, поэтому пул процессов не
+пересылает данные и повторный запуск на том же датасете не пересобирает
+фолды. Конфигурации леса и бустинга оцениваются параллельно (по одной
+конфигурации на задачу, внутри задачи n_jobs=1), затем в основном
+процессе последовательно измеряется задержка предсказания кандидатов
+одной детали - без конкуренции с обучением.
+
+Результат - таблица лидеров (leaderboard.json): точность по фолдам
+(среднее и разброс R², MAE по каждой цели) против задержки, отметка
+Парето-фронта и соответствия SLO по задержке.
+
+Запуск:
+    python training_pipeline.py [--workers N] [--slo-ms 5] [--splits 5]
+"""
+
+import hashlib
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from pareto import pareto_mask
+from training_data import load_table
+
+FOLD_CACHE_DIR = "fold_cache"
+FOLD_CACHE_VERSION = 1
+LEADERBOARD_PATH = "leaderboard.json"
+N_SPLITS = 5
+RANDOM_STATE = 42
+# Задержка измеряется на пакете кандидатов одной детали (13 ориентаций)
+LATENCY_ROWS = 13
+LATENCY_REPEATS = 30
+DEFAULT_SLO_MS = 5.0
+
+# Сетки гиперпараметров по семействам моделей
+SEARCH_SPACE = {
+    'random_forest': {
+        'n_estimators': [50, 100, 200],
+        'max_depth': [6, 10, None],
+        'min_samples_split': [2, 5],
+    },
+    'extra_trees': {
+        'n_estimators': [50, 100, 200],
+        'max_depth': [6, 10, None],
+        'min_samples_split': [2, 5],
+    },
+    'gradient_boosting': {
+        'n_estimators': [100, 300],
+        'max_depth': [2, 3],
+        'learning_rate': [0.05, 0.1],
+    },
+    'hist_gradient_boosting': {
+        'max_iter': [100, 300],
+        'max_depth': [3, None],
+        'learning_rate': [0.05, 0.1],
+    },
+}
+# Семейства, которые сохраняются в пакет моделей (CompiledForest)
+FOREST_FAMILIES = ('random_forest', 'extra_trees')
+
+
+def candidate_configs(space=SEARCH_SPACE):
+    """Все конфигурации сетки: список {'family', 'params'}"""
+    from sklearn.model_selection import ParameterGrid
+
+    return [{'family': family, 'params': params}
+            for family, grid in space.items() for params in ParameterGrid(grid)]
+
+
+def make_estimator(family, params, n_outputs):
+    """Регрессор семейства; бустинг - по модели на цель, если целей несколько"""
+    from sklearn.ensemble import (
+        ExtraTreesRegressor, GradientBoostingRegressor, HistGradientBoostingRegressor,
+        RandomForestRegressor
+    )
+    from sklearn.multioutput import MultiOutputRegressor
+
+    if family == 'random_forest':
+        return RandomForestRegressor(**params, random_state=RANDOM_STATE, n_jobs=1)
+    if family == 'extra_trees':
+        return ExtraTreesRegressor(**params, random_state=RANDOM_STATE, n_jobs=1)
+    if family == 'gradient_boosting':
+        estimator = GradientBoostingRegressor(**params, random_state=RANDOM_STATE)
+    elif family == 'hist_gradient_boosting':
+        estimator = HistGradientBoostingRegressor(**params, random_state=RANDOM_STATE)
+    else:
+        raise ValueError(f"Неизвестное семейство моделей: {family}")
+    return MultiOutputRegressor(estimator) if n_outputs > 1 else estimator
+
+
+def dataset_fingerprint(X, Y, groups, n_splits):
+    """Ключ кэша фолдов: данные, группы и число фолдов"""
+    digest = hashlib.sha256()
+    for array in (X, Y):
+        digest.update(np.ascontiguousarray(array, dtype=np.float64).tobytes())
+    digest.update(json.dumps([groups, n_splits, FOLD_CACHE_VERSION]).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def cache_folds(X, Y, groups, n_splits=N_SPLITS, cache_root=FOLD_CACHE_DIR):
+    """
+    Сохраняет матрицы фолдов GroupKFold в .npy (fold_K_X_train.npy и т.д.)
+    и возвращает (папка, число фолдов). folds.json пишется последним,
+    поэтому недописанный кэш не используется.
+    """
+    from sklearn.model_selection import GroupKFold
+
+    n_splits = min(n_splits, len(set(groups)))
+    if n_splits < 2:
+        raise ValueError(f"Для групповой кросс-валидации нужно хотя бы 2 детали, найдено {len(set(groups))}")
+    cache_dir = Path(cache_root) / dataset_fingerprint(X, Y, groups, n_splits)
+    index_path = cache_dir / "folds.json"
+    if index_path.exists():
+        with open(index_path, 'r', encoding='utf-8') as f:
+            return cache_dir, json.load(f)['n_splits']
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    folds = []
+    for k, (train_idx, test_idx) in enumerate(GroupKFold(n_splits=n_splits).split(X, Y, groups)):
+        for part, idx in (('train', train_idx), ('test', test_idx)):
+            np.save(cache_dir / f"fold_{k}_X_{part}.npy", X[idx])
+            np.save(cache_dir / f"fold_{k}_Y_{part}.npy", Y[idx])
+        folds.append({'train_rows': len(train_idx), 'test_rows': len(test_idx),
+                      'test_groups': sorted({groups[i] for i in test_idx})})
+    with open(index_path, 'w', encoding='utf-8') as f:
+        json.dump({'n_splits': n_splits, 'folds': folds}, f, indent=2, ensure_ascii=False)
+    return cache_dir, n_splits
+
+
+def load_fold(cache_dir, k):
+    """(X_train, Y_train, X_test, Y_test) фолда k через mmap"""
+    return tuple(np.load(Path(cache_dir) / f"fold_{k}_{name}.npy", mmap_mode='r')
+                 for name in ('X_train', 'Y_train', 'X_test', 'Y_test'))
+
+
+def evaluate_config(config, cache_dir, n_splits, target_names):
+    """
+    Задача исполнителя: обучение конфигурации на всех фолдах.
+    Возвращает результат с метриками по целям и модель первого фолда
+    (для измерения задержки в основном процессе).
+    """
+    import warnings
+    from sklearn.metrics import r2_score
+
+    warnings.filterwarnings('ignore')
+    r2 = np.full((n_splits, len(target_names)), np.nan)
+    mae = np.full((n_splits, len(target_names)), np.nan)
+    fit_seconds = 0.0
+    first_model = None
+    for k in range(n_splits):
+        X_train, Y_train, X_test, Y_test = load_fold(cache_dir, k)
+        model = make_estimator(config['family'], config['params'], len(target_names))
+        start = time.perf_counter()
+        model.fit(X_train, Y_train if len(target_names) > 1 else Y_train[:, 0])
+        fit_seconds += time.perf_counter() - start
+        pred = np.asarray(model.predict(X_test)).reshape(len(X_test), -1)
+        for i in range(len(target_names)):
+            if len(X_test) > 1:
+                r2[k, i] = r2_score(Y_test[:, i], pred[:, i])
+            mae[k, i] = float(np.mean(np.abs(pred[:, i] - Y_test[:, i])))
+        if first_model is None:
+            first_model = model
+
+    metrics = {name: {'r2_mean': float(np.nanmean(r2[:, i])), 'r2_std': float(np.nanstd(r2[:, i])),
+                      'mae_mean': float(np.mean(mae[:, i])), 'mae_std': float(np.std(mae[:, i]))}
+               for i, name in enumerate(target_names)}
+    return {
+        'family': config['family'],
+        'params': config['params'],
+        'metrics': metrics,
+        'score': float(np.mean([m['r2_mean'] for m in metrics.values()])),
+        'fit_seconds': round(fit_seconds / n_splits, 4),
+    }, first_model
+
+
+def measure_latency(predict, X, repeats=LATENCY_REPEATS):
+    """Медианное время predict(X), миллисекунды"""
+    predict(X)
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        predict(X)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings) * 1000)
+
+
+def latency_batch(cache_dir):
+    """Пакет из LATENCY_ROWS строк первого тестового фолда"""
+    X_test = np.asarray(load_fold(cache_dir, 0)[2])
+    return X_test[np.arange(LATENCY_ROWS) % len(X_test)]
+
+
+def run_search(X, Y, groups, target_names, workers=1, n_splits=N_SPLITS, configs=None,
+               cache_root=FOLD_CACHE_DIR, slo_ms=DEFAULT_SLO_MS):
+    """
+    Параллельный перебор конфигураций с групповой кросс-валидацией.
+    Возвращает (таблица лидеров по убыванию средней R², сведения о фолдах).
+    """
+    from compiled_forest import CompiledForest
+
+    configs = candidate_configs() if configs is None else configs
+    cache_dir, n_splits = cache_folds(X, Y, groups, n_splits, cache_root)
+    X_latency = latency_batch(cache_dir)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(evaluate_config, config, str(cache_dir), n_splits, target_names)
+                   for config in configs]
+        results = [future.result() for future in futures]
+
+    # Задержка - после остановки пула: замеры не конкурируют с обучением
+    entries = []
+    for entry, model in results:
+        # Леса в пакете моделей предсказывают через CompiledForest
+        entry['latency_sklearn_ms'] = measure_latency(model.predict, X_latency)
+        entry['bundle_compatible'] = entry['family'] in FOREST_FAMILIES
+        entry['latency_ms'] = entry['latency_sklearn_ms']
+        if entry['bundle_compatible']:
+            entry['latency_ms'] = measure_latency(CompiledForest.from_model(model).predict, X_latency)
+        entries.append(entry)
+
+    objectives = np.array([[-entry['score'], entry['latency_ms']] for entry in entries])
+    for entry, on_front in zip(entries, pareto_mask(objectives)):
+        entry['pareto'] = bool(on_front)
+        entry['meets_slo'] = entry['latency_ms'] <= slo_ms
+    entries.sort(key=lambda entry: (-entry['score'], entry['latency_ms']))
+    return entries, {'cache_dir': str(cache_dir), 'n_splits': n_splits}
+
+
+def parse_option(argv, name, default, cast=float):
+    """Значение ключа name из аргументов командной строки"""
+    if name in argv:
+        index = argv.index(name)
+        if index + 1 < len(argv):
+            return cast(argv[index + 1])
+    return default
+
+
+def format_params(params):
+    return ", ".join(f"{key}={value}" for key, value in sorted(params.items()))
+
+
+def main():
+    from batch_vectorize import parse_workers
+
+    workers = parse_workers(sys.argv)
+    slo_ms = parse_option(sys.argv, '--slo-ms', DEFAULT_SLO_MS)
+    n_splits = parse_option(sys.argv, '--splits', N_SPLITS, int)
+
+    print("=" * 70)
+    print("🧪 ГРУППОВАЯ КРОСС-ВАЛИДАЦИЯ И ПОДБОР ГИПЕРПАРАМЕТРОВ")
+    print("=" * 70)
+
+    table = load_table()
+    if table is None:
+        print("❌ Обучающие записи не найдены!")
+        return
+
+    target_names = table.available_targets()
+    X, Y = table.matrices(target_names)
+    groups = table.groups
+    configs = candidate_configs()
+    print(f"📊 Записей: {len(table)}, деталей: {len(set(groups))}, фолдов: {min(n_splits, len(set(groups)))}")
+    print(f"   Конфигураций: {len(configs)}, процессов: {workers}, SLO задержки: {slo_ms:g} мс")
+
+    start = time.perf_counter()
+    try:
+        entries, folds = run_search(X, Y, groups, target_names, workers, n_splits, configs, slo_ms=slo_ms)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return
+    elapsed = time.perf_counter() - start
+    print(f"✅ Перебор завершен за {elapsed:.1f} с (фолды: {folds['cache_dir']})")
+
+    print(f"\n🎯 Таблица лидеров (R² - среднее ± разброс по фолдам, задержка - {LATENCY_ROWS} кандидатов):")
+    header = "".join(f"{'R² ' + name:>24}" for name in target_names)
+    print(f"   {'#':>3} {'модель':<24}{header}{'мс':>9}  ")
+    for rank, entry in enumerate(entries, 1):
+        scores = "".join(f"{entry['metrics'][name]['r2_mean']:>15.3f} ± {entry['metrics'][name]['r2_std']:<6.3f}"
+                         for name in target_names)
+        marks = ("P" if entry['pareto'] else " ") + ("" if entry['meets_slo'] else " >SLO")
+        print(f"   {rank:>3} {entry['family']:<24}{scores}{entry['latency_ms']:>9.2f}  {marks}")
+        print(f"       {format_params(entry['params'])}")
+
+    within_slo = [entry for entry in entries if entry['meets_slo']]
+    if within_slo:
+        best = within_slo[0]
+        print(f"\n🏆 Лучшая в пределах SLO ({slo_ms:g} мс): {best['family']} ({format_params(best['params'])}), "
+              f"R² = {best['score']:.3f}, {best['latency_ms']:.2f} мс")
+    else:
+        print(f"\n⚠️  Ни одна конфигурация не укладывается в SLO {slo_ms:g} мс")
+
+    leaderboard = {
+        'date': datetime.now().isoformat(),
+        'dataset_rows': len(table),
+        'groups': len(set(groups)),
+        'n_splits': folds['n_splits'],
+        'targets': target_names,
+        'slo_ms': slo_ms,
+        'latency_rows': LATENCY_ROWS,
+        'search_seconds': round(elapsed, 2),
+        'entries': entries,
+    }
+    with open(LEADERBOARD_PATH, 'w', encoding='utf-8') as f:
+        json.dump(leaderboard, f, indent=2, ensure_ascii=False)
+    print(f"💾 {LEADERBOARD_PATH}")
+
+
+if __name__ == "__main__":
+    main()
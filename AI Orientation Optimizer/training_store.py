@@ -0,0 +1,374 @@
+"""
+training_store.py - Столбцовое хранилище обучающих записей (только дозапись)
+
+Вместо JSON-массива с полным словарем признаков в каждой записи датасет
+хранится по столбцам в папке training_store/:
+    stl_vector.bin   (n, 10) float32 - признаки STL
+    angles.bin       (n, 3)  float32 - углы X, Y, Z в градусах
+    filament_length_m.bin, time_minutes.bin, printing_rate.bin (n,) float64
+                     - метки (NaN - значения нет)
+    row_id.bin       (n,) S16 - идентификатор записи (dataset_row_id)
+    stl_hash.bin     (n,) S64 - sha256 содержимого STL
+    group.bin        (n,) int32 - код детали, имена в groups.jsonl
+    groups.jsonl     - имена деталей по кодам, по одному на строку
+    metadata.jsonl   - model_name, stl_path, json_path, source (и для
+                     агрегированных логов печати - число измерений и
+                     дисперсии меток) по строке
+    row_groups.jsonl - журнал дозаписей (группы строк): начало, число
+                     строк, дата, источник
+    tombstones.i64   - номера удаленных строк
+    manifest.json    - схема и счетчики: строки, байты и записи
+                     дописываемых файлов
+
+Столбцы читаются через np.memmap без разбора. Дозапись N строк дописывает
+N строк в конец каждого файла и переписывает только manifest.json
+постоянного размера, то есть стоит O(N), а не O(размера или истории
+датасета). Длины файлов берутся из манифеста, который пишется последним:
+недописанный хвост после сбоя игнорируется и обрезается при следующей
+дозаписи. Строки не удаляются физически: удаление - дозапись номеров
+в tombstones.i64. Хранилище версии 1 (группы и журнал дозаписей внутри
+манифеста) переводится в текущий формат при открытии.
+
+Признаки в float32 не теряют точности для обучения: деревья sklearn
+все равно приводят X к float32.
+
+Перенос старого датасета:
+    python training_store.py [training_dataset.json] [training_store]
+"""
+
+import json
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from model_bundle import dataset_row_id
+
+STORE_DIR = "training_store"
+STORE_FORMAT_VERSION = 2
+MANIFEST_NAME = "manifest.json"
+METADATA_NAME = "metadata.jsonl"
+GROUPS_NAME = "groups.jsonl"
+ROW_GROUPS_NAME = "row_groups.jsonl"
+TOMBSTONES_NAME = "tombstones.i64"
+COLUMN_SUFFIX = ".bin"
+# Строк в одной группе при дозаписи большого пакета
+ROW_GROUP_ROWS = 4096
+
+# Столбцы: имя -> (тип, ширина строки; 0 - скаляр)
+COLUMNS = {
+    'stl_vector': ('<f4', 10),
+    'angles': ('<f4', 3),
+    'filament_length_m': ('<f8', 0),
+    'time_minutes': ('<f8', 0),
+    'printing_rate': ('<f8', 0),
+    'row_id': ('S16', 0),
+    'stl_hash': ('S64', 0),
+    'group': ('<i4', 0),
+}
+LABEL_COLUMNS = ['filament_length_m', 'time_minutes', 'printing_rate']
+METADATA_FIELDS = ['model_name', 'stl_path', 'json_path', 'source',
+                   'measurements', 'filament_var', 'time_var']
+REQUIRED_FIELDS = ['stl_vector', 'angle_x', 'angle_y', 'angle_z', 'filament_length_m', 'time_minutes']
+
+
+class StoreFormatError(ValueError):
+    """Хранилище повреждено или записано другой версией формата"""
+
+
+def orientation_key(stl_hash, angles):
+    """Ключ (содержимое STL, ориентация) с углами, округленными как в столбце float32"""
+    return f"{stl_hash}_" + "_".join(str(float(np.float32(angle))) for angle in angles)
+
+
+def group_key(item):
+    """Деталь записи: все ее ориентации - одна группа при разбиении"""
+    return str(item.get('model_name') or item.get('model_name_csv') or item.get('filename')
+               or item.get('stl_path', ''))
+
+
+def _row_bytes(name):
+    dtype, width = COLUMNS[name]
+    return np.dtype(dtype).itemsize * max(width, 1)
+
+
+class TrainingStore:
+    """
+    Открытое хранилище: num_rows, column(имя) - np.memmap только для
+    чтения, groups - имена деталей по кодам, metadata(), row_groups(),
+    live_mask(), append(записи), delete(строки).
+    """
+
+    def __init__(self, store_dir=STORE_DIR):
+        self.path = Path(store_dir)
+        manifest_path = self.path / MANIFEST_NAME
+        if not manifest_path.exists():
+            raise FileNotFoundError(f"Хранилище не найдено: {manifest_path}")
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        version = self.manifest.get('format_version')
+        if version == 1:
+            self.manifest = _upgrade_v1(self.path, self.manifest)
+        elif version != STORE_FORMAT_VERSION:
+            raise StoreFormatError(f"Неподдерживаемая версия хранилища: {version}")
+        for name in COLUMNS:
+            column_path = self.path / (name + COLUMN_SUFFIX)
+            if not column_path.exists() or column_path.stat().st_size < self.num_rows * _row_bytes(name):
+                raise StoreFormatError(f"Столбец {name} короче {self.num_rows} строк")
+        self.groups = _read_jsonl(self.path / GROUPS_NAME, self.manifest['groups_bytes'])
+        if len(self.groups) != int(self.manifest['num_groups']):
+            raise StoreFormatError(f"В {GROUPS_NAME} {len(self.groups)} деталей, "
+                                   f"в манифесте {self.manifest['num_groups']}")
+        self._group_codes = {name: code for code, name in enumerate(self.groups)}
+
+    @classmethod
+    def create(cls, store_dir=STORE_DIR):
+        """Пустое хранилище (существующее открывается как есть)"""
+        path = Path(store_dir)
+        if not (path / MANIFEST_NAME).exists():
+            path.mkdir(parents=True, exist_ok=True)
+            for name in COLUMNS:
+                (path / (name + COLUMN_SUFFIX)).touch()
+            for name in (METADATA_NAME, GROUPS_NAME, ROW_GROUPS_NAME, TOMBSTONES_NAME):
+                (path / name).touch()
+            _write_manifest(path, {
+                'format_version': STORE_FORMAT_VERSION,
+                'columns': {name: {'dtype': dtype, 'width': width} for name, (dtype, width) in COLUMNS.items()},
+                'num_rows': 0,
+                'metadata_bytes': 0,
+                'num_tombstones': 0,
+                'num_groups': 0,
+                'groups_bytes': 0,
+                'num_row_groups': 0,
+                'row_groups_bytes': 0,
+            })
+        return cls(path)
+
+    @property
+    def num_rows(self):
+        return int(self.manifest['num_rows'])
+
+    def column(self, name):
+        """Столбец через mmap: (n,) или (n, ширина)"""
+        dtype, width = COLUMNS[name]
+        shape = (self.num_rows, width) if width else (self.num_rows,)
+        if self.num_rows == 0:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(self.path / (name + COLUMN_SUFFIX), dtype=dtype, mode='r', shape=shape)
+
+    def group_names(self):
+        """Имена деталей по строкам"""
+        groups = np.array(self.groups or [''], dtype=object)
+        return list(groups[np.asarray(self.column('group'))])
+
+    def row_ids(self):
+        return [row_id.decode('ascii') for row_id in self.column('row_id')]
+
+    def metadata(self):
+        """Словари METADATA_FIELDS по строкам"""
+        return _read_jsonl(self.path / METADATA_NAME, self.manifest['metadata_bytes'])
+
+    def row_groups(self):
+        """Журнал дозаписей: {'start', 'rows', 'date', 'source'}"""
+        return _read_jsonl(self.path / ROW_GROUPS_NAME, self.manifest['row_groups_bytes'])
+
+    def live_mask(self):
+        """Маска неудаленных строк"""
+        mask = np.ones(self.num_rows, dtype=bool)
+        count = int(self.manifest['num_tombstones'])
+        if count:
+            mask[np.fromfile(self.path / TOMBSTONES_NAME, dtype='<i8', count=count)] = False
+        return mask
+
+    def append(self, items, source=None):
+        """
+        Дописывает записи (словари в формате training_dataset.json) группами
+        до ROW_GROUP_ROWS строк. Записи без обязательных полей пропускаются.
+        Возвращает номера добавленных строк.
+        """
+        items = [item for item in items
+                 if all(key in item for key in REQUIRED_FIELDS) and len(item['stl_vector']) > 0]
+        start = self.num_rows
+        for offset in range(0, len(items), ROW_GROUP_ROWS):
+            self._append_group(items[offset:offset + ROW_GROUP_ROWS], source)
+        return np.arange(start, self.num_rows)
+
+    def _append_group(self, items, source):
+        num_groups = len(self.groups)
+        columns = self._to_columns(items)
+        num_rows = self.num_rows
+        for name, values in columns.items():
+            _append_bytes(self.path / (name + COLUMN_SUFFIX), num_rows * _row_bytes(name), values.tobytes())
+        self._append_jsonl(METADATA_NAME, 'metadata_bytes', [_row_metadata(item) for item in items])
+        self._append_jsonl(GROUPS_NAME, 'groups_bytes', self.groups[num_groups:])
+        self._append_jsonl(ROW_GROUPS_NAME, 'row_groups_bytes', [{
+            'start': num_rows, 'rows': len(items), 'date': datetime.now().isoformat(), 'source': source,
+        }])
+
+        self.manifest['num_rows'] = num_rows + len(items)
+        self.manifest['num_groups'] = len(self.groups)
+        self.manifest['num_row_groups'] = int(self.manifest['num_row_groups']) + 1
+        _write_manifest(self.path, self.manifest)
+
+    def _append_jsonl(self, file_name, bytes_key, records):
+        """Дописывает строки JSON после учтенных в манифесте байт (счетчик - в манифест)"""
+        lines = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records).encode('utf-8')
+        size = int(self.manifest[bytes_key])
+        if lines:
+            _append_bytes(self.path / file_name, size, lines)
+        self.manifest[bytes_key] = size + len(lines)
+
+    def _to_columns(self, items):
+        """Массивы столбцов для пакета записей (новые детали - в список групп)"""
+        codes = []
+        for item in items:
+            name = group_key(item)
+            if name not in self._group_codes:
+                self._group_codes[name] = len(self.groups)
+                self.groups.append(name)
+            codes.append(self._group_codes[name])
+
+        def label(item, name):
+            value = item.get(name)
+            return np.nan if value is None else float(value)
+
+        columns = {
+            'stl_vector': np.array([list(item['stl_vector'][:10]) + [0.0] * max(0, 10 - len(item['stl_vector']))
+                                    for item in items], dtype='<f4').reshape(-1, 10),
+            'angles': np.array([[item['angle_x'], item['angle_y'], item['angle_z']] for item in items],
+                               dtype='<f4').reshape(-1, 3),
+            'row_id': np.array([dataset_row_id(item) for item in items], dtype='S16'),
+            'stl_hash': np.array([item.get('stl_hash') or '' for item in items], dtype='S64'),
+            'group': np.array(codes, dtype='<i4'),
+        }
+        for name in LABEL_COLUMNS:
+            columns[name] = np.array([label(item, name) for item in items], dtype='<f8')
+        return columns
+
+    def delete(self, rows):
+        """Помечает строки удаленными (дозапись в tombstones.i64)"""
+        rows = np.unique(np.asarray(rows, dtype='<i8'))
+        if len(rows) == 0:
+            return
+        if rows[0] < 0 or rows[-1] >= self.num_rows:
+            raise IndexError(f"Номер строки вне хранилища из {self.num_rows} строк")
+        count = int(self.manifest['num_tombstones'])
+        _append_bytes(self.path / TOMBSTONES_NAME, count * 8, rows.tobytes())
+        self.manifest['num_tombstones'] = count + len(rows)
+        _write_manifest(self.path, self.manifest)
+
+
+def _row_metadata(item):
+    """Заполненные поля METADATA_FIELDS записи (source_csv старых записей - как source)"""
+    metadata = {field: item.get(field) for field in METADATA_FIELDS if item.get(field) is not None}
+    if 'source' not in metadata and item.get('source_csv'):
+        metadata['source'] = item['source_csv']
+    return metadata
+
+
+def _append_bytes(path, valid_size, payload):
+    """Дописывает payload после valid_size байт (хвост после сбоя отбрасывается)"""
+    with open(path, 'r+b') as f:
+        f.truncate(valid_size)
+        f.seek(valid_size)
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _read_jsonl(path, size):
+    """Первые size байт файла JSON Lines (хвост после сбоя не читается)"""
+    with open(path, 'rb') as f:
+        payload = f.read(int(size))
+    return [json.loads(line) for line in payload.decode('utf-8').splitlines()]
+
+
+def _upgrade_v1(path, manifest):
+    """
+    Хранилище версии 1: группы и журнал дозаписей переносятся из
+    манифеста в groups.jsonl и row_groups.jsonl. Манифест пишется последним.
+    """
+    manifest = dict(manifest)
+    for file_name, bytes_key, count_key, records in (
+            (GROUPS_NAME, 'groups_bytes', 'num_groups', manifest.pop('groups')),
+            (ROW_GROUPS_NAME, 'row_groups_bytes', 'num_row_groups', manifest.pop('row_groups'))):
+        lines = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records).encode('utf-8')
+        with open(Path(path) / file_name, 'wb') as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        manifest[bytes_key] = len(lines)
+        manifest[count_key] = len(records)
+    manifest['format_version'] = STORE_FORMAT_VERSION
+    _write_manifest(path, manifest)
+    return manifest
+
+
+def _write_manifest(path, manifest):
+    tmp_path = Path(path) / (MANIFEST_NAME + ".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, Path(path) / MANIFEST_NAME)
+
+
+def open_store(store_dir=STORE_DIR):
+    """Хранилище или None, если его нет"""
+    if not (Path(store_dir) / MANIFEST_NAME).exists():
+        return None
+    return TrainingStore(store_dir)
+
+
+def convert_json(dataset_path, store_dir=STORE_DIR):
+    """
+    Переносит записи training_dataset.json в новое хранилище. Пути
+    приводятся к виду с "/", хэш STL считается для записей, где его нет,
+    но файл на месте.
+    Возвращает (хранилище, число перенесенных записей).
+    """
+    from feature_cache import hash_file
+
+    if (Path(store_dir) / MANIFEST_NAME).exists():
+        raise FileExistsError(f"Хранилище уже существует: {store_dir}")
+    with open(dataset_path, 'r', encoding='utf-8') as f:
+        items = json.load(f)
+    for item in items:
+        # Пути могли быть записаны в Windows (json_files\\модель\\model.stl)
+        for field in ('stl_path', 'json_path'):
+            if item.get(field):
+                item[field] = item[field].replace('\\', '/')
+        stl_path = item.get('stl_path')
+        if not item.get('stl_hash') and stl_path and os.path.exists(stl_path):
+            item['stl_hash'] = hash_file(stl_path)
+    store = TrainingStore.create(store_dir)
+    rows = store.append(items, source=Path(dataset_path).name)
+    return store, len(rows)
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    dataset_path = args[0] if args else "training_dataset.json"
+    store_dir = args[1] if len(args) > 1 else STORE_DIR
+
+    print("=" * 70)
+    print("🗄️  ПЕРЕНОС ДАТАСЕТА В СТОЛБЦОВОЕ ХРАНИЛИЩЕ")
+    print("=" * 70)
+
+    if not Path(dataset_path).exists():
+        print(f"❌ Файл {dataset_path} не найден!")
+        return
+    try:
+        store, count = convert_json(dataset_path, store_dir)
+    except FileExistsError as e:
+        print(f"⚠️  {e}")
+        return
+
+    size = sum(p.stat().st_size for p in Path(store_dir).iterdir())
+    print(f"✅ Перенесено записей: {count} (деталей: {len(store.groups)})")
+    print(f"📊 Размер: {Path(dataset_path).stat().st_size / 1024:.0f} КБ JSON -> {size / 1024:.0f} КБ")
+    print(f"💾 {store_dir}/")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,6 @@
 UNIFIED_ANALYZER_FIXED.py - Анализатор с обработкой ошибок
 """
 
-import trimesh
 import numpy as np
 import json
 import re
@@ -10,16 +9,35 @@ from pathlib import Path
 from datetime import datetime
 import sys
 
+# Встроенный читатель STL лежит рядом с векторизатором
+sys.path.insert(0, str(Path(__file__).resolve().parent / "AI Orientation Optimizer"))
+from stl_reader import STLReadError, compute_mesh_stats, read_stl_stats_streaming, read_stl_triangles
+from gcode_motion import analyze_gcode, motion_estimations
+from gcode_scanner import empty_estimations, extract_estimations, scan_gcode_estimations
+from print_settings import load_cura_settings
+from slice_lite import LABEL_SOURCE as SLICE_LITE_SOURCE, estimate_print
+
+try:
+    import trimesh
+except ImportError:
+    trimesh = None  # нужен только как запасной вариант загрузки
+
 class UnifiedAnalyzerFixed:
-    def __init__(self, dataset_path="dataset"):
+    def __init__(self, dataset_path="dataset", streaming=False):
         self.dataset_path = Path(dataset_path).resolve()
+        # Потоковое чтение STL блоками: память не зависит от размера файла
+        self.streaming = streaming
         self.results_path = self.dataset_path / "results"
+        # Профиль печати для оценки без G-code (slice-lite)
+        self.cura_settings = load_cura_settings(self.dataset_path / "cura_settings.json")
         
         print("="*70)
         print("UNIFIED DATASET ANALYZER - FIXED VERSION")
         print("="*70)
         print(f"Dataset path: {self.dataset_path}")
         print(f"Results path: {self.results_path}")
+        if streaming:
+            print("STL mode: streaming")
         print("="*70)
     
     def analyze_stl_geometry_fixed(self, stl_path: Path):
@@ -33,39 +51,38 @@ class UnifiedAnalyzerFixed:
                 print(f"     Файл слишком мал ({file_size} байт), возможно placeholder")
                 return None
             
-            # Пробуем разные способы загрузки
-            mesh = None
+            # Быстрый путь: треугольники читаются напрямую, без trimesh
             try:
-                mesh = trimesh.load(str(stl_path))
-            except Exception as load_error:
-                print(f"     Ошибка загрузки trimesh: {str(load_error)[:100]}")
-                # Пробуем альтернативный метод
-                try:
-                    mesh = trimesh.load_mesh(str(stl_path))
-                except:
-                    pass
-            
-            if mesh is None:
-                print(f"     Не удалось загрузить STL файл")
-                return None
-            
-            # Проверяем, что mesh имеет нужные атрибуты
-            if not hasattr(mesh, 'bounds') or mesh.bounds is None:
-                print(f"     Нет данных bounds в mesh")
-                return None
-            
-            # Получаем границы модели
-            bounds = mesh.bounds
-            if bounds is None or len(bounds) < 2:
-                print(f"     Неверный формат bounds")
-                return None
+                if self.streaming:
+                    stats = read_stl_stats_streaming(stl_path)
+                else:
+                    stats = compute_mesh_stats(read_stl_triangles(stl_path))
+                bounds = stats['bounds']
+                volume_mm3 = stats['volume']
+                area_mm2 = stats['area']
+            except STLReadError as read_error:
+                print(f"     Встроенный читатель STL: {str(read_error)[:100]}")
+                mesh = self.load_mesh_with_trimesh(stl_path)
+                if mesh is None:
+                    return None
+                
+                # Проверяем, что mesh имеет нужные атрибуты
+                if not hasattr(mesh, 'bounds') or mesh.bounds is None:
+                    print(f"     Нет данных bounds в mesh")
+                    return None
+                
+                # Получаем границы модели
+                bounds = mesh.bounds
+                if bounds is None or len(bounds) < 2:
+                    print(f"     Неверный формат bounds")
+                    return None
+                
+                # Проверяем расчеты
+                volume_mm3 = mesh.volume if hasattr(mesh, 'volume') else 0
+                area_mm2 = mesh.area if hasattr(mesh, 'area') else 0
             
             dimensions = bounds[1] - bounds[0]
             
-            # Проверяем расчеты
-            volume_mm3 = mesh.volume if hasattr(mesh, 'volume') else 0
-            area_mm2 = mesh.area if hasattr(mesh, 'area') else 0
-            
             geometry_data = {
                 "bounding_box_mm": {
                     "width": float(dimensions[0]),
@@ -90,6 +107,28 @@ class UnifiedAnalyzerFixed:
             print(f"     Критическая ошибка: {type(e).__name__}: {str(e)[:100]}")
             return None
     
+    def load_mesh_with_trimesh(self, stl_path: Path):
+        """Запасная загрузка STL через trimesh"""
+        if trimesh is None:
+            print(f"     trimesh не установлен")
+            return None
+        
+        # Пробуем разные способы загрузки
+        mesh = None
+        try:
+            mesh = trimesh.load(str(stl_path))
+        except Exception as load_error:
+            print(f"     Ошибка загрузки trimesh: {str(load_error)[:100]}")
+            # Пробуем альтернативный метод
+            try:
+                mesh = trimesh.load_mesh(str(stl_path))
+            except:
+                pass
+        
+        if mesh is None:
+            print(f"     Не удалось загрузить STL файл")
+        return mesh
+    
     def extract_angles_from_path(self, folder_path: Path):
         """Извлекает углы поворота из имени папки ориентации"""
         orient_name = folder_path.name.lower()
@@ -129,15 +168,18 @@ class UnifiedAnalyzerFixed:
                 print(f"     Файл слишком мал ({file_size} байт)")
                 return self.get_empty_gcode_data()
             
-            with open(gcode_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
+            # Читаются только заголовок и хвост файла (оценки слайсера),
+            # весь файл - потоково и лишь если оценок там нет
+            estimations, scan = scan_gcode_estimations(gcode_path)
             
             # Проверяем, что это похоже на G-code
-            if not any(keyword in content for keyword in ['G1', 'G0', 'G28', 'M104', 'M140']):
+            if not scan['is_gcode']:
                 print(f"     Файл не похож на G-code")
                 return self.get_empty_gcode_data()
             
-            estimations = self.extract_gcode_estimations(content)
+            # Нет времени или филамента в комментариях слайсера - разбор траектории
+            if not estimations['time_minutes'] or not estimations['filament_length_m']:
+                estimations = self.analyze_gcode_motion(gcode_path, estimations)
             
             if estimations['success']:
                 print(f"     Время: {estimations['time_minutes']:.0f} мин")
@@ -153,88 +195,46 @@ class UnifiedAnalyzerFixed:
             print(f"     Ошибка чтения G-code: {str(e)[:100]}")
             return self.get_empty_gcode_data()
     
-    def extract_gcode_estimations(self, content: str):
-        """Извлекает оценки из содержимого G-code"""
-        estimations = {
-            'time_minutes': 0,
-            'material_g': 0.0,
-            'layer_count': 0,
-            'filament_length_m': 0.0,
-            'success': False
-        }
-        
-        lines = content.split('\n')
-        
-        for line in lines:
-            line_stripped = line.strip()
-            
-            # Время печати
-            if line_stripped.startswith(';TIME:'):
-                try:
-                    time_str = line_stripped[6:].strip()
-                    # Может быть в секундах или минутах
-                    if ':' in time_str:  # Формат HH:MM:SS
-                        parts = time_str.split(':')
-                        if len(parts) == 3:
-                            h, m, s = map(int, parts)
-                            estimations['time_minutes'] = h * 60 + m + s/60
-                            estimations['success'] = True
-                    else:  # Просто секунды
-                        seconds = int(time_str)
-                        estimations['time_minutes'] = seconds / 60
-                        estimations['success'] = True
-                except:
-                    pass
-            
-            # Филамент использованный
-            elif ';Filament used:' in line_stripped:
-                match = re.search(r'([\d.]+)\s*m', line_stripped)
-                if match:
-                    try:
-                        filament_m = float(match.group(1))
-                        estimations['filament_length_m'] = filament_m
-                        
-                        # Конвертируем в граммы
-                        filament_diameter = 1.75  # mm
-                        density_pla = 1.25  # g/cm³
-                        radius_cm = filament_diameter / 20  # в см
-                        volume_cm3 = filament_m * 100 * 3.14159 * radius_cm**2
-                        estimations['material_g'] = volume_cm3 * density_pla
-                        estimations['success'] = True
-                    except:
-                        pass
-            
-            # Количество слоев
-            elif ';LAYER_COUNT:' in line_stripped or ';Layer count:' in line_stripped:
-                match = re.search(r'(\d+)', line_stripped)
-                if match:
-                    try:
-                        estimations['layer_count'] = int(match.group(1))
-                    except:
-                        pass
-            
-            # Альтернативный формат времени
-            elif ';Print time:' in line_stripped:
-                # Пытаемся извлечь время в минутах
-                match = re.search(r'(\d+)\s*min', line_stripped, re.IGNORECASE)
-                if match:
-                    try:
-                        estimations['time_minutes'] = int(match.group(1))
-                        estimations['success'] = True
-                    except:
-                        pass
+    def analyze_gcode_motion(self, gcode_path: Path, estimations):
+        """Дополняет оценки разбором перемещений G-code (экструзия и время по кинематике)"""
+        printer = self.cura_settings.get("printer_settings", {}).get("printer")
+        report = analyze_gcode(gcode_path, printer)
+        motion = motion_estimations(report)
+        print(f"     Траектория: {report['moves']} перемещений за {report['parse_seconds']:.1f} с")
+        if not motion['success']:
+            return estimations
         
+        estimations = dict(estimations)
+        if not estimations['time_minutes']:
+            estimations['time_minutes'] = motion['time_minutes']
+        if not estimations['filament_length_m']:
+            estimations['filament_length_m'] = motion['filament_length_m']
+            estimations['material_g'] = motion['material_g']
+        if not estimations['layer_count']:
+            estimations['layer_count'] = motion['layer_count']
+        estimations['success'] = True
+        estimations['source'] = motion['source']
         return estimations
     
+    def extract_gcode_estimations(self, content: str):
+        """Извлекает оценки из содержимого G-code"""
+        return extract_estimations(content)
+    
     def get_empty_gcode_data(self):
         """Возвращает пустые данные G-code"""
-        return {
-            'time_minutes': 0,
-            'material_g': 0.0,
-            'layer_count': 0,
-            'filament_length_m': 0.0,
-            'success': False
-        }
+        return empty_estimations()
+    
+    def estimate_print_slice_lite(self, stl_path):
+        """Оценка времени и филамента по сечениям слоев STL (если нет G-code)"""
+        try:
+            estimate = estimate_print(read_stl_triangles(stl_path), self.cura_settings)
+        except (STLReadError, OSError, ValueError) as e:
+            print(f"     Slice-lite: {e}")
+            return None
+        
+        print(f"     Slice-lite: {estimate['layer_count']} слоев, "
+              f"{estimate['filament_length_m']:.2f} м, {estimate['time_minutes']:.0f} мин")
+        return estimate
     
     def process_orientation_fixed(self, orient_dir: Path, model_name: str, orient_name: str):
         """Обрабатывает одну ориентацию с улучшенной обработкой ошибок"""
@@ -326,15 +326,28 @@ class UnifiedAnalyzerFixed:
                     "layer_count": gcode_data['layer_count'],
                     "filament_length_m": round(gcode_data['filament_length_m'], 2),
                     "analysis_date": datetime.now().isoformat(),
-                    "source": "gcode_analysis"
+                    "source": gcode_data.get('source', "gcode_analysis")
                 }
                 updated = True
             
-            # Если нет данных G-code, но есть геометрия, можем сделать примерные оценки
+            # Если нет данных G-code: оценка по сечениям слоев (slice-lite),
+            # в крайнем случае - по объему
             elif geometry_data and ("estimated_values" not in print_info or 
                                   print_info["estimated_values"].get("time_minutes", 0) == 0):
+                estimate = self.estimate_print_slice_lite(stl_path)
                 volume = geometry_data.get("volume_cm3", 0)
-                if volume > 0:
+                if estimate:
+                    print_info["estimated_values"] = {
+                        "time_minutes": round(estimate['time_minutes']),
+                        "material_g": round(estimate['material_g'], 2),
+                        "layer_count": estimate['layer_count'],
+                        "filament_length_m": round(estimate['filament_length_m'], 2),
+                        "analysis_date": datetime.now().isoformat(),
+                        "source": SLICE_LITE_SOURCE,
+                        "note": "Оценка по сечениям слоев без слайсера"
+                    }
+                    updated = True
+                elif volume > 0:
                     # Примерные оценки на основе объема
                     print_info["estimated_values"] = {
                         "time_minutes": round(volume * 10),  # 10 мин на см³
@@ -487,7 +500,7 @@ def main():
     print("UNIFIED DATASET ANALYZER - FIXED VERSION")
     print("="*60)
     
-    analyzer = UnifiedAnalyzerFixed()
+    analyzer = UnifiedAnalyzerFixed(streaming="--streaming" in sys.argv)
     
     # 1. Проверяем файлы
     stl_count, gcode_count = analyzer.check_and_fix_files()